@@ -0,0 +1,208 @@
+"""Benchmarks of every kernel signature of scipy.special.
+
+These cover the overload and binding path for each signature of
+`name_to_numba_signatures`: the latency of scalar calls from nopython
+code, the throughput of array calls against the SciPy ufuncs, and the
+time to compile a first call in a new process. The time to import the
+extension and compile a first call is measured too. Changes can be
+checked for regressions against a stored run with
+
+    $ asv continuous --factor 1.1 main HEAD
+
+"""
+import textwrap
+
+import numba
+import numpy as np
+import scipy.special as sc
+from numba import types
+from numba.np import numpy_support
+
+from numba_scipy.special import overloads, signatures
+
+# Number of calls per sample of the scalar benchmarks, and of elements
+# of the array benchmarks.
+N_CALLS = 1_000
+N_ELEMENTS = 100_000
+
+# Maps benchmark parameters to `(name, argument types)`.
+SIGNATURES = {
+    '{}({})'.format(name, ', '.join(str(t) for t in arg_types)): (
+        name, arg_types
+    )
+    for name, specializations in signatures.name_to_numba_signatures.items()
+    for arg_types in specializations
+}
+
+# Arguments in the domain of the functions whose kernels crash or return
+# values depending on earlier calls outside of it.
+FIXED_ARGUMENTS = {
+    'mathieu_modcem1': (1.0, 1.5, 0.5),
+    'mathieu_modcem2': (1.0, 1.5, 0.5),
+    'mathieu_modsem1': (1.0, 1.5, 0.5),
+    'mathieu_modsem2': (1.0, 1.5, 0.5),
+}
+for _prefix in ('obl', 'pro'):
+    _cv = getattr(sc, _prefix + '_cv')(1.0, 2.0, 1.5)
+    for _name in ('ang1', 'rad1', 'rad2'):
+        FIXED_ARGUMENTS['{}_{}'.format(_prefix, _name)] = (1.0, 2.0, 1.5, 0.5)
+        FIXED_ARGUMENTS['{}_{}_cv'.format(_prefix, _name)] = (
+            1.0, 2.0, 1.5, _cv, 0.5
+        )
+
+LOOP_TEMPLATE = '''
+def make_call_loop(function):
+    def call_loop({args}):
+        total = 0.0
+        for i in range(x0.shape[0]):
+            result = function({indexed_args})
+            total += {result_sum}
+        return total
+    return call_loop
+'''
+
+
+def get_arguments(name, arg_types, size):
+    """Return arrays of `size` arguments of the given types."""
+    rng = np.random.default_rng(0)
+    fixed = FIXED_ARGUMENTS.get(name)
+    arguments = []
+    for i, arg_type in enumerate(arg_types):
+        dtype = numpy_support.as_dtype(arg_type)
+        if fixed is not None:
+            values = np.full(size, fixed[i])
+        elif isinstance(arg_type, types.Integer):
+            values = rng.integers(0, 5, size)
+        elif isinstance(arg_type, types.Complex):
+            values = rng.uniform(0.1, 0.9, size) + 1j * rng.uniform(
+                0.1, 0.9, size
+            )
+        else:
+            values = rng.uniform(0.1, 0.9, size)
+        arguments.append(values.astype(dtype))
+    return tuple(arguments)
+
+
+def get_result_sum(return_type):
+    # Results are summed so that the calls can't be removed, and their
+    # real parts taken so that the sum is a float.
+    if isinstance(return_type, types.BaseTuple):
+        outputs = ['result[{}]'.format(i) for i in range(len(return_type))]
+        output_types = return_type.types
+    else:
+        outputs = ['result']
+        output_types = [return_type]
+    return ' + '.join(
+        output + '.real' if isinstance(output_type, types.Complex) else output
+        for output, output_type in zip(outputs, output_types)
+    )
+
+
+def make_call_loop(name, arg_types):
+    """Return a jitted loop calling `name` on arrays of arguments."""
+    return_type = overloads.find_signature(name, arg_types)[0]
+    arg_names = ['x{}'.format(i) for i in range(len(arg_types))]
+    source = LOOP_TEMPLATE.format(
+        args=', '.join(arg_names),
+        indexed_args=', '.join('{}[i]'.format(arg) for arg in arg_names),
+        result_sum=get_result_sum(return_type),
+    )
+    namespace = {}
+    exec(source, namespace)
+    return numba.njit(namespace['make_call_loop'](getattr(sc, name)))
+
+
+class ScalarCall:
+    """Latency of scalar calls from nopython code, per N_CALLS calls."""
+
+    params = [list(SIGNATURES)]
+    param_names = ['signature']
+
+    def setup(self, signature):
+        name, arg_types = SIGNATURES[signature]
+        self.args = get_arguments(name, arg_types, N_CALLS)
+        self.call_loop = make_call_loop(name, arg_types)
+        self.call_loop(*self.args)
+
+    def time_call(self, signature):
+        self.call_loop(*self.args)
+
+
+class ArrayCall:
+    """Throughput of array calls from nopython code, against SciPy."""
+
+    params = [list(SIGNATURES), ['numba', 'scipy']]
+    param_names = ['signature', 'implementation']
+
+    def setup(self, signature, implementation):
+        name, arg_types = SIGNATURES[signature]
+        sc_function = getattr(sc, name)
+        if sc_function.nout != 1:
+            raise NotImplementedError('arrays need a single output')
+        self.args = get_arguments(name, arg_types, N_ELEMENTS)
+        if implementation == 'numba':
+            self.function = numba.njit(lambda *args: sc_function(*args))
+        else:
+            self.function = sc_function
+        self.function(*self.args)
+
+    def time_array(self, signature, implementation):
+        self.function(*self.args)
+
+
+class FirstCall:
+    """Time to compile a first call in a new process.
+
+    This includes looking up and binding the kernel, but not importing
+    the extension.
+
+    """
+
+    params = [list(SIGNATURES)]
+    param_names = ['signature']
+
+    def timeraw_compile(self, signature):
+        name, arg_types = SIGNATURES[signature]
+        arg_names = ', '.join('x{}'.format(i) for i in range(len(arg_types)))
+        setup = textwrap.dedent('''
+            import numba
+            import scipy.special as sc
+            import numba_scipy.special
+
+            @numba.njit
+            def function({args}):
+                return sc.{name}({args})
+        ''').format(args=arg_names, name=name)
+        code = 'function.compile(({},))'.format(
+            ', '.join('numba.types.{}'.format(t) for t in arg_types)
+        )
+        return code, setup
+
+
+class Import:
+    """Time to import the extension and compile a first call.
+
+    Numba and SciPy are imported beforehand. Importing the extension only
+    registers the names of the functions, and the first call loads the
+    signatures: the on-disk table of all of them, or without it, the
+    capsules of the function called.
+
+    """
+
+    params = [['cached', 'uncached']]
+    param_names = ['signature_table']
+
+    def timeraw_import(self, signature_table):
+        setup = textwrap.dedent('''
+            import os
+            if {uncached}:
+                os.environ['NUMBA_SCIPY_CACHE_DIR'] = ''
+            import numba
+            import scipy.special as sc
+            import scipy.special.cython_special
+        ''').format(uncached=signature_table == 'uncached')
+        code = textwrap.dedent('''
+            import numba_scipy.special
+            numba.njit(lambda x: sc.gamma(x))(1.0)
+        ''')
+        return code, setup
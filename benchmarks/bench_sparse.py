@@ -0,0 +1,136 @@
+"""Benchmarks for products of scipy.sparse matrices in nopython code."""
+import warnings
+
+import numpy as np
+import scipy.sparse
+
+from numba_scipy import sparse
+
+# Matrices of a million rows, with uniformly distributed nonzeros, or a
+# few dense rows as in graphs with hubs.
+N_ROWS = 1_000_000
+
+
+def make_matrix(structure):
+    rng = np.random.default_rng(0)
+    A = scipy.sparse.random(
+        N_ROWS, N_ROWS, density=1e-5, format="csr", random_state=rng
+    )
+    if structure == "skewed":
+        A = A.tolil()
+        for i in range(0, N_ROWS, N_ROWS // 8):
+            A[i, rng.integers(0, N_ROWS, 200_000)] = 1.0
+        A = A.tocsr()
+    return A
+
+
+class MatVec:
+    """`A @ x` for a CSR matrix, against SciPy."""
+
+    params = (["uniform", "skewed"], ["scipy", "serial", "parallel"])
+    param_names = ["structure", "implementation"]
+    timeout = 300
+
+    def setup(self, structure, implementation):
+        warnings.simplefilter("ignore", sparse.NumbaExperimentalFeatureWarning)
+        self.A = make_matrix(structure)
+        self.x = np.random.default_rng(1).standard_normal(N_ROWS)
+        self.out = np.empty(N_ROWS)
+        if implementation == "scipy":
+            self.function = lambda A, x, out: A @ x
+        elif implementation == "serial":
+            self.function = sparse.csr_matvec
+        else:
+            self.function = sparse.parallel_csr_matvec
+        self.function(self.A, self.x, self.out)
+
+    def time_matvec(self, structure, implementation):
+        self.function(self.A, self.x, self.out)
+
+
+class TransposeMatVec:
+    """`A.T @ x` for a CSR matrix, a CSC matrix over the same arrays."""
+
+    params = (["uniform", "skewed"], ["scipy", "serial", "parallel"])
+    param_names = ["structure", "implementation"]
+    timeout = 300
+
+    def setup(self, structure, implementation):
+        warnings.simplefilter("ignore", sparse.NumbaExperimentalFeatureWarning)
+        self.A = make_matrix(structure).T
+        self.x = np.random.default_rng(1).standard_normal(N_ROWS)
+        self.out = np.empty(N_ROWS)
+        if implementation == "scipy":
+            self.function = lambda A, x, out: A @ x
+        elif implementation == "serial":
+            self.function = sparse.csc_matvec
+        else:
+            self.function = sparse.parallel_csc_matvec
+        self.function(self.A, self.x, self.out)
+
+    def time_matvec(self, structure, implementation):
+        self.function(self.A, self.x, self.out)
+
+
+class MatMat:
+    """`A @ B` for a sparse matrix and a dense block of columns, against SciPy."""
+
+    params = (["csr", "csc"], [8, 64, 512], ["scipy", "serial", "parallel"])
+    param_names = ["format", "columns", "implementation"]
+    timeout = 300
+
+    def setup(self, format, columns, implementation):
+        warnings.simplefilter("ignore", sparse.NumbaExperimentalFeatureWarning)
+        n_rows = N_ROWS // 100
+        rng = np.random.default_rng(0)
+        self.A = scipy.sparse.random(
+            n_rows, n_rows, density=1e-3, format=format, random_state=rng
+        )
+        self.B = rng.standard_normal((n_rows, columns))
+        self.out = np.empty((n_rows, columns))
+        if implementation == "scipy":
+            self.function = lambda A, B, out: A @ B
+        else:
+            name = "{}_matmat".format(format)
+            if implementation == "parallel":
+                name = "parallel_" + name
+            self.function = getattr(sparse, name)
+        self.function(self.A, self.B, self.out)
+
+    def time_matmat(self, format, columns, implementation):
+        self.function(self.A, self.B, self.out)
+
+
+class SpGEMM:
+    """`A @ B` for two CSR matrices, against SciPy.
+
+    `numeric` reuses the `indptr` of the result, like repeated products with
+    fixed patterns do.
+
+    """
+
+    params = ["scipy", "numba", "numeric"]
+    param_names = ["implementation"]
+    timeout = 300
+
+    def setup(self, implementation):
+        warnings.simplefilter("ignore", sparse.NumbaExperimentalFeatureWarning)
+        n_rows = N_ROWS // 10
+        rng = np.random.default_rng(0)
+        self.A = scipy.sparse.random(
+            n_rows, n_rows, density=1e-4, format="csr", random_state=rng
+        )
+        self.B = scipy.sparse.random(
+            n_rows, n_rows, density=1e-4, format="csr", random_state=rng
+        )
+        if implementation == "scipy":
+            self.function = lambda A, B: A @ B
+        elif implementation == "numba":
+            self.function = sparse.csr_spgemm
+        else:
+            indptr = sparse.csr_spgemm_symbolic(self.A, self.B)
+            self.function = lambda A, B: sparse.csr_spgemm_numeric(A, B, indptr)
+        self.function(self.A, self.B)
+
+    def time_spgemm(self, implementation):
+        self.function(self.A, self.B)
@@ -0,0 +1,269 @@
+"""Benchmarks for calling scipy.special functions from nopython code."""
+import numba
+import numpy as np
+import scipy.special as sc
+
+from numba_scipy import config
+from numba_scipy.special import (approximations, batch, kernels, memo,
+                                 native, overloads, sequences, signatures)
+
+
+def make_sum_loop(function):
+
+    @numba.njit
+    def sum_loop(x):
+        total = 0.0
+        for i in range(x.shape[0]):
+            total += function(x[i])
+        return total
+
+    return sum_loop
+
+
+class CallOverhead:
+    """Per-call cost of a cheap kernel through the native and ctypes paths."""
+
+    params = ['native', 'ctypes']
+    param_names = ['binding']
+
+    def setup(self, binding):
+        self.x = np.linspace(0.1, 5.0, 100_000)
+        if binding == 'native':
+            function = sc.gamma
+        else:
+            function = signatures.name_and_types_to_pointer[
+                ('gamma', numba.types.float64)
+            ]
+        self.sum_loop = make_sum_loop(function)
+        self.sum_loop(self.x)
+
+    def time_gamma(self, binding):
+        self.sum_loop(self.x)
+
+
+class NativeKernels:
+    """Pure-Numba kernels against the Cython kernels they replace."""
+
+    params = (['expit', 'log_expit', 'erf', 'ndtr', 'gammaln'],
+              ['native', 'cython'])
+    param_names = ['function', 'implementation']
+
+    def setup(self, name, implementation):
+        self.x = np.linspace(-5.0, 5.0, 100_000)
+        if implementation == 'native':
+            function = native.get_native_kernel(
+                name, (numba.types.float64, numba.types.float64)
+            )
+        else:
+            kernel = kernels.get_kernel(name, (numba.types.float64,))
+            function = numba.njit(lambda x: kernel((x,)))
+        self.sum_loop = make_sum_loop(function)
+        self.sum_loop(self.x)
+
+    def time_sum(self, name, implementation):
+        self.sum_loop(self.x)
+
+
+APPROXIMATION_INTERVALS = {
+    'gammaln': (0.5, 50.0),
+    'digamma': (1.0, 100.0),
+    'erfinv': (-0.99, 0.99),
+    'ndtri': (0.01, 0.99),
+    'i0e': (0.0, 50.0),
+}
+
+
+class Approximations:
+    """Tabulated approximations against the exact kernels."""
+
+    params = (list(APPROXIMATION_INTERVALS), ['approximation', 'exact'])
+    param_names = ['function', 'implementation']
+
+    def setup(self, name, implementation):
+        lower, upper = APPROXIMATION_INTERVALS[name]
+        self.x = np.random.default_rng(0).uniform(lower, upper, 100_000)
+        if implementation == 'approximation':
+            function = approximations.make_approximation(
+                name, lower, upper, rtol=1e-10, atol=1e-13
+            )
+        else:
+            sc_function = getattr(sc, name)
+            function = numba.njit(lambda x: sc_function(x))
+        self.sum_loop = make_sum_loop(function)
+        self.sum_loop(self.x)
+
+    def time_sum(self, name, implementation):
+        self.sum_loop(self.x)
+
+
+SEQUENCES = {
+    'legendre': (sequences.legendre_all, sc.eval_legendre),
+    'jv': (sequences.jv_sequence, sc.jv),
+    'iv': (sequences.iv_sequence, sc.iv),
+}
+
+
+class Sequences:
+    """All orders up to n at once, against one call per order."""
+
+    params = (['legendre', 'jv', 'iv'], [10, 100], ['sequence', 'orders'])
+    param_names = ['function', 'n', 'implementation']
+
+    def setup(self, name, n, implementation):
+        sequence, sc_function = SEQUENCES[name]
+        self.x = np.linspace(0.1, 0.9, 1_000)
+        if implementation == 'sequence':
+            @numba.njit
+            def evaluate(x):
+                out = np.empty(n + 1)
+                total = 0.0
+                for i in range(x.shape[0]):
+                    total += sequence(n, x[i], out).sum()
+                return total
+        else:
+            @numba.njit
+            def evaluate(x):
+                total = 0.0
+                for i in range(x.shape[0]):
+                    for k in range(n + 1):
+                        total += sc_function(k, x[i])
+                return total
+        self.evaluate = evaluate
+        self.evaluate(self.x)
+
+    def time_evaluate(self, name, n, implementation):
+        self.evaluate(self.x)
+
+
+class Reductions:
+    """logsumexp and softmax over the rows of a matrix."""
+
+    params = (['logsumexp', 'softmax', 'log_softmax'], ['numba', 'scipy'])
+    param_names = ['function', 'implementation']
+
+    def setup(self, name, implementation):
+        sc_function = getattr(sc, name)
+        self.x = np.random.default_rng(0).normal(size=(1_000, 1_000))
+        if implementation == 'numba':
+            self.function = numba.njit(lambda x: sc_function(x, axis=1))
+        else:
+            self.function = lambda x: sc_function(x, axis=1)
+        self.function(self.x)
+
+    def time_rows(self, name, implementation):
+        self.function(self.x)
+
+
+class Memoization:
+    """hyp2f1 over a few repeated arguments, with and without a cache."""
+
+    params = ([None, 'direct', 'lru'],)
+    param_names = ['policy']
+
+    def setup(self, policy):
+        rng = np.random.default_rng(0)
+        index = rng.integers(0, 20, 100_000)
+        self.params = rng.uniform(0.5, 2.0, (20, 3))[index]
+        self.z = rng.uniform(-0.9, 0.5, 20)[index]
+        if policy is None:
+            hyp2f1 = sc.hyp2f1
+        else:
+            hyp2f1 = memo.memoize('hyp2f1', size=64, policy=policy)
+
+        @numba.njit
+        def evaluate(params, z):
+            total = 0.0
+            for i in range(z.shape[0]):
+                total += hyp2f1(params[i, 0], params[i, 1], params[i, 2],
+                                z[i])
+            return total
+
+        self.evaluate = evaluate
+        self.evaluate(self.params, self.z)
+
+    def time_evaluate(self, policy):
+        self.evaluate(self.params, self.z)
+
+
+BATCH_ARGUMENTS = {
+    'gammainc': ((0.5,), np.linspace(0.01, 10.0, 100_000)),
+    'gammaincc': ((7.5,), np.linspace(0.01, 30.0, 100_000)),
+    'betainc': ((2.5, 4.0), np.linspace(0.0, 1.0, 100_000)),
+    'hyp2f1': ((0.5, 1.5, 2.5), np.linspace(-5.0, 0.99, 100_000)),
+}
+
+
+class Batch:
+    """Fixed parameters over an array, with and without hoisted setup."""
+
+    params = (list(BATCH_ARGUMENTS), ['batch', 'ufunc'])
+    param_names = ['function', 'implementation']
+
+    def setup(self, name, implementation):
+        self.args, self.x = BATCH_ARGUMENTS[name]
+        if implementation == 'batch':
+            function = getattr(batch, name)
+        else:
+            function = getattr(sc, name)
+        self.function = numba.njit(lambda *args: function(*args))
+        self.function(*self.args, self.x)
+
+    def time_evaluate(self, name, implementation):
+        self.function(*self.args, self.x)
+
+
+class SinglePrecision:
+    """float32 arrays, promoted to double kernels or in float32 mode."""
+
+    params = (['erf', 'ndtr', 'gammaln', 'xlogy'], [False, True])
+    param_names = ['function', 'float32']
+
+    def setup(self, name, float32):
+        # The setting is read when the call is compiled.
+        config.SPECIAL_FLOAT32 = float32
+        x = np.random.default_rng(0).standard_normal(1_000_000)
+        x = x.astype(np.float32)
+        self.args = (x, np.abs(x))[:getattr(sc, name).nin]
+        implementation = overloads.choose_kernel(name)(
+            tuple(numba.typeof(arg) for arg in self.args), None
+        )
+        self.function = numba.njit(implementation)
+        self.function(*self.args)
+
+    def time_array(self, name, float32):
+        self.function(*self.args)
+
+
+# Functions expensive enough for the parallel array path to pay off, with
+# arguments in a range where they are well defined.
+PARALLEL_ARGUMENTS = {
+    'hyp2f1': lambda x: (0.5, 1.5, 2.5, np.linspace(-0.9, 0.9, x)),
+    'hyperu': lambda x: (1.5, 0.5, np.linspace(0.1, 10.0, x)),
+    'struve': lambda x: (1.0, np.linspace(0.1, 50.0, x)),
+    'jv': lambda x: (2.5, np.linspace(0.1, 50.0, x)),
+}
+
+
+class ParallelScaling:
+    """Array evaluation split over Numba's threading layer, against SciPy."""
+
+    params = (list(PARALLEL_ARGUMENTS), ['scipy', 1, 2, 4, 8, 16])
+    param_names = ['function', 'threads']
+    timeout = 300
+
+    def setup(self, name, threads):
+        if threads != 'scipy' and threads > numba.config.NUMBA_NUM_THREADS:
+            raise NotImplementedError('not enough threads')
+        # The setting is read when the call is compiled.
+        config.SPECIAL_PARALLEL_THRESHOLD = 2**14
+        self.args = PARALLEL_ARGUMENTS[name](1_000_000)
+        sc_function = getattr(sc, name)
+        if threads == 'scipy':
+            self.function = sc_function
+        else:
+            numba.set_num_threads(threads)
+            self.function = numba.njit(lambda *args: sc_function(*args))
+            self.function(*self.args)
+
+    def time_array(self, name, threads):
+        self.function(*self.args)
@@ -0,0 +1,41 @@
+"""Settings of numba-scipy, read from environment variables at import."""
+import os
+
+
+def _readenv(name, ctor, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return ctor(value)
+    except Exception:
+        import warnings
+        warnings.warn(
+            "environ {} defined but failed to parse '{}'".format(name, value),
+            RuntimeWarning,
+        )
+        return default
+
+
+# Number of elements from which `scipy.special` functions called with
+# arrays are evaluated in parallel over Numba's threading layer. Zero
+# disables the parallel path.
+SPECIAL_PARALLEL_THRESHOLD = _readenv('NUMBA_SCIPY_PARALLEL_THRESHOLD', int, 0)
+
+# Number of chunks the parallel path splits the work into per thread.
+# More chunks balance kernels whose cost varies with their arguments
+# better, at the price of more scheduling overhead.
+SPECIAL_PARALLEL_CHUNKS_PER_THREAD = _readenv(
+    'NUMBA_SCIPY_PARALLEL_CHUNKS_PER_THREAD', int, 4
+)
+
+# Number of stored elements from which products of sparse matrices are
+# computed in parallel over Numba's threading layer. Zero disables the
+# parallel path.
+SPARSE_PARALLEL_THRESHOLD = _readenv('NUMBA_SCIPY_SPARSE_PARALLEL_THRESHOLD', int, 0)
+
+# Whether calls whose arguments are all float32 use the single-precision
+# implementations of `numba_scipy.special.single`, for the functions
+# whose kernels only exist in double precision, instead of promoting the
+# arguments to float64.
+SPECIAL_FLOAT32 = bool(_readenv('NUMBA_SCIPY_FLOAT32', int, 0))
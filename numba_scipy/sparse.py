@@ -1,8 +1,14 @@
+import operator
 import warnings
+
+import numba
 import numpy as np
 import scipy as sp
 import scipy.sparse
 from numba import types
+from numba.np import numpy_support
+
+from . import config
 
 try:
     from numba.core import cgutils
@@ -223,3 +229,542 @@ def overload_sparse_copy(inst):
         )
 
     return copy
+
+
+def _make_sparse_constructor(matrix_type):
+    @intrinsic
+    def construct(typingctx, data, indices, indptr, shape):
+        """Return a matrix of `matrix_type` holding the given arrays."""
+        typ = matrix_type(data.dtype)
+
+        def _construct(context, builder, sig, args):
+            struct = cgutils.create_struct_proxy(typ)(context, builder)
+            struct.data, struct.indices, struct.indptr, struct.shape = (
+                context.cast(builder, value, fromty, toty)
+                for value, fromty, toty in zip(
+                    args, sig.args, (typ.data, typ.indices, typ.indptr, typ.shape)
+                )
+            )
+            return impl_ret_borrowed(context, builder, typ, struct._getvalue())
+
+        return typ(data, indices, indptr, shape), _construct
+
+    return construct
+
+
+_csr_matrix = _make_sparse_constructor(CSRMatrixType)
+_csc_matrix = _make_sparse_constructor(CSCMatrixType)
+
+
+@overload_method(CSMatrixType, "transpose")
+def overload_sparse_transpose(inst):
+
+    if not isinstance(inst, CSMatrixType):
+        return
+
+    # Like SciPy, the transpose of a CSR matrix is a CSC matrix over the
+    # same arrays, and conversely, so nothing is copied.
+    construct = _csc_matrix if isinstance(inst, CSRMatrixType) else _csr_matrix
+
+    def transpose(inst):
+        return construct(
+            inst.data, inst.indices, inst.indptr, (inst.shape[1], inst.shape[0])
+        )
+
+    return transpose
+
+
+@overload_attribute(CSMatrixType, "T")
+def overload_sparse_T(inst):
+
+    if not isinstance(inst, CSMatrixType):
+        return
+
+    def T(inst):
+        return inst.transpose()
+
+    return T
+
+
+def _zero(a):
+    pass
+
+
+@overload(_zero)
+def _zero_overload(a):
+    zero = numpy_support.as_dtype(a.dtype).type(0)
+    return lambda a: zero
+
+
+def _is_none(arg):
+    return arg is None or isinstance(arg, (types.NoneType, types.Omitted))
+
+
+def _is_dense(x):
+    return (
+        isinstance(x, types.Array)
+        and x.ndim in (1, 2)
+        and isinstance(x.dtype, types.Number)
+    )
+
+
+def _result_dtype(a, b):
+    return np.result_type(numpy_support.as_dtype(a), numpy_support.as_dtype(b))
+
+
+@numba.njit
+def _contiguous(A):
+    # The arrays of a matrix are typed as of any layout, so indexing them
+    # multiplies by their strides. Views with a C layout are returned for
+    # the contiguous ones, which are the common case, and copies otherwise.
+    return (
+        np.ascontiguousarray(A.indptr),
+        np.ascontiguousarray(A.indices),
+        np.ascontiguousarray(A.data),
+    )
+
+
+@numba.njit
+def _check_matvec(A, x, out):
+    if x.shape[0] != A.shape[1]:
+        raise ValueError("dimension mismatch")
+    if out.shape[0] != A.shape[0]:
+        raise ValueError("out has the wrong shape")
+
+
+@numba.njit
+def _csr_matvec_rows(A, x, out, start, stop):
+    indptr, indices, data = _contiguous(A)
+    for i in range(start, stop):
+        s = _zero(out)
+        # Indexing with unsigned integers saves the checks for negative
+        # indices in the inner loop.
+        for k in range(np.uintp(indptr[i]), np.uintp(indptr[i + 1])):
+            s += data[k] * x[np.uintp(indices[k])]
+        out[i] = s
+
+
+@numba.njit
+def _balanced_bounds(indptr, n_parts):
+    """Return the bounds of `n_parts` ranges of rows.
+
+    The ranges have about equal numbers of stored elements, rather than of
+    rows.
+
+    """
+    n_rows = indptr.shape[0] - 1
+    nnz = indptr[n_rows]
+    targets = nnz * np.arange(n_parts + 1) // n_parts
+    bounds = np.searchsorted(indptr[:n_rows], targets)
+    bounds[n_parts] = n_rows
+    return bounds
+
+
+@numba.njit
+def csr_matvec(A, x, out):
+    """Compute `A @ x` into `out` for a CSR matrix `A` and a vector `x`."""
+    _check_matvec(A, x, out)
+    _csr_matvec_rows(A, x, out, 0, A.shape[0])
+    return out
+
+
+@numba.njit(parallel=True)
+def parallel_csr_matvec(A, x, out):
+    """Compute `A @ x` into `out` for a CSR matrix `A` and a vector `x`.
+
+    The rows are split over Numba's threading layer in as many ranges as there
+    are threads, with about equal numbers of stored elements rather than rows,
+    so that a few dense rows don't leave the other threads idle.
+
+    """
+    _check_matvec(A, x, out)
+    n_parts = max(1, min(numba.get_num_threads(), A.shape[0]))
+    bounds = _balanced_bounds(A.indptr, n_parts)
+    for part in numba.prange(n_parts):
+        _csr_matvec_rows(A, x, out, bounds[part], bounds[part + 1])
+    return out
+
+
+@numba.njit
+def _csc_matvec_columns(A, x, out, start, stop):
+    # Adds the products of the columns from `start` to `stop` to `out`.
+    indptr, indices, data = _contiguous(A)
+    for j in range(start, stop):
+        xj = x[j]
+        for k in range(np.uintp(indptr[j]), np.uintp(indptr[j + 1])):
+            out[np.uintp(indices[k])] += data[k] * xj
+
+
+@numba.njit
+def csc_matvec(A, x, out):
+    """Compute `A @ x` into `out` for a CSC matrix `A` and a vector `x`."""
+    _check_matvec(A, x, out)
+    out[:] = 0
+    _csc_matvec_columns(A, x, out, 0, A.shape[1])
+    return out
+
+
+@numba.njit(parallel=True)
+def parallel_csc_matvec(A, x, out):
+    """Compute `A @ x` into `out` for a CSC matrix `A` and a vector `x`.
+
+    The columns scatter into any element of `out`, so they are split over
+    Numba's threading layer in ranges with about equal numbers of stored
+    elements, each of which accumulates into a buffer of its own. The
+    buffers are then summed by rows.
+
+    """
+    _check_matvec(A, x, out)
+    n_parts = max(1, min(numba.get_num_threads(), A.shape[1]))
+    bounds = _balanced_bounds(A.indptr, n_parts)
+    buffers = np.zeros((n_parts, A.shape[0]), out.dtype)
+    for part in numba.prange(n_parts):
+        _csc_matvec_columns(A, x, buffers[part], bounds[part], bounds[part + 1])
+    for i in numba.prange(A.shape[0]):
+        s = _zero(out)
+        for part in range(n_parts):
+            s += buffers[part, i]
+        out[i] = s
+    return out
+
+
+# Number of columns of the dense operand of a product computed at once. The
+# block of a row of the result then stays in the L1 cache while rows of the
+# operand are added to it.
+MATMAT_BLOCK = 256
+
+
+def _c_contiguous(out):
+    pass
+
+
+def _copy_back(out, result):
+    pass
+
+
+@overload(_c_contiguous)
+def _c_contiguous_overload(out):
+    if out.layout == "C":
+        return lambda out: out
+    # The kernels address C-contiguous arrays by offsets, so products into
+    # other layouts are computed into a buffer and copied by `_copy_back`.
+    return lambda out: np.empty(out.shape, out.dtype)
+
+
+@overload(_copy_back)
+def _copy_back_overload(out, result):
+    if out.layout == "C":
+        return lambda out, result: None
+
+    def copy_back(out, result):
+        out[...] = result
+
+    return copy_back
+
+
+@numba.njit
+def _check_matmat(A, B, out):
+    if B.shape[0] != A.shape[1]:
+        raise ValueError("dimension mismatch")
+    if out.shape[0] != A.shape[0] or out.shape[1] != B.shape[1]:
+        raise ValueError("out has the wrong shape")
+
+
+@numba.njit
+def _csr_matmat_rows(A, B, out, start, stop):
+    # `B` and `out` are C-contiguous and viewed as 1-d arrays, in which
+    # the blocks of their rows are at offsets.
+    indptr, indices, data = _contiguous(A)
+    flat_B = B.reshape(B.size)
+    flat_out = out.reshape(out.size)
+    n_columns = out.shape[1]
+    k = np.uintp(n_columns)
+    for i in range(start, stop):
+        for c0 in range(0, n_columns, MATMAT_BLOCK):
+            width = np.uintp(min(MATMAT_BLOCK, n_columns - c0))
+            row = np.uintp(i) * k + np.uintp(c0)
+            for c in range(width):
+                flat_out[row + c] = 0
+            for p in range(np.uintp(indptr[i]), np.uintp(indptr[i + 1])):
+                a = data[p]
+                row_B = np.uintp(indices[p]) * k + np.uintp(c0)
+                for c in range(width):
+                    flat_out[row + c] += a * flat_B[row_B + c]
+
+
+@numba.njit
+def _csc_matmat_columns(A, B, out, start, stop):
+    # Adds the products of `A` with the columns from `start` to `stop` of
+    # `B` to those of `out`, both C-contiguous and viewed as 1-d arrays.
+    indptr, indices, data = _contiguous(A)
+    flat_B = B.reshape(B.size)
+    flat_out = out.reshape(out.size)
+    k = np.uintp(out.shape[1])
+    for c0 in range(start, stop, MATMAT_BLOCK):
+        width = np.uintp(min(MATMAT_BLOCK, stop - c0))
+        for j in range(A.shape[1]):
+            row_B = np.uintp(j) * k + np.uintp(c0)
+            for p in range(np.uintp(indptr[j]), np.uintp(indptr[j + 1])):
+                a = data[p]
+                row = np.uintp(indices[p]) * k + np.uintp(c0)
+                for c in range(width):
+                    flat_out[row + c] += a * flat_B[row_B + c]
+
+
+@numba.njit
+def csr_matmat(A, B, out):
+    """Compute `A @ B` into `out` for a CSR matrix `A` and a 2-d array `B`."""
+    _check_matmat(A, B, out)
+    result = _c_contiguous(out)
+    _csr_matmat_rows(A, np.ascontiguousarray(B), result, 0, A.shape[0])
+    _copy_back(out, result)
+    return out
+
+
+@numba.njit(parallel=True)
+def parallel_csr_matmat(A, B, out):
+    """Compute `A @ B` into `out` for a CSR matrix `A` and a 2-d array `B`.
+
+    Like for `parallel_csr_matvec`, the rows are split over Numba's threading
+    layer in panels with about equal numbers of stored elements.
+
+    """
+    _check_matmat(A, B, out)
+    result = _c_contiguous(out)
+    B = np.ascontiguousarray(B)
+    n_parts = max(1, min(numba.get_num_threads(), A.shape[0]))
+    bounds = _balanced_bounds(A.indptr, n_parts)
+    for part in numba.prange(n_parts):
+        _csr_matmat_rows(A, B, result, bounds[part], bounds[part + 1])
+    _copy_back(out, result)
+    return out
+
+
+@numba.njit
+def csc_matmat(A, B, out):
+    """Compute `A @ B` into `out` for a CSC matrix `A` and a 2-d array `B`."""
+    _check_matmat(A, B, out)
+    result = _c_contiguous(out)
+    result[...] = 0
+    _csc_matmat_columns(A, np.ascontiguousarray(B), result, 0, B.shape[1])
+    _copy_back(out, result)
+    return out
+
+
+@numba.njit(parallel=True)
+def parallel_csc_matmat(A, B, out):
+    """Compute `A @ B` into `out` for a CSC matrix `A` and a 2-d array `B`.
+
+    The columns of `A` scatter into any row of the result, so the columns of
+    `B` are split over Numba's threading layer instead, and each thread
+    computes the matching columns of the result. There are at most as many
+    parts as columns of `B`.
+
+    """
+    _check_matmat(A, B, out)
+    result = _c_contiguous(out)
+    result[...] = 0
+    B = np.ascontiguousarray(B)
+    n_columns = B.shape[1]
+    n_parts = max(1, min(numba.get_num_threads(), n_columns))
+    for part in numba.prange(n_parts):
+        _csc_matmat_columns(
+            A,
+            B,
+            result,
+            part * n_columns // n_parts,
+            (part + 1) * n_columns // n_parts,
+        )
+    _copy_back(out, result)
+    return out
+
+
+# Largest number of stored elements of a matrix with int32 indices.
+MAX_NNZ = np.iinfo(np.int32).max
+
+
+def _spgemm_data(A, B, nnz):
+    pass
+
+
+@overload(_spgemm_data)
+def _spgemm_data_overload(A, B, nnz):
+    dtype = _result_dtype(A.dtype, B.dtype)
+    return lambda A, B, nnz: np.zeros(nnz, dtype)
+
+
+@numba.njit
+def _check_spgemm(A, B):
+    if B.shape[0] != A.shape[1]:
+        raise ValueError("dimension mismatch")
+
+
+@numba.njit
+def csr_spgemm_symbolic(A, B):
+    """Return the `indptr` array of `A @ B` for CSR matrices `A` and `B`.
+
+    It gives the number of stored elements of each row of the product, and can
+    be passed to `csr_spgemm_numeric` for any matrices with the same patterns
+    as `A` and `B`.
+
+    """
+    _check_spgemm(A, B)
+    a_indptr, a_indices, _ = _contiguous(A)
+    b_indptr, b_indices, _ = _contiguous(B)
+    # Last row in which each column was seen, so that it's counted once.
+    last_row = np.full(B.shape[1], -1, np.int64)
+    indptr = np.empty(A.shape[0] + 1, np.int32)
+    indptr[0] = 0
+    nnz = 0
+    for i in range(A.shape[0]):
+        for p in range(np.uintp(a_indptr[i]), np.uintp(a_indptr[i + 1])):
+            k = np.uintp(a_indices[p])
+            for q in range(np.uintp(b_indptr[k]), np.uintp(b_indptr[k + 1])):
+                j = np.uintp(b_indices[q])
+                if last_row[j] != i:
+                    last_row[j] = i
+                    nnz += 1
+        if nnz > MAX_NNZ:
+            raise ValueError("the product has too many stored elements")
+        indptr[i + 1] = nnz
+    return indptr
+
+
+@numba.njit
+def csr_spgemm_numeric(A, B, indptr):
+    """Return `A @ B` as a CSR matrix, for CSR matrices `A` and `B`.
+
+    `indptr` is the result of `csr_spgemm_symbolic` for `A` and `B`, or for
+    matrices with the same patterns. The result gets a copy of it, so that it
+    can be reused after the result is changed in place.
+    Like in SciPy, the columns within rows are in the order they are reached,
+    rather than sorted. Unlike in SciPy, elements that sum to zero are stored,
+    so that the pattern only depends on those of `A` and `B`.
+
+    """
+    _check_spgemm(A, B)
+    if indptr.shape[0] != A.shape[0] + 1:
+        raise ValueError("indptr doesn't match the matrices")
+    a_indptr, a_indices, a_data = _contiguous(A)
+    b_indptr, b_indices, b_data = _contiguous(B)
+    nnz = indptr[A.shape[0]]
+    indices = np.empty(nnz, np.int32)
+    data = _spgemm_data(A, B, nnz)
+    # Position in `data` of each column. Positions before the start of the
+    # current row are left from earlier rows, and mean the column is new.
+    position = np.full(B.shape[1], -1, np.int64)
+    for i in range(A.shape[0]):
+        start = indptr[i]
+        stop = indptr[i + 1]
+        end = start
+        for p in range(np.uintp(a_indptr[i]), np.uintp(a_indptr[i + 1])):
+            a = a_data[p]
+            k = np.uintp(a_indices[p])
+            for q in range(np.uintp(b_indptr[k]), np.uintp(b_indptr[k + 1])):
+                j = np.uintp(b_indices[q])
+                r = position[j]
+                if r >= start:
+                    data[r] += a * b_data[q]
+                elif end < stop:
+                    position[j] = end
+                    indices[end] = j
+                    data[end] = a * b_data[q]
+                    end += 1
+                else:
+                    raise ValueError("indptr doesn't match the matrices")
+        if end != stop:
+            raise ValueError("indptr doesn't match the matrices")
+    return _csr_matrix(data, indices, indptr.copy(), (A.shape[0], B.shape[1]))
+
+
+@numba.njit
+def csr_spgemm(A, B):
+    """Return `A @ B` as a CSR matrix, for CSR matrices `A` and `B`."""
+    return csr_spgemm_numeric(A, B, csr_spgemm_symbolic(A, B))
+
+
+def _make_spgemm(A, B, out):
+    """Return a jitted `product(A, B, out)` computing `A @ B`, or `None`.
+
+    Both matrices must have the same format, which is that of the result, and
+    `out` must be `None`.
+
+    """
+    if not (type(A) is type(B) and isinstance(A, CSMatrixType) and _is_none(out)):
+        return None
+    if isinstance(A, CSRMatrixType):
+        return numba.njit(lambda A, B, out: csr_spgemm(A, B))
+    # The transposes of CSC matrices are CSR matrices, so the product is the
+    # transpose of B.T @ A.T.
+    return numba.njit(lambda A, B, out: csr_spgemm(B.T, A.T).T)
+
+
+def _make_product(A, x, out):
+    """Return a jitted `product(A, x, out)` computing `A @ x`, or `None`.
+
+    `x` is a sparse matrix, or a 1-d or 2-d array, and `out` may be `None`.
+    Products of matrices and arrays are computed in parallel for matrices of
+    at least `config.SPARSE_PARALLEL_THRESHOLD` stored elements.
+
+    """
+    if not isinstance(A, CSMatrixType):
+        return None
+    if isinstance(x, CSMatrixType):
+        return _make_spgemm(A, x, out)
+    if not _is_dense(x):
+        return None
+    is_csr = isinstance(A, CSRMatrixType)
+    if x.ndim == 1 and is_csr:
+        serial_product, parallel_product = csr_matvec, parallel_csr_matvec
+    elif x.ndim == 1:
+        serial_product, parallel_product = csc_matvec, parallel_csc_matvec
+    elif is_csr:
+        serial_product, parallel_product = csr_matmat, parallel_csr_matmat
+    else:
+        serial_product, parallel_product = csc_matmat, parallel_csc_matmat
+    threshold = config.SPARSE_PARALLEL_THRESHOLD
+
+    @numba.njit
+    def product_into(A, x, out):
+        if 0 < threshold <= A.indptr[A.indptr.shape[0] - 1]:
+            return parallel_product(A, x, out)
+        return serial_product(A, x, out)
+
+    if _is_none(out):
+        dtype = _result_dtype(A.dtype, x.dtype)
+        if x.ndim == 1:
+            return numba.njit(
+                lambda A, x, out: product_into(A, x, np.empty(A.shape[0], dtype))
+            )
+        return numba.njit(
+            lambda A, x, out: product_into(
+                A, x, np.empty((A.shape[0], x.shape[1]), dtype)
+            )
+        )
+    if _is_dense(out) and out.ndim == x.ndim:
+        return product_into
+    return None
+
+
+@overload(operator.matmul)
+def overload_sparse_matmul(a, b):
+    product = _make_product(a, b, None)
+    if product is None:
+        return None
+    return lambda a, b: product(a, b, None)
+
+
+@overload(np.dot)
+def overload_sparse_np_dot(a, b, out=None):
+    product = _make_product(a, b, out)
+    if product is None:
+        return None
+    return lambda a, b, out=None: product(a, b, out)
+
+
+@overload_method(CSMatrixType, "dot")
+def overload_sparse_dot(inst, other, out=None):
+    product = _make_product(inst, other, out)
+    if product is None:
+        return None
+    return lambda inst, other, out=None: product(inst, other, out)
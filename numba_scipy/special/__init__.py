@@ -1,3 +1,4 @@
 from . import overloads as _overloads
+from . import reductions as _reductions  # noqa: F401
 
 _overloads.add_overloads()
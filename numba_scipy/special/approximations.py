@@ -0,0 +1,174 @@
+"""Piecewise Chebyshev approximations of `scipy.special` functions.
+
+Some workloads, like Monte Carlo simulations, evaluate a function of one
+variable many times over a known interval and can do with less than full
+accuracy. `make_approximation` tabulates such a function once and
+returns a jitted evaluator that costs a table lookup and a short
+polynomial evaluation instead of a call to the kernel:
+
+    >>> from numba_scipy.special.approximations import make_approximation
+    >>> digamma = make_approximation('digamma', 1.0, 100.0, rtol=1e-10)
+    >>> digamma(2.5)
+
+The evaluator can be called from nopython code. Outside of the interval,
+or for NaN, it calls the exact kernel.
+
+"""
+import numba
+import numpy as np
+import scipy.special as sc
+from numba.types import float64
+
+from . import signatures
+
+
+def chebyshev_nodes(degree):
+    """Return the Chebyshev nodes of the first kind on [-1, 1]."""
+    n = degree + 1
+    return np.cos(np.pi * (np.arange(n) + 0.5) / n)
+
+
+def chebyshev_to_power(degree):
+    """Return the matrix mapping Chebyshev coefficients to power ones."""
+    n = degree + 1
+    matrix = np.zeros((n, n))
+    for k in range(n):
+        power = np.polynomial.chebyshev.cheb2poly(np.eye(n)[k])
+        matrix[k, :len(power)] = power
+    return matrix
+
+
+def fit_pieces(function, lower, upper, n_pieces, degree):
+    """Return the coefficients of polynomials interpolating `function`.
+
+    The interval is split into `n_pieces` pieces of equal width, and
+    `function` is interpolated at the Chebyshev nodes of each piece. The
+    result has one row of `degree + 1` coefficients per piece, lowest
+    power first, for the piece mapped to [-1, 1].
+
+    """
+    n = degree + 1
+    nodes = chebyshev_nodes(degree)
+    edges = np.linspace(lower, upper, n_pieces + 1)
+    half_widths = (edges[1:] - edges[:-1]) / 2
+    centers = edges[:-1] + half_widths
+    values = function(centers[:, None] + half_widths[:, None] * nodes)
+    angles = np.pi * np.outer(np.arange(n), np.arange(n) + 0.5) / n
+    coefficients = 2.0 / n * values @ np.cos(angles).T
+    coefficients[:, 0] /= 2
+    # Horner's scheme has half the latency of Clenshaw's recurrence, and
+    # the power basis is well conditioned enough on [-1, 1] for small
+    # degrees.
+    coefficients = coefficients @ chebyshev_to_power(degree)
+    # The coefficients of smooth functions decay quickly, down to values
+    # that are subnormal or that don't change the result. Drop those:
+    # arithmetic on subnormal numbers is very slow on most CPUs.
+    scale = np.max(np.abs(coefficients), axis=1, keepdims=True)
+    coefficients[np.abs(coefficients) < np.finfo(np.float64).eps * scale] = 0
+    return coefficients
+
+
+def evaluate_pieces(coefficients, lower, upper, x):
+    """Evaluate the piecewise polynomial at the points `x`."""
+    n_pieces = coefficients.shape[0]
+    y = (x - lower) * (n_pieces / (upper - lower))
+    i = np.minimum(y.astype(np.intp), n_pieces - 1)
+    t = 2.0 * (y - i) - 1.0
+    result = coefficients[i, -1]
+    for j in range(coefficients.shape[1] - 2, -1, -1):
+        result = result * t + coefficients[i, j]
+    return result
+
+
+def make_evaluator(sc_function, lower, upper, coefficients):
+    n_pieces, n_coefficients = coefficients.shape
+    scale = n_pieces / (upper - lower)
+
+    # Inlining the evaluator lets LLVM overlap the evaluations of
+    # consecutive iterations of the calling loop.
+    @numba.njit(error_model='numpy', inline='always')
+    def approximation(x):
+        if not lower <= x <= upper:
+            return sc_function(x)
+        y = (x - lower) * scale
+        i = min(int(y), n_pieces - 1)
+        t = 2.0 * (y - i) - 1.0
+        result = coefficients[i, n_coefficients - 1]
+        for j in range(n_coefficients - 2, -1, -1):
+            result = result * t + coefficients[i, j]
+        return result
+
+    return approximation
+
+
+def make_approximation(name, lower, upper, rtol=1e-10, atol=0.0, degree=8,
+                       max_pieces=4096):
+    """Build a fast approximation of `scipy.special.<name>` on an interval.
+
+    The interval is split into pieces of equal width, and the function
+    is interpolated on each piece by a polynomial of `degree` at the
+    Chebyshev nodes of the piece. The number of pieces is doubled until
+    the error, measured between the interpolation nodes, is at most
+    `atol + rtol * abs(exact)`.
+
+    Parameters
+    ----------
+    name : str
+        Name of a function of one variable in `scipy.special` with a
+        float64 kernel.
+    lower, upper : float
+        Interval on which the function is approximated. It must not
+        contain poles or other points where the function isn't finite.
+    rtol, atol : float
+        Relative and absolute target error.
+    degree : int
+        Degree of the polynomial on each piece.
+    max_pieces : int
+        Largest number of pieces tried before giving up. The table holds
+        `max_pieces * (degree + 1)` doubles and is compiled into the
+        evaluator.
+
+    Returns
+    -------
+    approximation : numba dispatcher
+        Function of one float64 argument, which can be called from
+        Python and from nopython code. Outside of `[lower, upper]` it
+        returns the exact value.
+
+    Raises
+    ------
+    ValueError
+        If the function isn't finite on the interval, or if the target
+        error can't be reached with `max_pieces` pieces.
+
+    """
+    sc_function = getattr(sc, name, None)
+    try:
+        # Aliases like `digamma` only exist as ufuncs, whose name is the
+        # one of the kernel.
+        signatures.kernel_index.pointer(sc_function.__name__, float64)
+    except (AttributeError, KeyError):
+        raise ValueError(
+            '{} has no float64 kernel of one argument'.format(name)
+        ) from None
+    if not lower < upper:
+        raise ValueError('lower must be smaller than upper')
+
+    n_pieces = 1
+    while n_pieces <= max_pieces:
+        coefficients = fit_pieces(sc_function, lower, upper, n_pieces, degree)
+        if not np.all(np.isfinite(coefficients)):
+            raise ValueError(
+                '{} is not finite on [{}, {}]'.format(name, lower, upper)
+            )
+        # Check the error between and at the nodes, where it is largest.
+        x = np.linspace(lower, upper, 4 * (degree + 1) * n_pieces + 1)
+        exact = sc_function(x)
+        error = np.abs(evaluate_pieces(coefficients, lower, upper, x) - exact)
+        if np.all(error <= atol + rtol * np.abs(exact)):
+            return make_evaluator(sc_function, lower, upper, coefficients)
+        n_pieces *= 2
+    raise ValueError(
+        'could not approximate {} on [{}, {}] with rtol={} and atol={} '
+        'using {} pieces'.format(name, lower, upper, rtol, atol, max_pieces)
+    )
@@ -0,0 +1,950 @@
+"""Batch evaluation with fixed parameters.
+
+Calls like `gammainc(a, x)`, `betainc(a, b, x)` or `hyp2f1(a, b, c, x)`
+over an array of `x` with fixed parameters repeat the setup depending on
+the parameters only, like logarithms of gamma functions, for every
+element. The functions in this module are ports of the Cephes
+implementations used by SciPy, split so that this setup is computed once
+per call:
+
+    >>> from numba_scipy.special import batch
+    >>> batch.betainc(2.5, 4.0, x)
+
+They take the parameters as scalars, an array `x` of any shape, and an
+optional `out` array of the same shape, and can be called from nopython
+code. Like the native kernels, they don't report errors through
+`sf_error`.
+
+There is no batch `hyp1f1`. Depending on its version, SciPy computes it
+with the Fortran `specfun` routines or with Boost, whose series and
+recurrences have no setup depending on `a` and `b` only worth hoisting,
+and a port of either wouldn't match the version installed.
+
+"""
+import math
+
+import numba
+import numpy as np
+import scipy.special as sc
+from numba import types
+from numba.extending import overload
+
+MACHEP = 1.11022302462515654042e-16
+MAXLOG = 7.09782712893383996843e2
+MINLOG = -7.451332191019412076235e2
+MAXGAM = 171.624376956302725
+MAXITER = 2000
+BIG = 4.503599627370496e15
+BIGINV = 2.22044604925031308085e-16
+EULER = 0.577215664901532860606512090082402431
+
+# Bounds of the regime where `igam` and `igamc` use Temme's asymptotic
+# series, for which the kernels are called.
+SMALL = 20.0
+LARGE = 200.0
+SMALLRATIO = 0.3
+LARGERATIO = 4.5
+
+LANCZOS_G = 6.024680040776729583740234375
+LANCZOS_NUM = np.array([
+    0.006061842346248906525783753964555936883222,
+    0.5098416655656676188125178644804694509993,
+    19.51992788247617482847860966235652136208,
+    449.9445569063168119446858607650988409623,
+    6955.999602515376140356310115515198987526,
+    75999.29304014542649875303443598909137092,
+    601859.6171681098786670226533699352302507,
+    3481712.15498064590882071018964774556468,
+    14605578.08768506808414169982791359218571,
+    43338889.32467613834773723740590533316085,
+    86363131.28813859145546927288977868422342,
+    103794043.1163445451906271053616070238554,
+    56906521.91347156388090791033559122686859,
+])
+LANCZOS_DENOM = np.array([
+    1.0, 66.0, 1925.0, 32670.0, 357423.0, 2637558.0, 13339535.0,
+    45995730.0, 105258076.0, 150917976.0, 120543840.0, 39916800.0, 0.0,
+])
+
+
+def _flat_view(out):
+    pass
+
+
+def _copy_back(out, flat_out):
+    pass
+
+
+@overload(_flat_view)
+def _flat_view_overload(out):
+    if out.layout == 'C':
+        return lambda out: out.reshape(out.size)
+    # Other layouts can't be viewed as 1-d arrays, so the values are
+    # computed into a buffer and copied by `_copy_back`.
+    return lambda out: np.empty(out.size)
+
+
+@overload(_copy_back)
+def _copy_back_overload(out, flat_out):
+    if out.layout == 'C':
+        return lambda out, flat_out: None
+
+    def copy_back(out, flat_out):
+        out[...] = flat_out.reshape(out.shape)
+
+    return copy_back
+
+
+@numba.njit
+def _flat_arrays(x, out):
+    """Return `x` and the output as 1-d arrays, and the output."""
+    if out is None:
+        result = np.empty(x.shape)
+    else:
+        if out.shape != x.shape:
+            raise ValueError("out must have the shape of x")
+        result = out
+    x = np.ascontiguousarray(x)
+    return x.reshape(x.size), _flat_view(result), result
+
+
+@numba.njit(error_model='numpy')
+def _lanczos_sum_expg_scaled(x):
+    # Cephes `ratevl`, which evaluates in 1/x for large x.
+    n = LANCZOS_NUM.shape[0]
+    if abs(x) <= 1.0:
+        p = LANCZOS_NUM[0]
+        q = LANCZOS_DENOM[0]
+        for i in range(1, n):
+            p = p * x + LANCZOS_NUM[i]
+            q = q * x + LANCZOS_DENOM[i]
+        return p / q
+    y = 1.0 / x
+    p = LANCZOS_NUM[n - 1]
+    q = LANCZOS_DENOM[n - 1]
+    for i in range(n - 2, -1, -1):
+        p = p * y + LANCZOS_NUM[i]
+        q = q * y + LANCZOS_DENOM[i]
+    return p / q
+
+
+@numba.njit(error_model='numpy')
+def _log1pmx(x):
+    if abs(x) < 0.5:
+        xfac = x
+        res = 0.0
+        for n in range(2, MAXITER):
+            xfac *= -x
+            term = xfac / n
+            res += term
+            if abs(term) < MACHEP * abs(res):
+                break
+        return res
+    return math.log1p(x) - x
+
+
+@numba.njit(error_model='numpy')
+def _lgam1p_taylor(x):
+    if x == 0.0:
+        return 0.0
+    res = -EULER * x
+    xfac = -x
+    for n in range(2, 42):
+        xfac *= -x
+        # zeta(n, 1) = 1 + zetac(n)
+        coeff = (1.0 + sc.zetac(float(n))) * xfac / n
+        res += coeff
+        if abs(coeff) < MACHEP * abs(res):
+            break
+    return res
+
+
+@numba.njit(error_model='numpy')
+def _lgam1p(x):
+    # log(gamma(1 + x)), accurate for small x.
+    if abs(x) <= 0.5:
+        return _lgam1p_taylor(x)
+    if abs(x - 1.0) < 0.5:
+        return math.log(x) + _lgam1p_taylor(x - 1.0)
+    return sc.gammaln(x + 1.0)
+
+
+@numba.njit(error_model='numpy')
+def _igam_fac(a, x, lgam_a, lanczos):
+    # Cephes `igam_fac`: x**a * exp(-x) / gamma(a)
+    if abs(a - x) > 0.4 * abs(a):
+        ax = a * math.log(x) - x - lgam_a
+        if ax < -MAXLOG:
+            return 0.0
+        return math.exp(ax)
+    fac = a + LANCZOS_G - 0.5
+    res = math.sqrt(fac / math.e) / lanczos
+    if a < 200.0 and x < 200.0:
+        res *= math.exp(a - x) * math.pow(x / fac, a)
+    else:
+        num = x - a - LANCZOS_G + 0.5
+        res *= math.exp(
+            a * _log1pmx(num / fac) + x * (0.5 - LANCZOS_G) / fac
+        )
+    return res
+
+
+@numba.njit(error_model='numpy')
+def _igam_series(a, x, lgam_a, lanczos):
+    ax = _igam_fac(a, x, lgam_a, lanczos)
+    if ax == 0.0:
+        return 0.0
+    r = a
+    c = 1.0
+    ans = 1.0
+    for _ in range(MAXITER):
+        r += 1.0
+        c *= x / r
+        ans += c
+        if c <= MACHEP * ans:
+            break
+    return ans * ax / a
+
+
+@numba.njit(error_model='numpy')
+def _igamc_series(a, x, lgam_a, lgam1p_a):
+    fac = 1.0
+    total = 0.0
+    for n in range(1, MAXITER):
+        fac *= -x / n
+        term = fac / (a + n)
+        total += term
+        if abs(term) <= MACHEP * abs(total):
+            break
+    logx = math.log(x)
+    term = -math.expm1(a * logx - lgam1p_a)
+    return term - math.exp(a * logx - lgam_a) * total
+
+
+@numba.njit(error_model='numpy')
+def _igamc_continued_fraction(a, x, lgam_a, lanczos):
+    ax = _igam_fac(a, x, lgam_a, lanczos)
+    if ax == 0.0:
+        return 0.0
+    y = 1.0 - a
+    z = x + y + 1.0
+    c = 0.0
+    pkm2 = 1.0
+    qkm2 = x
+    pkm1 = x + 1.0
+    qkm1 = z * x
+    ans = pkm1 / qkm1
+    for _ in range(MAXITER):
+        c += 1.0
+        y += 1.0
+        z += 2.0
+        yc = y * c
+        pk = pkm1 * z - pkm2 * yc
+        qk = qkm1 * z - qkm2 * yc
+        if qk != 0.0:
+            r = pk / qk
+            t = abs((ans - r) / r)
+            ans = r
+        else:
+            t = 1.0
+        pkm2 = pkm1
+        pkm1 = pk
+        qkm2 = qkm1
+        qkm1 = qk
+        if abs(pk) > BIG:
+            pkm2 *= BIGINV
+            pkm1 *= BIGINV
+            qkm2 *= BIGINV
+            qkm1 *= BIGINV
+        if t <= MACHEP:
+            break
+    return ans * ax
+
+
+@numba.njit(error_model='numpy')
+def _is_asymptotic(a, x):
+    absxma_a = abs(x - a) / a
+    if SMALL < a < LARGE and absxma_a < SMALLRATIO:
+        return True
+    return a > LARGE and absxma_a < LARGERATIO / math.sqrt(a)
+
+
+@numba.njit(error_model='numpy')
+def _igamc(a, x, lgam_a, lgam1p_a, lanczos):
+    # Cephes `igamc` for finite x > 0 outside of the asymptotic regime.
+    if x > 1.1:
+        if x < a:
+            return 1.0 - _igam_series(a, x, lgam_a, lanczos)
+        return _igamc_continued_fraction(a, x, lgam_a, lanczos)
+    if x <= 0.5:
+        use_igam = -0.4 / math.log(x) < a
+    else:
+        use_igam = x * 1.1 < a
+    if use_igam:
+        return 1.0 - _igam_series(a, x, lgam_a, lanczos)
+    return _igamc_series(a, x, lgam_a, lgam1p_a)
+
+
+@numba.njit(error_model='numpy')
+def _gammainc(a, x, out, complement):
+    x, flat_out, out = _flat_arrays(x, out)
+    if a < 0.0:
+        flat_out[:] = np.nan
+        _copy_back(out, flat_out)
+        return out
+    # The setup depending on `a` only.
+    lgam_a = sc.gammaln(a)
+    lgam1p_a = _lgam1p(a)
+    lanczos = _lanczos_sum_expg_scaled(a)
+    for i in range(x.shape[0]):
+        xi = x[i]
+        # The special cases are checked in the order of Cephes, which
+        # gives some results for NaN arguments.
+        if xi < 0.0:
+            p = np.nan
+        elif a == 0.0:
+            p = 1.0 if xi > 0.0 else np.nan
+        elif xi == 0.0:
+            p = 0.0
+        elif math.isinf(a):
+            p = np.nan if math.isinf(xi) else 0.0
+        elif math.isinf(xi):
+            p = 1.0
+        elif math.isnan(a) or math.isnan(xi):
+            p = np.nan
+        elif _is_asymptotic(a, xi):
+            # Temme's expansion has little setup to share.
+            if complement:
+                flat_out[i] = sc.gammaincc(a, xi)
+            else:
+                flat_out[i] = sc.gammainc(a, xi)
+            continue
+        elif complement:
+            flat_out[i] = _igamc(a, xi, lgam_a, lgam1p_a, lanczos)
+            continue
+        elif xi > 1.0 and xi > a:
+            p = 1.0 - _igamc(a, xi, lgam_a, lgam1p_a, lanczos)
+        else:
+            p = _igam_series(a, xi, lgam_a, lanczos)
+        flat_out[i] = 1.0 - p if complement else p
+    _copy_back(out, flat_out)
+    return out
+
+
+@numba.njit
+def gammainc(a, x, out=None):
+    """Regularized lower incomplete gamma function for fixed `a`."""
+    return _gammainc(a, x, out, False)
+
+
+@numba.njit
+def gammaincc(a, x, out=None):
+    """Regularized upper incomplete gamma function for fixed `a`."""
+    return _gammainc(a, x, out, True)
+
+
+@numba.njit(error_model='numpy')
+def _incbet_pseries(a, b, x, inv_beta, lbeta):
+    # Power series for small b*x.
+    ai = 1.0 / a
+    u = (1.0 - b) * x
+    v = u / (a + 1.0)
+    t1 = v
+    t = u
+    n = 2.0
+    s = 0.0
+    z = MACHEP * ai
+    while abs(v) > z:
+        u = (n - b) * x / n
+        t *= u
+        v = t / (a + n)
+        s += v
+        n += 1.0
+    s += t1
+    s += ai
+    u = a * math.log(x)
+    if a + b < MAXGAM and abs(u) < MAXLOG:
+        return s * inv_beta * math.pow(x, a)
+    t = -lbeta + u + math.log(s)
+    if t < MINLOG:
+        return 0.0
+    return math.exp(t)
+
+
+@numba.njit(error_model='numpy')
+def _incbet_continued_fraction(x, k1, k2, k3, k4, k5, k6, k7, k8, d2, d6):
+    # The continued fractions of Cephes `incbcf` and `incbd`, whose
+    # coefficients k2 and k6 change by d2 and d6 at each step.
+    pkm2 = 0.0
+    qkm2 = 1.0
+    pkm1 = 1.0
+    qkm1 = 1.0
+    ans = 1.0
+    r = 1.0
+    thresh = 3.0 * MACHEP
+    for _ in range(300):
+        xk = -(x * k1 * k2) / (k3 * k4)
+        pk = pkm1 + pkm2 * xk
+        qk = qkm1 + qkm2 * xk
+        pkm2 = pkm1
+        pkm1 = pk
+        qkm2 = qkm1
+        qkm1 = qk
+        xk = (x * k5 * k6) / (k7 * k8)
+        pk = pkm1 + pkm2 * xk
+        qk = qkm1 + qkm2 * xk
+        pkm2 = pkm1
+        pkm1 = pk
+        qkm2 = qkm1
+        qkm1 = qk
+        if qk != 0.0:
+            r = pk / qk
+        if r != 0.0:
+            t = abs((ans - r) / r)
+            ans = r
+        else:
+            t = 1.0
+        if t < thresh:
+            break
+        k1 += 1.0
+        k2 += d2
+        k3 += 2.0
+        k4 += 2.0
+        k5 += 1.0
+        k6 += d6
+        k7 += 2.0
+        k8 += 2.0
+        if abs(qk) + abs(pk) > BIG:
+            pkm2 *= BIGINV
+            pkm1 *= BIGINV
+            qkm2 *= BIGINV
+            qkm1 *= BIGINV
+        if abs(qk) < BIGINV or abs(pk) < BIGINV:
+            pkm2 *= BIG
+            pkm1 *= BIG
+            qkm2 *= BIG
+            qkm1 *= BIG
+    return ans
+
+
+@numba.njit(error_model='numpy')
+def _incbet(aa, bb, xx, inv_beta, lbeta):
+    # Cephes `incbet` for aa, bb > 0 or NaN, with 1/beta(aa, bb) and its
+    # logarithm given.
+    if xx <= 0.0 or xx >= 1.0:
+        if xx == 0.0:
+            return 0.0
+        if xx == 1.0:
+            return 1.0
+        return np.nan
+    if math.isnan(aa) or math.isnan(bb) or math.isnan(xx):
+        return np.nan
+    if bb * xx <= 1.0 and xx <= 0.95:
+        return _incbet_pseries(aa, bb, xx, inv_beta, lbeta)
+    w = 1.0 - xx
+    # Reverse a and b if x is greater than the mean.
+    flag = xx > aa / (aa + bb)
+    if flag:
+        a = bb
+        b = aa
+        xc = xx
+        x = w
+    else:
+        a = aa
+        b = bb
+        xc = w
+        x = xx
+    if flag and b * x <= 1.0 and x <= 0.95:
+        t = _incbet_pseries(a, b, x, inv_beta, lbeta)
+    else:
+        # Choose the expansion for better convergence.
+        y = x * (a + b - 2.0) - (a - 1.0)
+        if y < 0.0:
+            w = _incbet_continued_fraction(
+                x, a, a + b, a, a + 1.0, 1.0, b - 1.0, a + 1.0, a + 2.0,
+                1.0, -1.0,
+            )
+        else:
+            w = _incbet_continued_fraction(
+                x / (1.0 - x), a, b - 1.0, a, a + 1.0, 1.0, a + b, a + 1.0,
+                a + 2.0, -1.0, 1.0,
+            ) / xc
+        # Multiply w by x**a * (1 - x)**b / (a * beta(a, b)).
+        y = a * math.log(x)
+        t = b * math.log(xc)
+        if a + b < MAXGAM and abs(y) < MAXLOG and abs(t) < MAXLOG:
+            t = math.pow(xc, b)
+            t *= math.pow(x, a)
+            t /= a
+            t *= w
+            t *= inv_beta
+        else:
+            y += t - lbeta
+            y += math.log(w / a)
+            t = 0.0 if y < MINLOG else math.exp(y)
+    if flag:
+        if t <= MACHEP:
+            return 1.0 - MACHEP
+        return 1.0 - t
+    return t
+
+
+@numba.njit(error_model='numpy')
+def betainc(a, b, x, out=None):
+    """Regularized incomplete beta function for fixed `a` and `b`."""
+    x, flat_out, out = _flat_arrays(x, out)
+    if a <= 0.0 or b <= 0.0:
+        flat_out[:] = np.nan
+        _copy_back(out, flat_out)
+        return out
+    # The setup depending on `a` and `b` only, which are symmetric.
+    inv_beta = 1.0 / sc.beta(a, b)
+    lbeta = sc.betaln(a, b)
+    for i in range(x.shape[0]):
+        flat_out[i] = _incbet(a, b, x[i], inv_beta, lbeta)
+    _copy_back(out, flat_out)
+    return out
+
+
+# Tolerances of Cephes `hyp2f1`.
+HYP2F1_EPS = 1.0e-13
+HYP2F1_ETHRESH = 1.0e-12
+HYP2F1_MAXITER = 10000
+
+# Indices of the values depending on the parameters of `hyp2f1` only,
+# which are computed by `_hyp2f1_constants`.
+GAMMA_C = 0
+AT_ONE = 1
+INVERSE_P = 2
+INVERSE_Q = 3
+COMPLEMENT_Q = 4
+COMPLEMENT_R = 5
+PSI_0 = 6
+PSI_GAMMA_1 = 7
+PSI_GAMMA_2 = 8
+PSI_ZERO = 9
+PSI_SUM = 10
+PSI_SERIES = 11
+
+# Number of terms of the psi function expansion computed at a time.
+PSI_TERMS_BLOCK = 64
+
+_HYP2F1_KEY = types.UniTuple(types.float64, 3)
+_HYP2F1_VALUE = types.float64[::1]
+
+
+@numba.njit(error_model='numpy')
+def _lgam_sgn(x):
+    return sc.gammaln(x), sc.gammasgn(x)
+
+
+@numba.njit(error_model='numpy')
+def _hyp2f1_constants(a, b, c):
+    """Return the gamma and psi functions used by `hyp2f1(a, b, c, x)`.
+
+    These are the values of `x = 1`, the factors of the transformations
+    in 1/x and 1 - x, and those of the psi function expansion for integer
+    c - a - b.
+
+    """
+    constants = np.empty(12)
+    d = c - a - b
+    gamma_c = sc.gamma(c)
+    constants[GAMMA_C] = gamma_c
+    constants[AT_ONE] = gamma_c * sc.gamma(d) / (
+        sc.gamma(c - a) * sc.gamma(c - b)
+    )
+    constants[INVERSE_P] = gamma_c * sc.gamma(b - a) / (
+        sc.gamma(b) * sc.gamma(c - a)
+    )
+    constants[INVERSE_Q] = gamma_c * sc.gamma(a - b) / (
+        sc.gamma(a) * sc.gamma(c - b)
+    )
+    w, sign = _lgam_sgn(d)
+    lgam, sgn = _lgam_sgn(c - a)
+    w -= lgam
+    sign *= sgn
+    lgam, sgn = _lgam_sgn(c - b)
+    w -= lgam
+    sign *= sgn
+    constants[COMPLEMENT_Q] = sign * math.exp(w)
+    w, sign = _lgam_sgn(-d)
+    lgam, sgn = _lgam_sgn(a)
+    w -= lgam
+    sign *= sgn
+    lgam, sgn = _lgam_sgn(b)
+    w -= lgam
+    sign *= sgn
+    constants[COMPLEMENT_R] = sign * math.exp(w)
+    if np.rint(d) >= 0.0:
+        e = d
+        d1 = d
+        d2 = 0.0
+    else:
+        e = -d
+        d1 = 0.0
+        d2 = d
+    constants[PSI_0] = (
+        sc.psi(1.0) + sc.psi(1.0 + e) - sc.psi(a + d1) - sc.psi(b + d1)
+    )
+    constants[PSI_GAMMA_1] = sc.gamma(e + 1.0)
+    constants[PSI_GAMMA_2] = sc.gamma(e + 2.0)
+    constants[PSI_ZERO] = gamma_c / (sc.gamma(a) * sc.gamma(b))
+    constants[PSI_SUM] = sc.gamma(e) * gamma_c / (
+        sc.gamma(a + d1) * sc.gamma(b + d1)
+    )
+    constants[PSI_SERIES] = gamma_c / (sc.gamma(a + d2) * sc.gamma(b + d2))
+    return constants
+
+
+@numba.njit(error_model='numpy')
+def _get_constants(cache, a, b, c):
+    # The transformations call `hyp2f1` with other parameters, which
+    # are fixed too, so the values are kept for each set of them.
+    constants = cache[0]
+    if math.isnan(a + b + c):
+        return _hyp2f1_constants(a, b, c)
+    key = (a, b, c)
+    if key not in constants:
+        constants[key] = _hyp2f1_constants(a, b, c)
+    return constants[key]
+
+
+@numba.njit(error_model='numpy')
+def _get_psi_terms(cache, a, b, c, n):
+    """Return at least `n` terms of the psi function expansion.
+
+    Term `t - 1` is psi(1 + t) + psi(1 + t + e) - psi(a + t + d1)
+    - psi(b + t + d1), for the `e` and `d1` of `_hyt2f1`. They only
+    depend on the parameters, and are computed in blocks as the series
+    for some `x` needs more of them.
+
+    """
+    psi_terms = cache[1]
+    key = (a, b, c)
+    if key in psi_terms:
+        terms = psi_terms[key]
+        if terms.shape[0] >= n:
+            return terms
+    else:
+        terms = np.empty(0)
+    d = c - a - b
+    if np.rint(d) >= 0.0:
+        e = d
+        d1 = d
+    else:
+        e = -d
+        d1 = 0.0
+    start = terms.shape[0]
+    size = max(n, min(max(2 * start, PSI_TERMS_BLOCK), HYP2F1_MAXITER))
+    new_terms = np.empty(size)
+    new_terms[:start] = terms
+    for k in range(start, size):
+        t = k + 1.0
+        new_terms[k] = (sc.psi(1.0 + t) + sc.psi(1.0 + t + e)
+                        - sc.psi(a + t + d1) - sc.psi(b + t + d1))
+    if not math.isnan(a + b + c):
+        psi_terms[key] = new_terms
+    return new_terms
+
+
+@numba.njit(error_model='numpy')
+def _hyp2f1_neg_c_equal_bc(a, b, x):
+    # The polynomial for b = c a negative integer.
+    collector = 1.0
+    total = 1.0
+    collector_max = 1.0
+    if not abs(b) < 1e5:
+        return np.nan
+    k = 1.0
+    while k <= -b:
+        collector *= (a + k - 1.0) * x / k
+        collector_max = max(abs(collector), collector_max)
+        total += collector
+        k += 1.0
+    if 1e-16 * (1.0 + collector_max / abs(total)) > 1e-7:
+        return np.nan
+    return total
+
+
+@numba.njit(error_model='numpy')
+def _hys2f1(a, b, c, x):
+    # The power series, and its estimated relative error.
+    if abs(b) > abs(a):
+        a, b = b, a
+    ib = np.rint(b)
+    intflag = False
+    if abs(b - ib) < HYP2F1_EPS and ib <= 0.0 and abs(b) < abs(a):
+        # Except when `b` is a smaller negative integer.
+        a, b = b, a
+        intflag = True
+    if ((abs(a) > abs(c) + 1.0 or intflag) and abs(c - a) > 2.0
+            and abs(a) > 2.0):
+        # Large cancellation errors are expected, which the recurrence in
+        # `a` reduces.
+        return _hyp2f1ra(a, b, c, x)
+    i = 0
+    umax = 0.0
+    s = 1.0
+    u = 1.0
+    k = 0.0
+    while True:
+        if abs(c) < HYP2F1_EPS:
+            return np.inf, 1.0
+        m = k + 1.0
+        u = u * ((a + k) * (b + k) * x / ((c + k) * m))
+        s += u
+        umax = max(abs(u), umax)
+        k = m
+        i += 1
+        if i > HYP2F1_MAXITER:
+            return s, 1.0
+        if s != 0.0 and not abs(u / s) > MACHEP:
+            break
+    return s, MACHEP * umax / abs(s) + MACHEP * i
+
+
+@numba.njit(error_model='numpy')
+def _hyp2f1ra(a, b, c, x):
+    # The recurrence in `a`, which doesn't cross c or zero.
+    if (c < 0.0 and a <= c) or (c >= 0.0 and a >= c):
+        da = np.rint(a - c)
+    else:
+        da = np.rint(a)
+    t = a - da
+    if not abs(da) <= HYP2F1_MAXITER:
+        return np.nan, 1.0
+    f1, loss = _hys2f1(t, b, c, x)
+    if da < 0.0:
+        f0, err = _hys2f1(t - 1.0, b, c, x)
+        t -= 1.0
+        for _ in range(1, int(-da)):
+            f2 = f1
+            f1 = f0
+            f0 = (-(2.0 * t - c - t * x + b * x) / (c - t) * f1
+                  - t * (x - 1.0) / (c - t) * f2)
+            t -= 1.0
+    else:
+        f0, err = _hys2f1(t + 1.0, b, c, x)
+        t += 1.0
+        for _ in range(1, int(da)):
+            f2 = f1
+            f1 = f0
+            f0 = -((2.0 * t - c - t * x + b * x) * f1
+                   + (c - t) * f2) / (t * (x - 1.0))
+            t += 1.0
+    return f0, loss + err
+
+
+@numba.njit(error_model='numpy')
+def _hyt2f1(a, b, c, x, cache):
+    # Cephes `hyt2f1`: the power series, after transformations for x
+    # close to -1 or 1, and its estimated relative error.
+    ia = np.rint(a)
+    ib = np.rint(b)
+    neg_int_a = a <= 0.0 and abs(a - ia) < HYP2F1_EPS
+    neg_int_b = b <= 0.0 and abs(b - ib) < HYP2F1_EPS
+    s = 1.0 - x
+    if x < -0.5 and not (neg_int_a or neg_int_b):
+        if b > a:
+            y, err = _hys2f1(a, c - b, c, -x / s)
+            return math.pow(s, -a) * y, err
+        y, err = _hys2f1(c - a, b, c, -x / s)
+        return math.pow(s, -b) * y, err
+    d = c - a - b
+    id = np.rint(d)
+    if not (x > 0.9 and not (neg_int_a or neg_int_b)):
+        return _hys2f1(a, b, c, x)
+    constants = _get_constants(cache, a, b, c)
+    if abs(d - id) > HYP2F1_EPS:
+        # Try the power series first, and then AMS55 #15.3.6.
+        y, err = _hys2f1(a, b, c, x)
+        if err < HYP2F1_ETHRESH:
+            return y, err
+        q, err = _hys2f1(a, b, 1.0 - d, s)
+        q *= constants[COMPLEMENT_Q]
+        r, err1 = _hys2f1(c - a, c - b, d + 1.0, s)
+        r = math.pow(s, d) * r
+        r *= constants[COMPLEMENT_R]
+        y = q + r
+        # The cancellation error.
+        err += err1 + MACHEP * max(abs(q), abs(r)) / y
+        return y * constants[GAMMA_C], err
+    # The psi function expansion, AMS55 #15.3.10, #15.3.11 and #15.3.12.
+    if not abs(id) <= HYP2F1_MAXITER:
+        # Also for NaN, whose conversion to int is undefined.
+        return np.nan, 1.0
+    if id >= 0.0:
+        e = d
+        d1 = d
+        d2 = 0.0
+        aid = int(id)
+    else:
+        e = -d
+        d1 = 0.0
+        d2 = d
+        aid = int(-id)
+    ax = math.log(s)
+    y = constants[PSI_0] - ax
+    y /= constants[PSI_GAMMA_1]
+    p = (a + d1) * (b + d1) * s / constants[PSI_GAMMA_2]
+    terms = _get_psi_terms(cache, a, b, c, 0)
+    t = 1.0
+    while True:
+        k = int(t) - 1
+        if k >= terms.shape[0]:
+            terms = _get_psi_terms(cache, a, b, c, k + 1)
+        r = terms[k] - ax
+        q = p * r
+        y += q
+        p *= s * (a + t + d1) / (t + 1.0)
+        p *= (b + t + d1) / (t + 1.0 + e)
+        t += 1.0
+        if t > HYP2F1_MAXITER:
+            return np.nan, 1.0
+        if y != 0.0 and not abs(q / y) > HYP2F1_EPS:
+            break
+    if id == 0.0:
+        return y * constants[PSI_ZERO], 0.0
+    y1 = 1.0
+    t = 0.0
+    p = 1.0
+    for _ in range(1, aid):
+        r = 1.0 - e + t
+        p *= s * (a + t + d2) * (b + t + d2) / r
+        t += 1.0
+        p /= t
+        y1 += p
+    y1 *= constants[PSI_SUM]
+    y *= constants[PSI_SERIES]
+    if aid & 1:
+        y = -y
+    q = math.pow(s, id)
+    if id > 0.0:
+        y *= q
+    else:
+        y1 *= q
+    return y + y1, 0.0
+
+
+@numba.njit(error_model='numpy')
+def _hyp2f1(a, b, c, x, cache):
+    # Cephes `hyp2f1`, with the values depending on the parameters only
+    # taken from `cache`, a tuple of dicts of the constants and of the
+    # terms of the psi function expansion for each set of parameters.
+    if x == 0.0:
+        return 1.0
+    # NaN parameters would make the transformations below loop over the
+    # integer conversion of NaN.
+    if math.isnan(a) or math.isnan(b) or math.isnan(c) or math.isnan(x):
+        return np.nan
+    ax = abs(x)
+    s = 1.0 - x
+    ia = np.rint(a)
+    ib = np.rint(b)
+    d = c - a - b
+    id = np.rint(d)
+    if (a == 0.0 or b == 0.0) and c != 0.0:
+        return 1.0
+    neg_int_a = a <= 0.0 and abs(a - ia) < HYP2F1_EPS
+    neg_int_b = b <= 0.0 and abs(b - ib) < HYP2F1_EPS
+    if (d <= -1.0 and not (abs(d - id) > HYP2F1_EPS and s < 0.0)
+            and not (neg_int_a or neg_int_b)):
+        return math.pow(s, d) * _hyp2f1(c - a, c - b, c, x, cache)
+    if d <= 0.0 and x == 1.0 and not (neg_int_a or neg_int_b):
+        return np.inf
+    if ax < 1.0 or x == -1.0:
+        # 2F1(a, b; b; x) = (1 - x)**(-a)
+        if abs(b - c) < HYP2F1_EPS:
+            if neg_int_b:
+                return _hyp2f1_neg_c_equal_bc(a, b, x)
+            return math.pow(s, -a)
+        if abs(a - c) < HYP2F1_EPS:
+            return math.pow(s, -b)
+    if c <= 0.0:
+        ic = np.rint(c)
+        if abs(c - ic) < HYP2F1_EPS:
+            # Unless the series terminates before the division by zero.
+            if (neg_int_a and ia > ic) or (neg_int_b and ib > ic):
+                return _hyt2f1(a, b, c, x, cache)[0]
+            return np.inf
+    if neg_int_a or neg_int_b:
+        # The function is a polynomial.
+        return _hyt2f1(a, b, c, x, cache)[0]
+    t1 = abs(b - a)
+    if x < -2.0 and abs(t1 - np.rint(t1)) > HYP2F1_EPS:
+        # The transformation in 1/x, which has a pole for integer b - a.
+        constants = _get_constants(cache, a, b, c)
+        p = _hyp2f1(a, 1.0 - c + a, 1.0 - b + a, 1.0 / x, cache)
+        q = _hyp2f1(b, 1.0 - c + b, 1.0 - a + b, 1.0 / x, cache)
+        p *= math.pow(-x, -a)
+        q *= math.pow(-x, -b)
+        return constants[INVERSE_P] * p + constants[INVERSE_Q] * q
+    if x < -1.0:
+        if abs(a) < abs(b):
+            return math.pow(s, -a) * _hyp2f1(a, c - b, c, x / (x - 1.0),
+                                             cache)
+        return math.pow(s, -b) * _hyp2f1(b, c - a, c, x / (x - 1.0), cache)
+    if ax > 1.0:
+        # The series diverges.
+        return np.inf
+    p = c - a
+    ia = np.rint(p)
+    r = c - b
+    ib = np.rint(r)
+    neg_int_ca_or_cb = ((ia <= 0.0 and abs(p - ia) < HYP2F1_EPS)
+                        or (ib <= 0.0 and abs(r - ib) < HYP2F1_EPS))
+    if abs(ax - 1.0) < HYP2F1_EPS:
+        if x > 0.0:
+            if neg_int_ca_or_cb:
+                if d >= 0.0:
+                    return math.pow(s, d) * _hys2f1(c - a, c - b, c, x)[0]
+                return np.inf
+            if d <= 0.0:
+                return np.inf
+            return _get_constants(cache, a, b, c)[AT_ONE]
+        if d <= -1.0:
+            return np.inf
+    if d < 0.0:
+        # Try the power series first, and then make d > 0 by the
+        # recurrence in c, AMS55 #15.2.27.
+        y, err = _hyt2f1(a, b, c, x, cache)
+        if err < HYP2F1_ETHRESH:
+            return y
+        if not abs(id) <= HYP2F1_MAXITER:
+            return np.nan
+        aid = int(2.0 - id)
+        e = c + aid
+        d2 = _hyp2f1(a, b, e, x, cache)
+        d1 = _hyp2f1(a, b, e + 1.0, x, cache)
+        q = a + b + 1.0
+        for _ in range(aid):
+            r = e - 1.0
+            y = ((e * (r - (2.0 * e - q) * x) * d2
+                  + (e - a) * (e - b) * x * d1) / (e * r * s))
+            e = r
+            d1 = d2
+            d2 = y
+        return y
+    if neg_int_ca_or_cb:
+        # The transformation for negative integer c - a or c - b, AMS55
+        # #15.3.3.
+        return math.pow(s, d) * _hys2f1(c - a, c - b, c, x)[0]
+    return _hyt2f1(a, b, c, x, cache)[0]
+
+
+@numba.njit(error_model='numpy')
+def hyp2f1(a, b, c, x, out=None):
+    """Gauss hypergeometric function 2F1 for fixed `a`, `b` and `c`."""
+    x, flat_out, out = _flat_arrays(x, out)
+    a = float(a)
+    b = float(b)
+    c = float(c)
+    cache = (
+        numba.typed.Dict.empty(_HYP2F1_KEY, _HYP2F1_VALUE),
+        numba.typed.Dict.empty(_HYP2F1_KEY, _HYP2F1_VALUE),
+    )
+    for i in range(x.shape[0]):
+        flat_out[i] = _hyp2f1(a, b, c, x[i], cache)
+    _copy_back(out, flat_out)
+    return out
@@ -0,0 +1,333 @@
+"""Call `cython_special` kernels from nopython code.
+
+Each kernel is declared in the generated LLVM module as an external
+function and called directly by name. The symbol is resolved by the JIT
+linker to the address exported through the Cython capsule, so unlike a
+ctypes function object no pointer is baked into the IR and LLVM knows
+what the callee may touch.
+
+Because the IR only refers to kernels by name, compiled code can be
+saved with `cache=True`. The addresses are only valid in the process
+that looked them up, so every function calling a kernel records a
+`KernelSymbol` in its Numba environment. The environments are pickled
+along with the cached code, and unpickling a `KernelSymbol` registers
+the address of the kernel in the new process before the cached code is
+linked.
+
+"""
+import platform
+import sys
+
+import llvmlite.binding as ll
+from llvmlite import ir
+from numba import types
+from numba.core import cgutils
+from numba.extending import get_cython_function_address, intrinsic
+
+from . import signatures
+
+SYMBOL_PREFIX = 'numba_scipy.special.'
+
+# The kernels only touch memory that the calling module cannot see: the
+# `sf_error` state of SciPy and `errno`. Declaring that lets LLVM keep
+# values in registers and move loads and stores across the call.
+KERNEL_ATTRIBUTES = ('nounwind', 'inaccessiblememonly')
+
+# Kernels with several outputs also write to the pointers they are
+# given, and to nothing else the caller can see.
+MULTI_OUTPUT_KERNEL_ATTRIBUTES = ('nounwind', 'inaccessiblemem_or_argmemonly')
+
+
+
+def _accepted_attributes(attribute_set, names):
+    """Return the attributes among `names` llvmlite accepts in `attribute_set`.
+
+    llvmlite follows the attributes of its LLVM version: llvmlite 0.50
+    dropped `nocapture`, which LLVM 21 replaced by `captures(none)`.
+    Attributes it rejects are left out, which only loses optimizations.
+
+    """
+    accepted = []
+    for name in names:
+        try:
+            attribute_set().add(name)
+        except ValueError:
+            continue
+        accepted.append(name)
+    return tuple(accepted)
+
+
+KERNEL_ATTRIBUTES = _accepted_attributes(
+    ir.values.FunctionAttributes, KERNEL_ATTRIBUTES
+)
+MULTI_OUTPUT_KERNEL_ATTRIBUTES = _accepted_attributes(
+    ir.values.FunctionAttributes, MULTI_OUTPUT_KERNEL_ATTRIBUTES
+)
+# The kernels neither keep the output pointers nor reach the memory they
+# point to in another way.
+OUTPUT_ARGUMENT_ATTRIBUTES = _accepted_attributes(
+    ir.values.ArgumentAttributes, ('nocapture', 'noalias')
+)
+
+IS_WINDOWS = sys.platform.startswith('win')
+IS_X86_64 = platform.machine().lower() in ('x86_64', 'amd64')
+
+_bound_symbols = set()
+_kernels = {}
+
+
+def get_symbol_name(mangled_name):
+    return SYMBOL_PREFIX + mangled_name
+
+
+def bind_kernel(mangled_name):
+    """Register the address of a kernel with the JIT linker.
+
+    Returns the symbol name the kernel can be declared with.
+
+    """
+    symbol_name = get_symbol_name(mangled_name)
+    if symbol_name not in _bound_symbols:
+        address = get_cython_function_address(
+            'scipy.special.cython_special', mangled_name
+        )
+        ll.add_symbol(symbol_name, address)
+        _bound_symbols.add(symbol_name)
+    return symbol_name
+
+
+class KernelSymbol:
+    """Keep a kernel bound when code calling it is loaded from the cache."""
+
+    def __init__(self, mangled_name):
+        self.mangled_name = mangled_name
+        self.symbol_name = bind_kernel(mangled_name)
+
+    def __reduce__(self):
+        return KernelSymbol, (self.mangled_name,)
+
+
+def add_kernel_symbol(context, mangled_name):
+    """Bind a kernel and record it in the environment being lowered.
+
+    Returns the symbol name the kernel can be declared with.
+
+    """
+    symbol = KernelSymbol(mangled_name)
+    environment = getattr(context, 'environment', None)
+    if environment is not None and not any(
+        isinstance(const, KernelSymbol) and const.mangled_name == mangled_name
+        for const in environment.consts
+    ):
+        environment.consts.append(symbol)
+    return symbol.symbol_name
+
+
+def declare_kernel(module, symbol_name, fnty, n_outputs=0):
+    """Declare a kernel whose last `n_outputs` arguments are output pointers."""
+    fn = module.globals.get(symbol_name)
+    if fn is None:
+        fn = ir.Function(module, fnty, symbol_name)
+        if n_outputs:
+            attributes = MULTI_OUTPUT_KERNEL_ATTRIBUTES
+        else:
+            attributes = KERNEL_ATTRIBUTES
+        for attribute in attributes:
+            fn.attributes.add(attribute)
+        for arg in fn.args[len(fn.args) - n_outputs:]:
+            for attribute in OUTPUT_ARGUMENT_ATTRIBUTES:
+                arg.add_attribute(attribute)
+    return fn
+
+
+def get_abi(typ):
+    """Return how the C ABI of this platform passes a value of type `typ`.
+
+    Numba represents complex numbers as a `{double, double}` (or `{float,
+    float}`) structure. Passed by value, LLVM splits such a structure
+    into its two members, which matches how C passes `double complex`
+    on x86-64 System V and how AArch64 passes both complex types.
+    Elsewhere the value has to be converted:
+
+    - `'vector'`: x86-64 System V passes `float complex` as a vector of
+      two floats in a single SSE register.
+    - `'integer'`: Windows x64 passes 8 byte structures in an integer
+      register.
+    - `'memory'`: Windows x64 passes larger structures through a pointer
+      to a copy, and returns them through a pointer passed as the first
+      argument.
+
+    """
+    if not isinstance(typ, types.Complex):
+        return 'value'
+    if IS_WINDOWS:
+        return 'integer' if typ.bitwidth == 64 else 'memory'
+    if IS_X86_64 and typ.bitwidth == 64:
+        return 'vector'
+    return 'value'
+
+
+def get_abi_type(context, typ):
+    value_type = context.get_value_type(typ)
+    abi = get_abi(typ)
+    if abi == 'vector':
+        return ir.VectorType(value_type.elements[0], 2)
+    if abi == 'integer':
+        return ir.IntType(typ.bitwidth)
+    if abi == 'memory':
+        return value_type.as_pointer()
+    return value_type
+
+
+def value_to_abi(context, builder, typ, value):
+    abi = get_abi(typ)
+    if abi == 'vector':
+        vector = ir.Constant(get_abi_type(context, typ), ir.Undefined)
+        for i in range(2):
+            vector = builder.insert_element(
+                vector, builder.extract_value(value, i), cgutils.int32_t(i)
+            )
+        return vector
+    if abi == 'integer':
+        ptr = cgutils.alloca_once_value(builder, value)
+        abi_ptr = builder.bitcast(ptr, get_abi_type(context, typ).as_pointer())
+        return builder.load(abi_ptr)
+    if abi == 'memory':
+        return cgutils.alloca_once_value(builder, value)
+    return value
+
+
+def value_from_abi(context, builder, typ, value):
+    abi = get_abi(typ)
+    if abi == 'vector':
+        struct = ir.Constant(context.get_value_type(typ), ir.Undefined)
+        for i in range(2):
+            struct = builder.insert_value(
+                struct, builder.extract_element(value, cgutils.int32_t(i)), i
+            )
+        return struct
+    if abi == 'integer':
+        ptr = cgutils.alloca_once_value(builder, value)
+        value_ptr = builder.bitcast(
+            ptr, context.get_value_type(typ).as_pointer()
+        )
+        return builder.load(value_ptr)
+    return value
+
+
+def call_kernel(context, builder, fn, return_type, arg_types, values):
+    """Call the kernel `fn` following the C ABI of the platform."""
+    args = [
+        value_to_abi(context, builder, typ, value)
+        for typ, value in zip(arg_types, values)
+    ]
+    if get_abi(return_type) == 'memory':
+        ret_ptr = cgutils.alloca_once(
+            builder, context.get_value_type(return_type)
+        )
+        builder.call(fn, [ret_ptr] + args)
+        return builder.load(ret_ptr)
+    return value_from_abi(
+        context, builder, return_type, builder.call(fn, args)
+    )
+
+
+def call_multi_output_kernel(context, builder, fn, return_type, arg_types,
+                             values):
+    """Call the kernel `fn` writing its outputs to stack slots.
+
+    The slots are allocated once in the entry block of the function, so
+    calling the kernel in a loop doesn't allocate anything. Returns the
+    outputs as a tuple.
+
+    """
+    args = [
+        value_to_abi(context, builder, typ, value)
+        for typ, value in zip(arg_types, values)
+    ]
+    slots = [
+        cgutils.alloca_once(builder, context.get_value_type(typ))
+        for typ in return_type
+    ]
+    builder.call(fn, args + slots)
+    outputs = [builder.load(slot) for slot in slots]
+    return context.make_tuple(builder, return_type, outputs)
+
+
+def get_kernel_fnty(context, return_type, arg_types):
+    """Return the LLVM type of a kernel following the C ABI of the platform."""
+    abi_arg_types = [get_abi_type(context, t) for t in arg_types]
+    if isinstance(return_type, types.BaseTuple):
+        # The outputs are written through pointers, which have the same
+        # layout as Numba's values for all supported types.
+        abi_arg_types += [
+            context.get_value_type(t).as_pointer() for t in return_type
+        ]
+        return ir.FunctionType(ir.VoidType(), abi_arg_types)
+    if get_abi(return_type) == 'memory':
+        abi_arg_types.insert(0, get_abi_type(context, return_type))
+        return ir.FunctionType(ir.VoidType(), abi_arg_types)
+    return ir.FunctionType(get_abi_type(context, return_type), abi_arg_types)
+
+
+def make_kernel(mangled_name, signature):
+    """Return an intrinsic calling the kernel `mangled_name`.
+
+    The intrinsic takes the arguments of the kernel packed in a tuple, so
+    that it can be called from implementations taking `*args`. They are
+    cast to the argument types of the kernel, which the caller must have
+    checked to be safe. Kernels with several outputs return their outputs
+    as a tuple.
+
+    """
+    return_type, *arg_types = signature
+    if isinstance(return_type, types.BaseTuple):
+        n_outputs = len(return_type)
+        call = call_multi_output_kernel
+    else:
+        n_outputs = 0
+        call = call_kernel
+
+    @intrinsic
+    def kernel(typingctx, args):
+        if (
+            not isinstance(args, types.BaseTuple)
+            or len(args) != len(arg_types)
+            or not all(
+                isinstance(arg, (types.Boolean, types.Number)) for arg in args
+            )
+        ):
+            return None
+
+        def codegen(context, builder, sig, llargs):
+            symbol_name = add_kernel_symbol(context, mangled_name)
+            fnty = get_kernel_fnty(context, return_type, arg_types)
+            fn = declare_kernel(builder.module, symbol_name, fnty, n_outputs)
+            values = [
+                context.cast(builder, value, from_type, to_type)
+                for value, from_type, to_type in zip(
+                    cgutils.unpack_tuple(builder, llargs[0], len(arg_types)),
+                    sig.args[0],
+                    arg_types,
+                )
+            ]
+            return call(context, builder, fn, return_type, arg_types, values)
+
+        return return_type(args), codegen
+
+    return kernel
+
+
+def get_kernel(name, arg_types):
+    """Return the intrinsic calling the specialization `name(*arg_types)`."""
+    key = (name, *arg_types)
+    kernel = _kernels.get(key)
+    if kernel is None:
+        for mangled_name, signature in signatures.kernel_index.signatures(name).items():
+            if signature[1:] == tuple(arg_types):
+                kernel = make_kernel(mangled_name, signature)
+                break
+        else:
+            raise KeyError(key)
+        _kernels[key] = kernel
+    return kernel
@@ -0,0 +1,387 @@
+"""Memoized `scipy.special` functions for repeated arguments.
+
+Code like the likelihood of a Bayesian model often evaluates expensive
+functions such as `hyp2f1` or `betainc` many times over a small set of
+arguments. `memoize` wraps the kernel of a function in a bounded cache,
+so repeated evaluations cost a hash and a lookup:
+
+    >>> from numba_scipy.special.memo import memoize
+    >>> hyp2f1 = memoize('hyp2f1', size=4096, policy='lru')
+    >>> hyp2f1(0.5, 1.5, 2.5, 0.3)
+    >>> hyp2f1.cache_info()
+
+The result can be called from nopython code, including in parallel
+loops: each thread has tables of its own. Callers sharing a thread id,
+like Python threads calling a function compiled with `nogil=True`,
+are serialized by a lock per thread, and callers finding it taken call
+the kernel without the cache.
+
+"""
+import collections
+
+import numba
+import numpy as np
+import scipy.special as sc
+from numba import types
+from numba.core import cgutils
+from numba.extending import intrinsic, overload
+from numba.np import numpy_support
+
+from . import overloads
+
+CacheInfo = collections.namedtuple(
+    'CacheInfo', ['hits', 'misses', 'maxsize', 'currsize']
+)
+
+POLICIES = ('direct', 'lru')
+
+# 2**64 divided by the golden ratio, as a signed 64-bit integer, for
+# Fibonacci hashing.
+GOLDEN = -7046029254386353131
+
+# Columns of the per-thread statistics.
+HITS = 0
+MISSES = 1
+CLOCK = 2
+# Nonzero while a caller uses the tables of the thread.
+LOCK = 3
+
+MEMO_TEMPLATE = '''
+def make_memoized(function, arg_types, lock, unlock, find, get_value, store):
+    {arg_type_names}, = arg_types
+
+    def memoized({args}):
+        {casts}
+        key = ({key},)
+        thread = numba.get_thread_id()
+        if not lock(thread):
+            # Another caller with the same thread id uses the tables.
+            return function({args})
+        hit, index = find(thread, key)
+        if hit:
+            value = get_value(index)
+        else:
+            value = function({args})
+            store(index, key, value)
+        unlock(thread)
+        return value
+
+    return memoized
+'''
+
+
+@intrinsic
+def _address_as_pointer(typingctx, address):
+    """Return a pointer to memory owned by Python.
+
+    Functions using the pointer are linked to the address of the current
+    process, so it is registered as a dynamic global, which Numba refuses
+    to cache.
+
+    """
+    if not isinstance(address, types.IntegerLiteral):
+        return None
+
+    def codegen(context, builder, signature, args):
+        return context.add_dynamic_addr(
+            builder, address.literal_value, info='memoization table'
+        )
+
+    return types.voidptr(address), codegen
+
+
+@intrinsic
+def _compare_and_swap(typingctx, array, index, expected, value):
+    """Set `array[index]` to `value` if it is `expected`, atomically.
+
+    Returns whether it was set. Loads and stores after it can't be moved
+    before it.
+
+    """
+    def codegen(context, builder, signature, args):
+        array_type = signature.args[0]
+        array, index, expected, value = args
+        pointer = cgutils.get_item_pointer(
+            context, builder, array_type,
+            context.make_array(array_type)(context, builder, array), [index],
+        )
+        result = builder.cmpxchg(
+            pointer, expected, value, 'acquire', 'monotonic'
+        )
+        return builder.extract_value(result, 1)
+
+    return types.boolean(array, index, array.dtype, array.dtype), codegen
+
+
+@intrinsic
+def _release(typingctx, array, index):
+    """Set `array[index]` to zero, after the loads and stores before it."""
+    def codegen(context, builder, signature, args):
+        array_type = signature.args[0]
+        array, index = args
+        pointer = cgutils.get_item_pointer(
+            context, builder, array_type,
+            context.make_array(array_type)(context, builder, array), [index],
+        )
+        builder.store_atomic(
+            pointer.type.pointee(0), pointer, 'release',
+            context.get_abi_alignment(pointer.type.pointee),
+        )
+        return context.get_dummy_value()
+
+    return types.none(array, index), codegen
+
+
+def _key_bits(x):
+    pass
+
+
+@overload(_key_bits)
+def _key_bits_overload(x):
+    if isinstance(x, types.Float):
+        return lambda x: np.float64(x).view(np.int64)
+    if isinstance(x, (types.Integer, types.Boolean)):
+        return lambda x: np.int64(x)
+    return None
+
+
+def make_table(n_threads, n_sets, ways, n_args, dtype):
+    """Return the arrays of a cache, and functions accessing them.
+
+    Slots are grouped in `n_sets` sets of `ways` slots. A key is looked
+    up in the set given by its hash, and replaces the least recently
+    used slot of the set when missing. Each thread has its own slots.
+
+    """
+    n_slots = n_sets * ways
+    arrays = {
+        'keys': np.zeros((n_threads * n_slots, n_args), np.int64),
+        'values': np.zeros(n_threads * n_slots, dtype),
+        # Time of the last use of each slot, zero for empty slots.
+        'stamps': np.zeros(n_threads * n_slots, np.int64),
+        'stats': np.zeros((n_threads, 4), np.int64),
+    }
+    keys_address = arrays['keys'].ctypes.data
+    values_address = arrays['values'].ctypes.data
+    stamps_address = arrays['stamps'].ctypes.data
+    stats_address = arrays['stats'].ctypes.data
+    keys_shape = arrays['keys'].shape
+    size = arrays['values'].size
+    stats_shape = arrays['stats'].shape
+    shift = 64 - (n_sets.bit_length() - 1)
+    set_mask = n_sets - 1
+
+    @numba.njit
+    def lock(thread):
+        """Return whether the tables of `thread` could be locked."""
+        if thread >= n_threads:
+            raise ValueError("the cache must have tables per thread")
+        stats = numba.carray(
+            _address_as_pointer(stats_address), stats_shape, np.int64
+        )
+        return _compare_and_swap(stats[thread], LOCK, 0, 1)
+
+    @numba.njit
+    def unlock(thread):
+        stats = numba.carray(
+            _address_as_pointer(stats_address), stats_shape, np.int64
+        )
+        _release(stats[thread], LOCK)
+
+    @numba.njit(error_model='numpy')
+    def find(thread, key):
+        keys = numba.carray(
+            _address_as_pointer(keys_address), keys_shape, np.int64
+        )
+        stamps = numba.carray(
+            _address_as_pointer(stamps_address), size, np.int64
+        )
+        stats = numba.carray(
+            _address_as_pointer(stats_address), stats_shape, np.int64
+        )
+        clock = stats[thread, CLOCK] + 1
+        stats[thread, CLOCK] = clock
+
+        h = 0
+        for k in key:
+            h = (h ^ k) * GOLDEN
+        if set_mask == 0:
+            first = thread * n_slots
+        else:
+            first = thread * n_slots + ((h >> shift) & set_mask) * ways
+
+        oldest = first
+        for index in range(first, first + ways):
+            if stamps[index] != 0:
+                same = True
+                for j in range(n_args):
+                    same = same and keys[index, j] == key[j]
+                if same:
+                    stamps[index] = clock
+                    stats[thread, HITS] += 1
+                    return True, index
+            if stamps[index] < stamps[oldest]:
+                oldest = index
+        stamps[oldest] = clock
+        stats[thread, MISSES] += 1
+        return False, oldest
+
+    @numba.njit
+    def get_value(index):
+        values = numba.carray(
+            _address_as_pointer(values_address), size, dtype
+        )
+        return values[index]
+
+    @numba.njit
+    def store(index, key, value):
+        keys = numba.carray(
+            _address_as_pointer(keys_address), keys_shape, np.int64
+        )
+        values = numba.carray(
+            _address_as_pointer(values_address), size, dtype
+        )
+        for j in range(n_args):
+            keys[index, j] = key[j]
+        values[index] = value
+
+    @numba.njit
+    def clear(thread):
+        """Empty the tables of `thread`, once no caller uses them."""
+        while not lock(thread):
+            pass
+        keys = numba.carray(
+            _address_as_pointer(keys_address), keys_shape, np.int64
+        )
+        values = numba.carray(
+            _address_as_pointer(values_address), size, dtype
+        )
+        stamps = numba.carray(
+            _address_as_pointer(stamps_address), size, np.int64
+        )
+        stats = numba.carray(
+            _address_as_pointer(stats_address), stats_shape, np.int64
+        )
+        first = thread * n_slots
+        for index in range(first, first + n_slots):
+            stamps[index] = 0
+            values[index] = 0
+            for j in range(n_args):
+                keys[index, j] = 0
+        stats[thread, HITS] = 0
+        stats[thread, MISSES] = 0
+        stats[thread, CLOCK] = 0
+        unlock(thread)
+
+    return arrays, lock, unlock, find, get_value, store, clear
+
+
+def get_template(n_args):
+    arg_names = ['x{}'.format(i) for i in range(n_args)]
+    source = MEMO_TEMPLATE.format(
+        args=', '.join(arg_names),
+        arg_type_names=', '.join('t{}'.format(i) for i in range(n_args)),
+        casts='\n        '.join(
+            '{0} = t{1}({0})'.format(arg, i) for i, arg in enumerate(arg_names)
+        ),
+        key=', '.join('_key_bits({})'.format(arg) for arg in arg_names),
+    )
+    namespace = {'__name__': __name__, 'numba': numba, '_key_bits': _key_bits}
+    exec(source, namespace)
+    return namespace['make_memoized']
+
+
+def memoize(name, arg_types=None, size=1024, policy='direct', ways=4):
+    """Return `scipy.special.<name>` with a cache of its recent values.
+
+    Parameters
+    ----------
+    name : str
+        Name of a ufunc in `scipy.special`.
+    arg_types : tuple of Numba types, optional
+        Types of the arguments, which select the kernel like for a call
+        with arguments of these types. Defaults to float64 for all
+        arguments. Arguments are converted to these types before being
+        looked up.
+    size : int
+        Number of values cached per thread. It is rounded up so that the
+        number of sets is a power of two.
+    policy : {'direct', 'lru'}
+        Eviction policy. A `'direct'` cache stores each key in a single
+        slot given by its hash, replacing the key there. An `'lru'` cache
+        is `ways`-way set associative: a key may be in any of the `ways`
+        slots of its set, and replaces the least recently used one.
+    ways : int
+        Number of slots per set of an `'lru'` cache.
+
+    Returns
+    -------
+    memoized : numba dispatcher
+        Function with the arguments of `name`, which can be called from
+        Python and from nopython code. Like the functions decorated with
+        `functools.lru_cache`, it has a `cache_info()` method returning
+        the hits, misses, maximum and current size summed over threads,
+        and a `cache_clear()` method.
+
+    Raises
+    ------
+    ValueError
+        If `name` has no kernel for `arg_types`, or if it has several
+        outputs or complex arguments.
+
+    """
+    sc_function = getattr(sc, name, None)
+    if not isinstance(sc_function, np.ufunc):
+        raise ValueError('{} is not a scipy.special ufunc'.format(name))
+    if arg_types is None:
+        arg_types = (types.float64,) * sc_function.nin
+    if len(arg_types) != sc_function.nin:
+        raise ValueError(
+            '{} takes {} arguments'.format(name, sc_function.nin)
+        )
+    signature = overloads.find_signature(sc_function.__name__, arg_types)
+    if signature is None:
+        raise ValueError('{} has no kernel for {}'.format(name, arg_types))
+    return_type, *kernel_arg_types = signature
+    if isinstance(return_type, types.BaseTuple):
+        raise ValueError('{} has several outputs'.format(name))
+    if any(isinstance(t, types.Complex) for t in kernel_arg_types):
+        raise ValueError('{} has complex arguments'.format(name))
+    if policy not in POLICIES:
+        raise ValueError('policy must be one of {}'.format(POLICIES))
+    if policy == 'direct':
+        ways = 1
+    if size < 1 or ways < 1:
+        raise ValueError('size and ways must be positive')
+
+    n_sets = 1 << max(0, -(-size // ways) - 1).bit_length()
+    arrays, lock, unlock, find, get_value, store, clear = make_table(
+        numba.config.NUMBA_NUM_THREADS, n_sets, ways, len(arg_types),
+        numpy_support.as_dtype(return_type),
+    )
+    make_memoized = get_template(len(arg_types))
+    memoized = numba.njit(
+        make_memoized(
+            sc_function, kernel_arg_types, lock, unlock, find, get_value,
+            store,
+        )
+    )
+
+    def cache_info():
+        hits, misses = arrays['stats'][:, [HITS, MISSES]].sum(axis=0)
+        return CacheInfo(
+            int(hits), int(misses), arrays['stamps'].size,
+            int(np.count_nonzero(arrays['stamps']))
+        )
+
+    def cache_clear():
+        # Each thread's tables are locked while they are emptied, so that
+        # callers using them at the time finish with a consistent slot.
+        for thread in range(arrays['stats'].shape[0]):
+            clear(thread)
+
+    memoized.cache_info = cache_info
+    memoized.cache_clear = cache_clear
+    # The compiled code refers to the tables by address.
+    memoized.tables = arrays
+    return memoized
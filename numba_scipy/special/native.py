@@ -0,0 +1,367 @@
+"""Pure-Numba implementations of cheap, frequently used kernels.
+
+Calling a `cython_special` kernel is a call to an opaque function, which
+stops LLVM from vectorizing the loop around it, and for functions like
+`expit` or `xlogy` the call costs more than the math. The functions in
+this module are ports of the SciPy implementations written in Python,
+so they are compiled along with, and can be inlined into, the code
+calling them. The overloads use them instead of the Cython kernels for
+the signatures listed in `NATIVE_KERNELS`.
+
+The results are not always identical to those of the Cython kernels.
+`logit` uses log1p around 1/2 like newer SciPy releases, while older
+ones, including SciPy 1.10, compute log(x/(1 - x)) everywhere and differ
+from it by up to 1e-12 relative there. `xlog1py` uses the `log1p` of the
+C library instead of the Cephes one, and can differ in the last bit.
+
+Unlike the Cython kernels, they don't report errors through `sf_error`.
+
+"""
+import math
+
+import numba
+from numba.types import float64, long_
+
+from . import kernels
+
+# log(sqrt(2*pi)) and log(pi)
+LS2PI = 0.91893853320467274178
+LOGPI = 1.14472988584940017414
+MAXLOG = 7.09782712893383996843e2
+MAXLGM = 2.556348e305
+SQRT1_2 = 0.70710678118654752440
+
+
+@numba.njit(error_model='numpy')
+def expit(x):
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+@numba.njit(error_model='numpy')
+def logit(x):
+    # log(x/(1 - x)) loses precision near 1/2, as does
+    # log(x) - log1p(-x), so use log1p around 1/2.
+    if x < 0.3 or x > 0.65:
+        return math.log(x / (1.0 - x))
+    s = 2.0 * (x - 0.5)
+    return math.log1p(s) - math.log1p(-s)
+
+
+@numba.njit(error_model='numpy')
+def log_expit(x):
+    if x < 0.0:
+        return x - math.log1p(math.exp(x))
+    return -math.log1p(math.exp(-x))
+
+
+@numba.njit(error_model='numpy')
+def xlogy(x, y):
+    if x == 0.0 and not math.isnan(y):
+        return 0.0
+    return x * math.log(y)
+
+
+@numba.njit(error_model='numpy')
+def xlog1py(x, y):
+    if x == 0.0 and not math.isnan(y):
+        return 0.0
+    return x * math.log1p(y)
+
+
+@numba.njit(error_model='numpy')
+def _erf_small(x):
+    # Cephes `erf` for |x| <= 1.
+    z = x * x
+    p = ((((9.60497373987051638749e0 * z
+            + 9.00260197203842689217e1) * z
+           + 2.23200534594684319226e3) * z
+          + 7.00332514112805075473e3) * z
+         + 5.55923013010394962768e4)
+    q = (((((z
+             + 3.35617141647503099647e1) * z
+            + 5.21357949780152679795e2) * z
+           + 4.59432382970980127987e3) * z
+          + 2.26290000613890934246e4) * z
+         + 4.92673942608635921086e4)
+    return x * p / q
+
+
+@numba.njit(error_model='numpy')
+def _erfc_large(a):
+    # Cephes `erfc` for |a| >= 1.
+    x = abs(a)
+    z = -a * a
+    if z < -MAXLOG:
+        return 2.0 if a < 0.0 else 0.0
+    z = math.exp(z)
+    if x < 8.0:
+        p = ((((((((2.46196981473530512524e-10 * x
+                    + 5.64189564831068821977e-1) * x
+                   + 7.46321056442269912687e0) * x
+                  + 4.86371970985681366614e1) * x
+                 + 1.96520832956077098242e2) * x
+                + 5.26445194995477358631e2) * x
+               + 9.34528527171957607540e2) * x
+              + 1.02755188689515710272e3) * x
+             + 5.57535335369399327526e2)
+        q = ((((((((x
+                    + 1.32281951154744992508e1) * x
+                   + 8.67072140885989742329e1) * x
+                  + 3.54937778887819891062e2) * x
+                 + 9.75708501743205489753e2) * x
+                + 1.82390916687909736289e3) * x
+               + 2.24633760818710981792e3) * x
+              + 1.65666309194161350182e3) * x
+             + 5.57535340817727675546e2)
+    else:
+        p = (((((5.64189583547755073984e-1 * x
+                 + 1.27536670759978104416e0) * x
+                + 5.01905042251180477414e0) * x
+               + 6.16021097993053585195e0) * x
+              + 7.40974269950448939160e0) * x
+             + 2.97886665372100240670e0)
+        q = ((((((x
+                  + 2.26052863220117276590e0) * x
+                 + 9.39603524938001434673e0) * x
+                + 1.20489539808096656605e1) * x
+               + 1.70814450747565897222e1) * x
+              + 9.60896809063285878198e0) * x
+             + 3.36907645100081516050e0)
+    y = z * p / q
+    if a < 0.0:
+        y = 2.0 - y
+    if y == 0.0:
+        return 2.0 if a < 0.0 else 0.0
+    return y
+
+
+@numba.njit(error_model='numpy')
+def erf(x):
+    if math.isnan(x):
+        return x
+    if abs(x) > 1.0:
+        y = 1.0 - _erfc_large(abs(x))
+        return y if x > 0.0 else -y
+    return _erf_small(x)
+
+
+@numba.njit(error_model='numpy')
+def erfc(x):
+    if math.isnan(x):
+        return x
+    if abs(x) < 1.0:
+        return 1.0 - _erf_small(x)
+    return _erfc_large(x)
+
+
+@numba.njit(error_model='numpy')
+def ndtr(a):
+    if math.isnan(a):
+        return a
+    x = a * SQRT1_2
+    z = abs(x)
+    if z < SQRT1_2:
+        return 0.5 + 0.5 * erf(x)
+    y = 0.5 * erfc(z)
+    if x > 0.0:
+        y = 1.0 - y
+    return y
+
+
+@numba.njit(error_model='numpy')
+def _lgam_small(x):
+    # Cephes `lgam` for -34 <= x < 13.
+    z = 1.0
+    p = 0.0
+    u = x
+    while u >= 3.0:
+        p -= 1.0
+        u = x + p
+        z *= u
+    while u < 2.0:
+        if u == 0.0:
+            return math.inf
+        z /= u
+        p += 1.0
+        u = x + p
+    z = abs(z)
+    if u == 2.0:
+        return math.log(z)
+    x = x + (p - 2.0)
+    b = (((((-1.37825152569120859100e3 * x
+             - 3.88016315134637840924e4) * x
+            - 3.31612992738871184744e5) * x
+           - 1.16237097492762307383e6) * x
+          - 1.72173700820839662146e6) * x
+         - 8.53555664245765465627e5)
+    c = ((((((x
+              - 3.51815701436523470549e2) * x
+             - 1.70642106651881159223e4) * x
+            - 2.20528590553854454839e5) * x
+           - 1.13933444367982507207e6) * x
+          - 2.53252307177582951285e6) * x
+         - 2.01889141433532773231e6)
+    return math.log(z) + x * b / c
+
+
+@numba.njit(error_model='numpy')
+def _lgam_large(x):
+    # Cephes `lgam` for x >= 13, by Stirling's formula.
+    if x > MAXLGM:
+        return math.inf
+    q = (x - 0.5) * math.log(x) - x + LS2PI
+    if x > 1.0e8:
+        return q
+    p = 1.0 / (x * x)
+    if x >= 1000.0:
+        q += ((7.9365079365079365079365e-4 * p
+               - 2.7777777777777777777778e-3) * p
+              + 0.0833333333333333333333) / x
+    else:
+        q += ((((8.11614167470508450300e-4 * p
+                 - 5.95061904284301438324e-4) * p
+                + 7.93650340457716943945e-4) * p
+               - 2.77777777730099687205e-3) * p
+              + 8.33333333333331927722e-2) / x
+    return q
+
+
+@numba.njit(error_model='numpy')
+def gammaln(x):
+    if not math.isfinite(x):
+        return x
+    if x >= 13.0:
+        return _lgam_large(x)
+    if x >= -34.0:
+        return _lgam_small(x)
+    q = -x
+    w = _lgam_large(q)
+    p = math.floor(q)
+    if p == q:
+        return math.inf
+    z = q - p
+    if z > 0.5:
+        p += 1.0
+        z = p - q
+    z = q * math.sin(math.pi * z)
+    if z == 0.0:
+        return math.inf
+    return LOGPI - math.log(z) - w
+
+
+def make_eval_chebyt(n):
+    n = abs(n)
+
+    @numba.njit(error_model='numpy')
+    def eval_chebyt(x):
+        # Same recurrence as SciPy, unrolled by LLVM for small `n`.
+        b2 = 0.0
+        b1 = -1.0
+        b0 = 0.0
+        x = 2.0 * x
+        for _ in range(n + 1):
+            b2 = b1
+            b1 = b0
+            b0 = x * b1 - b2
+        return (b0 - b2) / 2.0
+
+    return eval_chebyt
+
+
+def make_eval_chebyu(n):
+    if n == -1:
+        sign = 0.0
+    elif n < -1:
+        n = -2 - n
+        sign = -1.0
+    else:
+        sign = 1.0
+
+    @numba.njit(error_model='numpy')
+    def eval_chebyu(x):
+        b2 = 0.0
+        b1 = -1.0
+        b0 = 0.0
+        x = 2.0 * x
+        for _ in range(n + 1):
+            b2 = b1
+            b1 = b0
+            b0 = x * b1 - b2
+        return b0 * sign
+
+    return eval_chebyu
+
+
+def make_eval_legendre(n):
+    if n < 0:
+        n = -n - 1
+    kernel = kernels.get_kernel('eval_legendre', (long_, float64))
+
+    @numba.njit(error_model='numpy')
+    def eval_legendre(x):
+        if n == 0:
+            return 1.0
+        if n == 1:
+            return x
+        if abs(x) < 1e-5:
+            # SciPy uses a power series there.
+            return kernel((n, x))
+        d = x - 1.0
+        p = x
+        for kk in range(n - 1):
+            k = kk + 1.0
+            d = ((2.0 * k + 1.0) / (k + 1.0)) * (x - 1.0) * p + (
+                k / (k + 1.0)) * d
+            p += d
+        return p
+
+    return eval_legendre
+
+
+# Maps `(name, return type, *argument types)` to the implementation
+# used instead of the Cython kernel with that signature.
+NATIVE_KERNELS = {
+    ('expit', float64, float64): expit,
+    ('logit', float64, float64): logit,
+    ('log_expit', float64, float64): log_expit,
+    ('xlogy', float64, float64, float64): xlogy,
+    ('xlog1py', float64, float64, float64): xlog1py,
+    ('erf', float64, float64): erf,
+    ('erfc', float64, float64): erfc,
+    ('ndtr', float64, float64): ndtr,
+    ('gammaln', float64, float64): gammaln,
+}
+
+
+# Maps names to functions building the implementation of the polynomial
+# of a given integer order, as a function of `x` only.
+ORDER_POLYNOMIALS = {
+    'eval_chebyt': make_eval_chebyt,
+    'eval_chebyu': make_eval_chebyu,
+    'eval_legendre': make_eval_legendre,
+}
+
+_order_polynomials = {}
+
+
+def get_native_kernel(name, signature):
+    """Return the pure-Numba implementation of a kernel, or `None`."""
+    return NATIVE_KERNELS.get((name, *signature))
+
+
+def get_order_polynomial(name, n):
+    """Return the pure-Numba polynomial `name` of order `n`, or `None`.
+
+    The order is a constant of the returned function, so the loop over
+    the order is unrolled.
+
+    """
+    key = (name, n)
+    function = _order_polynomials.get(key)
+    if function is None:
+        make_polynomial = ORDER_POLYNOMIALS.get(name)
+        if make_polynomial is None:
+            return None
+        function = make_polynomial(n)
+        _order_polynomials[key] = function
+    return function
@@ -1,23 +1,456 @@
+import types as pytypes
+
 import numba
+import numpy as np
 import scipy.special as sc
+from numba import types
+from numba.core import errors
+from numba.extending import overload
+from numba.np import numpy_support
+
+from .. import config
+from . import kernels, native, signatures, single
+
+# Numba can't fold keyword arguments following `*args`, so the overloads
+# and their implementations are generated with an explicit argument list
+# for each number of inputs.
+ARITY_TEMPLATE = '''
+def make_overload(choose_implementation):
+    def overload_function({args}, out=None):
+        return choose_implementation(({args},), out)
+    return overload_function
+
+
+def make_scalar_function(sc_function):
+    def scalar_function({args}):
+        return sc_function({args})
+    scalar_function.__name__ = sc_function.__name__
+    return scalar_function
+
+
+def make_kernel_call(kernel):
+    def kernel_call({args}, out=None):
+        return kernel(({args},))
+    return kernel_call
+
+
+def make_native_call(function, arg_types):
+    {arg_type_names}, = arg_types
+
+    def native_call({args}, out=None):
+        return function({cast_args})
+    return native_call
+
+
+def make_ufunc_call(ufunc):
+    def ufunc_call({args}, out=None):
+        return ufunc({args})
+    return ufunc_call
+
+
+def make_ufunc_cast_call(ufunc, dtype):
+    def ufunc_cast_call({args}, out=None):
+        return ufunc({args}).astype(dtype)
+    return ufunc_cast_call
+
+
+def make_ufunc_out_call(ufunc):
+    def ufunc_out_call({args}, out=None):
+        return ufunc({args}, out)
+    return ufunc_out_call
+
+
+def make_parallel_ufunc_call(ufunc, dtype, threshold, chunks_per_thread):
+
+    @numba.njit(parallel=True)
+    def chunked_call({args}, out):
+        size = out.size
+        nchunks = min(size, numba.get_num_threads() * chunks_per_thread)
+        n = out.shape[0]
+        if n >= nchunks:
+            for chunk in numba.prange(nchunks):
+                start = chunk * n // nchunks
+                stop = (chunk + 1) * n // nchunks
+                ufunc({sliced_args}, out[start:stop])
+            return
+        # Too few slices along the first axis for every chunk, so the
+        # chunks are ranges of the flattened index space, evaluated a row
+        # of the last axis at a time.
+        inner = out.shape[-1]
+        for chunk in numba.prange(nchunks):
+            start = chunk * size // nchunks
+            stop = (chunk + 1) * size // nchunks
+            while start < stop:
+                row = start // inner
+                begin = start - row * inner
+                end = min(inner, begin + stop - start)
+                ufunc({row_args}, get_row(out, row)[begin:end])
+                start += end - begin
+
+    def parallel_ufunc_call({args}, out=None):
+        shape = np.broadcast_shapes({shapes})
+        if out is None:
+            result = np.empty(shape, dtype)
+        else:
+            result = out
+            if result.shape != shape:
+                raise ValueError("output array has the wrong shape")
+        if result.size < threshold:
+            ufunc({args}, result)
+        else:
+            chunked_call({broadcast_args}, result)
+        return result
+
+    return parallel_ufunc_call
+'''
+
+_arity_templates = {}
+_dispatch_tables = {}
+_ufuncs = {}
+
+
+def get_row(a, r):
+    pass
+
+
+@overload(get_row)
+def get_row_overload(a, r):
+    """Return row `r` of `a` along its last axis, in C order."""
+    if a.ndim == 1:
+        return lambda a, r: a
+    indices = ['i{}'.format(k) for k in range(a.ndim - 1)]
+    lines = ['def row(a, r):']
+    for k in reversed(range(a.ndim - 1)):
+        lines.append('    {} = r % a.shape[{}]'.format(indices[k], k))
+        lines.append('    r //= a.shape[{}]'.format(k))
+    lines.append('    return a[{}]'.format(', '.join(indices)))
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['row']
+
+
+def get_arity_template(nin):
+    template = _arity_templates.get(nin)
+    if template is None:
+        arg_names = ['x{}'.format(i) for i in range(nin)]
+        source = ARITY_TEMPLATE.format(
+            args=', '.join(arg_names),
+            arg_type_names=', '.join('t{}'.format(i) for i in range(nin)),
+            cast_args=', '.join(
+                't{}({})'.format(i, arg) for i, arg in enumerate(arg_names)
+            ),
+            sliced_args=', '.join(
+                '{}[start:stop]'.format(arg) for arg in arg_names
+            ),
+            row_args=', '.join(
+                'get_row({}, row)[begin:end]'.format(arg) for arg in arg_names
+            ),
+            shapes=', '.join('np.shape({})'.format(arg) for arg in arg_names),
+            broadcast_args=', '.join(
+                'np.broadcast_to(np.asarray({}), shape)'.format(arg)
+                for arg in arg_names
+            ),
+        )
+        namespace = {
+            '__name__': __name__, 'numba': numba, 'np': np, 'get_row': get_row
+        }
+        exec(source, namespace)
+        template = pytypes.SimpleNamespace(**namespace)
+        _arity_templates[nin] = template
+    return template
+
+
+def make_scalar_function(sc_function):
+    """Return a function of fixed arity calling `sc_function`.
+
+    `vectorize` works out the number of inputs of a ufunc from the
+    signature of the kernel, so it can't be given a `*args` function.
+
+    """
+    template = get_arity_template(sc_function.nin)
+    return template.make_scalar_function(sc_function)
+
+
+def get_ufunc(name):
+    """Return a dynamic Numba ufunc applying the overload of `name`.
+
+    Calling it from nopython code compiles a single loop over the
+    broadcast inputs with the scalar kernel inlined in its body.
+
+    """
+    # The loops it compiles depend on the float32 mode.
+    key = (name, config.SPECIAL_FLOAT32)
+    ufunc = _ufuncs.get(key)
+    if ufunc is None:
+        scalar_function = make_scalar_function(getattr(sc, name))
+        ufunc = numba.vectorize(nopython=True)(scalar_function)
+        _ufuncs[key] = ufunc
+    return ufunc
+
+
+def is_none(arg):
+    return arg is None or isinstance(arg, types.NoneType)
+
+
+def get_dispatch_table(name):
+    """Return the dispatch table of `name`.
+
+    It maps tuples of argument types to the signature of the kernel
+    called for them, or `None` if there is no kernel they can be safely
+    cast to. The table starts out with the exact signatures of the
+    kernels and remembers the result of every promotion.
+
+    """
+    table = _dispatch_tables.get(name)
+    if table is None:
+        table = {}
+        for signature in signatures.kernel_index.signatures(name).values():
+            table.setdefault(signature[1:], signature)
+        _dispatch_tables[name] = table
+    return table
+
+
+def can_cast_safely(from_type, to_type):
+    try:
+        from_dtype = numpy_support.as_dtype(from_type)
+        to_dtype = numpy_support.as_dtype(to_type)
+    except errors.NumbaNotImplementedError:
+        return False
+    return np.can_cast(from_dtype, to_dtype, casting='safe')
+
+
+def promote_signature(name, args):
+    """Return the signature of the kernel `args` promote to, or `None`.
+
+    Like for a NumPy ufunc, the arguments may be cast to the argument
+    types of a kernel if no information is lost. Among those kernels the
+    one needing the fewest casts is chosen, and ties are broken by the
+    order of the loops of the SciPy ufunc.
+
+    """
+    candidates = []
+    for signature in signatures.kernel_index.signatures(name).values():
+        arg_types = signature[1:]
+        if len(arg_types) != len(args) or not all(
+            can_cast_safely(arg, arg_type)
+            for arg, arg_type in zip(args, arg_types)
+        ):
+            continue
+        n_casts = sum(arg != arg_type for arg, arg_type in zip(args, arg_types))
+        candidates.append(
+            (n_casts, signatures.get_loop_index(name, signature), signature)
+        )
+    if not candidates:
+        return None
+    return min(candidates, key=lambda candidate: candidate[:2])[2]
+
+
+def find_signature(name, args):
+    """Return the signature of the kernel `name(*args)` dispatches to.
+
+    The signature is a tuple of Numba types, return type first. The
+    lookup is a dict access once `args` have been seen, however many
+    kernels `name` has.
+
+    """
+    args = tuple(types.unliteral(arg) for arg in args)
+    table = get_dispatch_table(name)
+    try:
+        return table[args]
+    except KeyError:
+        signature = promote_signature(name, args)
+        table[args] = signature
+        return signature
+
+
+def find_single_kernel(name, args):
+    """Return the float32 implementation of `name(*args)`, or `None`.
+
+    There is one only in float32 mode, for arguments that are all
+    float32 and functions with no float32 kernel.
+
+    """
+    if not config.SPECIAL_FLOAT32:
+        return None
+    return single.get_single_kernel(
+        name, tuple(types.unliteral(arg) for arg in args)
+    )
+
+
+def get_loop_dtype(name, args):
+    """Return the output dtype of the loop SciPy picks for `args`, or `None`.
+
+    Like NumPy, the ufunc uses its first loop that the arrays can be
+    safely cast to. Scalars with arrays only need a cast of the same
+    kind, since they don't upcast arrays, so that for example
+    `gamma(x)` for a float32 array `x` uses the 'f->f' loop and returns
+    float32 even though the kernel computes in double precision.
+
+    """
+    sc_function = getattr(sc, name, None)
+    has_arrays = any(isinstance(arg, types.Array) for arg in args)
+    try:
+        dtypes = [
+            numpy_support.as_dtype(
+                arg.dtype if isinstance(arg, types.Array) else arg
+            )
+            for arg in args
+        ]
+    except errors.NumbaNotImplementedError:
+        return None
+    castings = [
+        'safe' if isinstance(arg, types.Array) or not has_arrays
+        else 'same_kind'
+        for arg in args
+    ]
+    for loop in getattr(sc_function, 'types', []):
+        inputs, outputs = loop.split('->')
+        if len(inputs) != len(args) or len(outputs) != 1:
+            continue
+        if all(
+            np.can_cast(dtype, typecode, casting=casting)
+            for dtype, typecode, casting in zip(dtypes, inputs, castings)
+        ):
+            return np.dtype(outputs)
+    return None
+
+
+def choose_array_kernel(name, args, out):
+    if not all(isinstance(arg, (types.Array, types.Number)) for arg in args):
+        return None
+    if not (is_none(out) or isinstance(out, types.Array)):
+        return None
+    scalar_args = [
+        arg.dtype if isinstance(arg, types.Array) else arg for arg in args
+    ]
+    signature = find_signature(name, scalar_args)
+    if signature is None or isinstance(signature[0], types.BaseTuple):
+        # Numba can't build ufuncs with several outputs.
+        return None
+
+    # The type the compiled loops return, and the one the SciPy ufunc
+    # would, which the result is cast to.
+    if find_single_kernel(name, scalar_args) is not None:
+        kernel_dtype = np.dtype(np.float32)
+    else:
+        kernel_dtype = numpy_support.as_dtype(signature[0])
+    dtype = get_loop_dtype(name, args) or kernel_dtype
+
+    ufunc = get_ufunc(name)
+    template = get_arity_template(len(args))
+    ndim = max(arg.ndim for arg in (*args, out) if isinstance(arg, types.Array))
+    if config.SPECIAL_PARALLEL_THRESHOLD > 0 and ndim > 0:
+        return template.make_parallel_ufunc_call(
+            ufunc,
+            dtype,
+            config.SPECIAL_PARALLEL_THRESHOLD,
+            config.SPECIAL_PARALLEL_CHUNKS_PER_THREAD,
+        )
+    if not is_none(out):
+        return template.make_ufunc_out_call(ufunc)
+    if dtype != kernel_dtype and ndim > 0:
+        return template.make_ufunc_cast_call(ufunc, dtype)
+    return template.make_ufunc_call(ufunc)
+
+
+# Bessel functions of order 0 and 1 have faster kernels of their own.
+LITERAL_ORDER_KERNELS = {
+    ('jv', 0): 'j0',
+    ('jv', 1): 'j1',
+    ('yv', 0): 'y0',
+    ('yv', 1): 'y1',
+    ('yn', 0): 'y0',
+    ('yn', 1): 'y1',
+    ('iv', 0): 'i0',
+    ('iv', 1): 'i1',
+    ('ive', 0): 'i0e',
+    ('ive', 1): 'i1e',
+    ('kv', 0): 'k0',
+    ('kv', 1): 'k1',
+    ('kn', 0): 'k0',
+    ('kn', 1): 'k1',
+    ('kve', 0): 'k0e',
+    ('kve', 1): 'k1e',
+}
+
+
+def choose_literal_order_kernel(name, args):
+    """Return an implementation specialized for a constant integer order.
+
+    This is for calls like `jv(0, x)` or `eval_legendre(3, x)`, whose
+    first argument is typed as an integer literal. Returns `None` if
+    there is no specialization, and Numba then types the call again
+    with non-literal arguments.
+
+    """
+    if len(args) != 2 or not isinstance(args[0], types.IntegerLiteral):
+        return None
+    order = args[0].literal_value
+
+    specialized_name = LITERAL_ORDER_KERNELS.get((name, order))
+    if specialized_name is not None:
+        signature = find_signature(specialized_name, args[1:])
+        if signature is None:
+            return None
+        kernel = kernels.get_kernel(specialized_name, signature[1:])
+
+        def order_kernel_call(x0, x1, out=None):
+            return kernel((x1,))
+        return order_kernel_call
+
+    signature = find_signature(name, args)
+    if signature is None or signature[1:] != (types.long_, types.float64):
+        return None
+    function = native.get_order_polynomial(name, order)
+    if function is None:
+        return None
+
+    def order_polynomial_call(x0, x1, out=None):
+        return function(types.float64(x1))
+    return order_polynomial_call
 
-from . import signatures
 
+def choose_kernel(name):
 
-def choose_kernel(name, all_signatures):
+    def choice_function(args, out):
+        if any(isinstance(arg, types.Literal) for arg in args):
+            # The overloads prefer literal arguments, so this is tried
+            # before typing the call with non-literal ones.
+            if is_none(out):
+                return choose_literal_order_kernel(name, args)
+            return None
+        if (
+            any(isinstance(arg, types.Array) for arg in args)
+            or not is_none(out)
+        ):
+            return choose_array_kernel(name, args, out)
 
-    def choice_function(*args):
-        for signature in all_signatures:
-            if args == signature:
-                f = signatures.name_and_types_to_pointer[(name, *signature)]
-                return lambda *args: f(*args)
+        template = get_arity_template(len(args))
+        function = find_single_kernel(name, args)
+        if function is not None:
+            return template.make_native_call(function, args)
+        signature = find_signature(name, args)
+        if signature is None:
+            return None
+        function = native.get_native_kernel(name, signature)
+        if function is not None:
+            return template.make_native_call(function, signature[1:])
+        kernel = kernels.get_kernel(name, signature[1:])
+        return template.make_kernel_call(kernel)
 
     return choice_function
 
 
 def add_overloads():
-    for name, all_signatures in signatures.name_to_numba_signatures.items():
-        sc_function = getattr(sc, name)
-        numba.extending.overload(sc_function)(
-            choose_kernel(name, all_signatures)
+    # Only the names are needed to register the overloads; the kernels
+    # of a function are resolved the first time a call to it is typed.
+    for name in signatures.kernel_index.names():
+        sc_function = getattr(sc, name, None)
+        if not isinstance(sc_function, np.ufunc):
+            # E.g. the `spherical_*` functions, which are Python wrappers
+            # around kernels taking optional arguments.
+            continue
+        template = get_arity_template(sc_function.nin)
+        numba.extending.overload(sc_function, prefer_literal=True)(
+            template.make_overload(choose_kernel(name))
         )
@@ -0,0 +1,364 @@
+"""Overloads of the reductions `logsumexp`, `softmax` and `log_softmax`.
+
+These are Python functions in `scipy.special` rather than ufuncs, so
+they aren't covered by the kernel overloads. SciPy computes them from
+several temporary arrays: the maximum, the shifted values and their
+exponentials. The implementations here instead make a single pass over
+each row, keeping a running maximum and the sum of the exponentials
+scaled by it, which is rescaled whenever the maximum grows. Rows are
+taken from a view of `a` with the reduced axis moved last, and `b` is
+broadcast as a view with zero strides, so no temporary copies are made
+either.
+
+`axis` must be `None` or an integer. `keepdims` and `return_sign`
+must be compile-time constants, since they determine the type of the
+result. Reductions over at least
+`config.SPECIAL_PARALLEL_THRESHOLD` elements are split by rows over
+Numba's threading layer.
+
+"""
+import math
+
+import numba
+import numpy as np
+import scipy.special as sc
+from numba import types
+from numba.cpython.unsafe.tuple import tuple_setitem
+from numba.extending import overload
+
+from .. import config
+
+
+def _row_weights(b, row):
+    pass
+
+
+def _weight(b, k):
+    pass
+
+
+@numba.njit
+def _as_rows(a, axis):
+    """Return a view of `a` whose rows along the last axis are reduced.
+
+    `axis` is moved to the end, or with `axis` -1, the axes are kept in
+    order and the rows are reduced together. A leading axis of length 1
+    is added so that every row is a 1-D view.
+
+    """
+    axes = a.shape
+    k = 0
+    for d in range(a.ndim):
+        if d != axis:
+            axes = tuple_setitem(axes, k, d)
+            k += 1
+    if axis >= 0:
+        axes = tuple_setitem(axes, a.ndim - 1, axis)
+    return np.transpose(a, axes)[None, ...]
+
+
+@numba.njit
+def _row(a, row):
+    """Return the `row`-th row of `a` along its last axis, in C order."""
+    index = a.shape[:-1]
+    for d in range(len(index) - 1, -1, -1):
+        index = tuple_setitem(index, d, row % a.shape[d])
+        row //= a.shape[d]
+    return a[index]
+
+
+@overload(_row_weights)
+def _row_weights_overload(b, row):
+    if isinstance(b, types.Array):
+        return lambda b, row: _row(b, row)
+    return lambda b, row: b
+
+
+@overload(_weight)
+def _weight_overload(b, k):
+    if isinstance(b, (types.NoneType, types.Omitted)):
+        return lambda b, k: 1.0
+    if isinstance(b, types.Number):
+        return lambda b, k: float(b)
+    return lambda b, k: float(b[k])
+
+
+@numba.njit(error_model='numpy')
+def _accumulate(a, b):
+    """Return the maximum of a row, and the sum of exponentials below it.
+
+    The row `a` is weighted by `b` like in `logsumexp`.
+
+    """
+    m = -np.inf
+    s = 0.0
+    for k in range(a.shape[0]):
+        w = _weight(b, k)
+        if w == 0.0:
+            # Like SciPy, which sets `a` to -inf where `b` is zero.
+            continue
+        v = float(a[k])
+        if v > m:
+            s = s * math.exp(m - v) + w
+            m = v
+        elif v == m:
+            # Also for infinities, whose difference is NaN.
+            s += w
+        else:
+            s += w * math.exp(v - m)
+    return m, s
+
+
+@numba.njit(error_model='numpy')
+def _combine(m, s):
+    """Return the maximum and the sum of exponentials of all rows."""
+    m_all = m.max()
+    s_all = 0.0
+    for row in range(m.shape[0]):
+        if m[row] == m_all:
+            s_all += s[row]
+        else:
+            s_all += s[row] * math.exp(m[row] - m_all)
+    return m_all, s_all
+
+
+def _reduce_rows(a, b, m, s):
+    for row in numba.prange(m.shape[0]):
+        m_row, s_row = _accumulate(_row(a, row), _row_weights(b, row))
+        m[row] = m_row
+        s[row] = s_row
+
+
+def _normalize_rows(x, out, m, s, log):
+    for row in numba.prange(m.shape[0]):
+        x_row = _row(x, row)
+        out_row = _row(out, row)
+        if log:
+            log_s = math.log(s[row])
+            for k in range(x_row.shape[0]):
+                out_row[k] = (x_row[k] - m[row]) - log_s
+        else:
+            for k in range(x_row.shape[0]):
+                out_row[k] = math.exp(x_row[k] - m[row]) / s[row]
+
+
+def _softmax_rows(x, out):
+    for row in numba.prange(x.size // x.shape[-1]):
+        x_row = _row(x, row)
+        out_row = _row(out, row)
+        # The exponentials are needed in the output anyway, so store
+        # them rather than computing them twice.
+        m = -np.inf
+        for k in range(x_row.shape[0]):
+            m = max(m, x_row[k])
+        s = 0.0
+        for k in range(x_row.shape[0]):
+            e = math.exp(x_row[k] - m)
+            out_row[k] = e
+            s += e
+        for k in range(x_row.shape[0]):
+            out_row[k] /= s
+
+
+reduce_rows = numba.njit(error_model='numpy')(_reduce_rows)
+parallel_reduce_rows = numba.njit(error_model='numpy', parallel=True)(
+    _reduce_rows
+)
+normalize_rows = numba.njit(error_model='numpy')(_normalize_rows)
+parallel_normalize_rows = numba.njit(error_model='numpy', parallel=True)(
+    _normalize_rows
+)
+softmax_rows = numba.njit(error_model='numpy')(_softmax_rows)
+parallel_softmax_rows = numba.njit(error_model='numpy', parallel=True)(
+    _softmax_rows
+)
+
+
+@numba.njit
+def _check_size(a):
+    if a.size == 0:
+        raise ValueError("zero-size array to reduction operation")
+
+
+@numba.njit
+def _normalize_axis(ndim, axis):
+    if not -ndim <= axis < ndim:
+        raise ValueError("axis is out of bounds for the array")
+    return axis % ndim
+
+
+def is_none(arg):
+    return arg is None or isinstance(arg, (types.NoneType, types.Omitted))
+
+
+def needs_literal(arg):
+    # Defaults are passed as Python values.
+    return isinstance(arg, types.Boolean) and not isinstance(
+        arg, types.BooleanLiteral
+    )
+
+
+def get_constant(arg):
+    if isinstance(arg, types.Omitted):
+        return arg.value
+    if isinstance(arg, types.Literal):
+        return arg.literal_value
+    return arg
+
+
+def is_real_array(a):
+    return isinstance(a, types.Array) and isinstance(
+        a.dtype, (types.Float, types.Integer)
+    )
+
+
+def is_axis(axis):
+    return is_none(axis) or isinstance(axis, types.Integer)
+
+
+def get_result_dtype(a):
+    return np.float32 if a.dtype == types.float32 else np.float64
+
+
+def get_reduced_shape(ndim, axis_is_none, keepdims):
+    """Return a function giving the shape of the result of a reduction.
+
+    It takes the shape of the array and the normalized axis.
+
+    """
+    if axis_is_none:
+        shape = (1,) * ndim if keepdims else ()
+        return numba.njit(lambda a_shape, axis: shape)
+    if keepdims:
+        return numba.njit(
+            lambda a_shape, axis: tuple_setitem(a_shape, axis, 1)
+        )
+    stop = ndim - 1
+
+    @numba.njit
+    def reduced_shape(a_shape, axis):
+        shape = a_shape[:stop]
+        for k in range(axis, stop):
+            shape = tuple_setitem(shape, k, a_shape[k + 1])
+        return shape
+
+    return reduced_shape
+
+
+@overload(sc.logsumexp, prefer_literal=True)
+def logsumexp(a, axis=None, b=None, keepdims=False, return_sign=False):
+    if not (is_real_array(a) and is_axis(axis)):
+        return None
+    if not (is_none(b) or isinstance(b, types.Number) or is_real_array(b)):
+        return None
+    # These determine the type of the result.
+    if needs_literal(keepdims):
+        return lambda a, axis=None, b=None, keepdims=False, \
+            return_sign=False: numba.literally(keepdims)
+    if needs_literal(return_sign):
+        return lambda a, axis=None, b=None, keepdims=False, \
+            return_sign=False: numba.literally(return_sign)
+
+    axis_is_none = is_none(axis)
+    keep = bool(get_constant(keepdims))
+    with_sign = bool(get_constant(return_sign))
+    reduced_shape = get_reduced_shape(a.ndim, axis_is_none, keep)
+    # Like NumPy reductions, return scalars rather than 0-d arrays.
+    scalar = not keep and (axis_is_none or a.ndim == 1)
+    dtype = get_result_dtype(a)
+    array_b = isinstance(b, types.Array)
+    threshold = config.SPECIAL_PARALLEL_THRESHOLD
+
+    def logsumexp_impl(a, axis=None, b=None, keepdims=False,
+                       return_sign=False):
+        if axis_is_none:
+            ax = -1
+        else:
+            ax = _normalize_axis(a.ndim, axis)
+        _check_size(a)
+        rows = _as_rows(a, ax)
+        if array_b:
+            # A view with zero strides along the broadcast axes.
+            weights = _as_rows(np.broadcast_to(b, a.shape), ax)
+        else:
+            weights = b
+        n_rows = a.size // rows.shape[-1]
+        m = np.empty(n_rows)
+        s = np.empty(n_rows)
+        if 0 < threshold <= a.size:
+            parallel_reduce_rows(rows, weights, m, s)
+        else:
+            reduce_rows(rows, weights, m, s)
+        if axis_is_none:
+            m[0], s[0] = _combine(m, s)
+            n_rows = 1
+        out = np.empty(n_rows, dtype)
+        sign = np.empty(n_rows, dtype)
+        for row in range(n_rows):
+            if with_sign:
+                out[row] = m[row] + math.log(abs(s[row]))
+                sign[row] = np.sign(s[row])
+            else:
+                out[row] = m[row] + math.log(s[row])
+        if scalar:
+            if with_sign:
+                return out[0], sign[0]
+            return out[0]
+        shape = reduced_shape(a.shape, ax)
+        if with_sign:
+            return out.reshape(shape), sign.reshape(shape)
+        return out.reshape(shape)
+
+    return logsumexp_impl
+
+
+def make_softmax_overload(log):
+    def softmax(x, axis=None):
+        if not (is_real_array(x) and is_axis(axis)):
+            return None
+
+        axis_is_none = is_none(axis)
+        dtype = get_result_dtype(x)
+        threshold = config.SPECIAL_PARALLEL_THRESHOLD
+
+        def softmax_impl(x, axis=None):
+            if axis_is_none:
+                ax = -1
+            else:
+                ax = _normalize_axis(x.ndim, axis)
+            _check_size(x)
+            rows = _as_rows(x, ax)
+            out = np.empty(x.shape, dtype)
+            out_rows = _as_rows(out, ax)
+            parallel = 0 < threshold <= x.size
+            if not (log or axis_is_none):
+                if parallel:
+                    parallel_softmax_rows(rows, out_rows)
+                else:
+                    softmax_rows(rows, out_rows)
+                return out
+            # Otherwise the maximum and the sum are needed first.
+            n_rows = x.size // rows.shape[-1]
+            m = np.empty(n_rows)
+            s = np.empty(n_rows)
+            if parallel:
+                parallel_reduce_rows(rows, None, m, s)
+            else:
+                reduce_rows(rows, None, m, s)
+            if axis_is_none:
+                m_all, s_all = _combine(m, s)
+                m[:] = m_all
+                s[:] = s_all
+            if parallel:
+                parallel_normalize_rows(rows, out_rows, m, s, log)
+            else:
+                normalize_rows(rows, out_rows, m, s, log)
+            return out
+
+        return softmax_impl
+
+    return softmax
+
+
+overload(sc.softmax)(make_softmax_overload(False))
+overload(sc.log_softmax)(make_softmax_overload(True))
@@ -0,0 +1,183 @@
+"""Evaluate special functions for all orders up to `n` at once.
+
+Evaluating `eval_legendre(k, x)` or `jv(k, x)` for every `k` in `0..n`
+with one call per order costs O(n**2), since each call runs a recurrence
+up to `k`. The functions in this module run the recurrence once and keep
+every order, in O(n):
+
+    >>> from numba_scipy.special.sequences import jv_sequence
+    >>> jv_sequence(10, 2.5)
+
+They are jitted, so they can also be called from nopython code. Each
+takes an optional `out` array of at least `n + 1` elements, which
+receives the values of orders `0..n` and is returned.
+
+"""
+import math
+
+import numba
+import numpy as np
+import scipy.special as sc
+
+# Backward recurrences grow quickly; rescale the values computed so far
+# when they get this large.
+BIG = 1e250
+
+
+@numba.njit
+def _get_out(n, out):
+    if n < 0:
+        raise ValueError("the order must be non-negative")
+    if out is None:
+        return np.empty(n + 1)
+    if out.shape[0] < n + 1:
+        raise ValueError("out must have at least n + 1 elements")
+    return out
+
+
+@numba.njit(error_model='numpy')
+def legendre_all(n, x, out=None):
+    """Return the Legendre polynomials of orders `0..n` at `x`.
+
+    For |x| >= 1e-5 this runs the recurrence of `eval_legendre`, so the
+    values are identical to SciPy's. Closer to zero it uses the three
+    term recurrence, which is accurate there.
+
+    """
+    out = _get_out(n, out)
+    out[0] = 1.0
+    if n == 0:
+        return out
+    out[1] = x
+    if abs(x) < 1e-5:
+        for k in range(1, n):
+            out[k + 1] = ((2 * k + 1) * x * out[k] - k * out[k - 1]) / (k + 1)
+        return out
+    d = x - 1.0
+    p = x
+    for kk in range(n - 1):
+        k = kk + 1.0
+        d = ((2.0 * k + 1.0) / (k + 1.0)) * (x - 1.0) * p + (
+            k / (k + 1.0)) * d
+        p += d
+        out[kk + 2] = p
+    return out
+
+
+@numba.njit(error_model='numpy')
+def _ratio(n, x, sign):
+    """Return `f(n + 1, x) / f(n, x)` by its continued fraction.
+
+    `f` is the Bessel function of the first kind for `sign == -1`, and
+    the modified one for `sign == 1`. The fraction is evaluated with the
+    modified Lentz method.
+
+    """
+    tiny = 1e-300
+    eps = np.finfo(np.float64).eps
+    b = 2.0 * (n + 1) / x
+    f = b if b != 0.0 else tiny
+    c = f
+    d = 0.0
+    max_terms = 10 * (n + int(abs(x))) + 1000
+    for k in range(2, max_terms):
+        b = 2.0 * (n + k) / x
+        d = b + sign * d
+        if d == 0.0:
+            d = tiny
+        c = b + sign / c
+        if c == 0.0:
+            c = tiny
+        d = 1.0 / d
+        delta = c * d
+        f *= delta
+        if abs(delta - 1.0) < eps:
+            break
+    return 1.0 / f
+
+
+@numba.njit(error_model='numpy')
+def _backward(n, x, sign, out):
+    """Fill `out[0..n]` with an unnormalized solution of the recurrence.
+
+    Starting from the ratio of orders `n + 1` and `n`, this recurrence is
+    stable for the Bessel functions of the first kind.
+
+    """
+    out[n] = 1.0
+    following = _ratio(n, x, sign)
+    for k in range(n, 0, -1):
+        previous = (2.0 * k / x) * out[k] + sign * following
+        following = out[k]
+        out[k - 1] = previous
+        if abs(previous) > BIG:
+            for j in range(k - 1, n + 1):
+                out[j] /= BIG
+            following /= BIG
+
+
+@numba.njit(error_model='numpy')
+def jv_sequence(n, x, out=None):
+    """Return the Bessel functions of the first kind of orders `0..n` at `x`.
+
+    The values are computed by backward recurrence from the ratio of the
+    orders `n + 1` and `n`, and normalized with `j0(x)` or `j1(x)`,
+    whichever is larger.
+
+    """
+    out = _get_out(n, out)
+    if math.isnan(x):
+        out[:n + 1] = np.nan
+        return out
+    if x == 0.0:
+        out[:n + 1] = 0.0
+        out[0] = 1.0
+        return out
+    ax = abs(x)
+    if n == 0:
+        out[0] = sc.j0(ax)
+    else:
+        _backward(n, ax, -1.0, out)
+        j0 = sc.j0(ax)
+        j1 = sc.j1(ax)
+        if abs(j0) >= abs(j1):
+            scale = j0 / out[0]
+        else:
+            scale = j1 / out[1]
+        for k in range(n + 1):
+            out[k] *= scale
+    if x < 0.0:
+        for k in range(1, n + 1, 2):
+            out[k] = -out[k]
+    return out
+
+
+@numba.njit(error_model='numpy')
+def iv_sequence(n, x, out=None):
+    """Return the modified Bessel functions of orders `0..n` at `x`.
+
+    The values are computed by backward recurrence from the ratio of the
+    orders `n + 1` and `n`, and normalized with `i0(x)`.
+
+    """
+    out = _get_out(n, out)
+    if math.isnan(x):
+        out[:n + 1] = np.nan
+        return out
+    if x == 0.0:
+        out[:n + 1] = 0.0
+        out[0] = 1.0
+        return out
+    ax = abs(x)
+    i0 = sc.i0(ax)
+    if n == 0:
+        out[0] = i0
+    else:
+        _backward(n, ax, 1.0, out)
+        scale = i0 / out[0]
+        for k in range(n + 1):
+            out[k] *= scale
+    if x < 0.0:
+        for k in range(1, n + 1, 2):
+            out[k] = -out[k]
+    return out
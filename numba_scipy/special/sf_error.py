@@ -0,0 +1,150 @@
+"""Per-thread counts of special function errors in nopython code.
+
+The Cython kernels report errors through SciPy's `sf_error`, whose
+actions are set by `scipy.special.errstate`. That state is global, and
+the warnings it can emit aren't visible from, nor safe in, parallel
+nopython code. Instead, `check` classifies the result of a call from its
+value and counts errors in an array with one row per thread id. The
+workers of `prange` loops have rows of their own, while Python threads
+running nogil code all have id 0 and share a row, which they update
+with atomic additions:
+
+    >>> from numba_scipy.special import sf_error
+    >>> @numba.njit(parallel=True)
+    ... def f(x, counts):
+    ...     out = np.empty_like(x)
+    ...     for i in numba.prange(x.shape[0]):
+    ...         out[i] = sf_error.check(counts, sc.gamma(x[i]), x[i])
+    ...     return out
+    >>> counts = sf_error.new_counts()
+    >>> f(x, counts)
+    >>> sf_error.summarize(counts)
+
+The kernels don't return the codes they pass to `sf_error`, so the
+category of an error is inferred from the result, and only two can be
+told apart. A NaN computed from arguments that aren't NaN is counted as
+`domain`, and an infinity computed from finite arguments as `infinite`,
+which SciPy reports as `singular` for poles and as `overflow` otherwise.
+The other categories of `scipy.special.errstate` aren't detected.
+
+"""
+import math
+
+import numba
+import numpy as np
+from numba import types
+from numba.core import cgutils
+from numba.extending import intrinsic, overload
+
+# The categories `check` can tell from the value of a result.
+CATEGORIES = ('domain', 'infinite')
+DOMAIN = CATEGORIES.index('domain')
+INFINITE = CATEGORIES.index('infinite')
+
+
+def _has_nan(x):
+    pass
+
+
+def _is_finite(x):
+    pass
+
+
+@overload(_has_nan)
+def _has_nan_overload(x):
+    if isinstance(x, (types.Integer, types.Boolean)):
+        return lambda x: False
+    if isinstance(x, types.Float):
+        return lambda x: math.isnan(x)
+    if isinstance(x, types.Complex):
+        return lambda x: math.isnan(x.real) or math.isnan(x.imag)
+    if isinstance(x, types.BaseTuple):
+        # Tuples may be heterogeneous, so recurse over their elements.
+        if len(x) == 0:
+            return lambda x: False
+        return lambda x: _has_nan(x[0]) or _has_nan(x[1:])
+    return None
+
+
+@overload(_is_finite)
+def _is_finite_overload(x):
+    if isinstance(x, (types.Integer, types.Boolean)):
+        return lambda x: True
+    if isinstance(x, types.Float):
+        return lambda x: math.isfinite(x)
+    if isinstance(x, types.Complex):
+        return lambda x: math.isfinite(x.real) and math.isfinite(x.imag)
+    if isinstance(x, types.BaseTuple):
+        if len(x) == 0:
+            return lambda x: True
+        return lambda x: _is_finite(x[0]) and _is_finite(x[1:])
+    return None
+
+
+@intrinsic
+def _atomic_add(typingctx, array, row, column, value):
+    """Add `value` to `array[row, column]` atomically."""
+    def codegen(context, builder, signature, args):
+        array_type = signature.args[0]
+        array, row, column, value = args
+        pointer = cgutils.get_item_pointer(
+            context, builder, array_type,
+            context.make_array(array_type)(context, builder, array),
+            [row, column],
+        )
+        builder.atomic_rmw('add', pointer, value, 'monotonic')
+        return context.get_dummy_value()
+
+    return types.none(array, row, column, array.dtype), codegen
+
+
+def new_counts():
+    """Return zeroed error counts for every thread Numba can use."""
+    return np.zeros(
+        (numba.config.NUMBA_NUM_THREADS, len(CATEGORIES)), dtype=np.int64
+    )
+
+
+@numba.njit
+def _count(counts, category):
+    # Python threads running nogil code all have thread id 0 and share
+    # its row, so the increment is atomic.
+    thread = numba.get_thread_id()
+    if thread >= counts.shape[0]:
+        raise ValueError("counts must have a row per thread")
+    _atomic_add(counts, thread, category, np.int64(1))
+
+
+@numba.njit
+def check(counts, result, *args):
+    """Count the error `result` signals, if any, and return it.
+
+    `args` are the arguments the result was computed from, and `counts`
+    an array returned by `new_counts`. `result` may be a tuple, for
+    functions with several outputs.
+
+    The counts are separate from SciPy's error handling: the state set
+    by `scipy.special.seterr` and returned by `geterr` is neither read
+    nor changed, and no warnings are emitted.
+
+    """
+    if _is_finite(result):
+        return result
+    if _has_nan(result):
+        if not _has_nan(args):
+            _count(counts, DOMAIN)
+    elif _is_finite(args):
+        _count(counts, INFINITE)
+    return result
+
+
+def summarize(counts):
+    """Return the total number of errors by category.
+
+    The keys are the names in `CATEGORIES`.
+
+    """
+    totals = np.asarray(counts).sum(axis=0)
+    return {
+        category: int(total) for category, total in zip(CATEGORIES, totals)
+    }
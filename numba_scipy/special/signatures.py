@@ -1,21 +1,68 @@
 import collections
+import collections.abc
 import ctypes
+import hashlib
+import json
+import os
+import platform
 import re
+import struct
+import sys
+import tempfile
 
 import numba
+import numpy as np
+import scipy
+import scipy.special as sc
 import scipy.special.cython_special as cysc
 from numba.extending import get_cython_function_address
+from numba.np import numpy_support
+
+try:
+    from numba.misc.appdirs import AppDirs
+except ImportError:
+    from numba.appdirs import AppDirs
+
+# Bump this whenever the way capsules are parsed changes, so that tables
+# written by older versions of numba-scipy are ignored.
+SIGNATURE_CACHE_VERSION = 1
+
+
+class c_double_complex(ctypes.Structure):
+    # Laid out and passed like C99 `double complex` on all platforms
+    # supported by SciPy.
+    _fields_ = [('real', ctypes.c_double), ('imag', ctypes.c_double)]
+
+
+class c_float_complex(ctypes.Structure):
+    _fields_ = [('real', ctypes.c_float), ('imag', ctypes.c_float)]
+
 
 CYTHON_TO_NUMBA = {
     'double': numba.types.float64,
     'float': numba.types.float32,
+    'int': numba.types.intc,
     'long': numba.types.long_,
+    'long long': numba.types.longlong,
+    'Py_ssize_t': numba.types.intp,
+    '__pyx_t_double_complex': numba.types.complex128,
+    '__pyx_t_float_complex': numba.types.complex64,
+    'double complex': numba.types.complex128,
+    'float complex': numba.types.complex64,
 }
 
+# Some of the integer types are the same Numba type on a given platform,
+# e.g. `long` and `long long` on 64-bit Linux. The ctypes types of those
+# have the same size, so it doesn't matter which one wins.
 NUMBA_TO_CTYPES = {
     numba.types.float64: ctypes.c_double,
     numba.types.float32: ctypes.c_float,
+    numba.types.intc: ctypes.c_int,
+    numba.types.intp: ctypes.c_ssize_t,
+    numba.types.longlong: ctypes.c_longlong,
     numba.types.long_: ctypes.c_long,
+    numba.types.complex128: c_double_complex,
+    numba.types.complex64: c_float_complex,
 }
 
 
@@ -49,15 +96,215 @@ def de_mangle_function_name(mangled_name):
     return match.group('name')
 
 
+def split_outputs(cython_signature):
+    """Split a Cython signature into its outputs and its inputs.
+
+    Kernels of functions with several outputs, like `airy` or `sici`,
+    return `void` and write the outputs through pointers passed after
+    the inputs. Returns `None` for any other use of pointers.
+
+    """
+    return_type, *arg_types = cython_signature
+    if return_type != 'void':
+        return [return_type], arg_types
+    n_inputs = len(arg_types)
+    while n_inputs > 0 and arg_types[n_inputs - 1].endswith(' *'):
+        n_inputs -= 1
+    outputs = [t[:-len(' *')] for t in arg_types[n_inputs:]]
+    if not outputs or any(t.endswith('*') for t in outputs):
+        return None
+    return outputs, arg_types[:n_inputs]
+
+
+def to_numba_signature(cython_signature):
+    """Return the Numba types of a Cython signature, or `None` if unsupported.
+
+    The return type of a kernel with several outputs is the tuple of the
+    output types.
+
+    """
+    split_signature = split_outputs(cython_signature)
+    if split_signature is None:
+        return None
+    outputs, inputs = split_signature
+    numba_signature = [CYTHON_TO_NUMBA.get(t) for t in outputs + inputs]
+    if any(t is None for t in numba_signature):
+        # We don't know how to handle this kernel yet.
+        return None
+    output_types = numba_signature[:len(outputs)]
+    if len(output_types) == 1:
+        return_type, = output_types
+    else:
+        return_type = numba.types.Tuple(output_types)
+    return (return_type, *numba_signature[len(outputs):])
+
+
+def get_output_types(signature):
+    """Return the types of the outputs of a signature."""
+    return_type = signature[0]
+    if isinstance(return_type, numba.types.BaseTuple):
+        return tuple(return_type)
+    return (return_type,)
+
+
+def get_typecodes(signature):
+    """Return the NumPy type codes of a signature, like `'dd->d'`."""
+    return '{}->{}'.format(
+        ''.join(numpy_support.as_dtype(t).char for t in signature[1:]),
+        ''.join(
+            numpy_support.as_dtype(t).char for t in get_output_types(signature)
+        ),
+    )
+
+
+def get_loop_index(name, signature):
+    """Return the index of the loop of the SciPy ufunc using `signature`.
+
+    Kernels backing no loop of the ufunc come last.
+
+    """
+    sc_function = getattr(sc, name, None)
+    loops = getattr(sc_function, 'types', [])
+    try:
+        return loops.index(get_typecodes(signature))
+    except ValueError:
+        return len(loops)
+
+
+def is_used_by_ufunc(name, signature):
+    """Return whether a complex kernel backs a loop of the SciPy ufunc.
+
+    Cython generates a kernel for every combination of fused types, and
+    some of the complex ones, such as the integer order `eval_*`
+    kernels, are stubs returning NaN that no SciPy ufunc uses.
+
+    """
+    all_types = get_output_types(signature) + tuple(signature[1:])
+    if not any(isinstance(t, numba.types.Complex) for t in all_types):
+        return True
+    sc_function = getattr(sc, name, None)
+    if not isinstance(sc_function, np.ufunc):
+        return True
+    return get_typecodes(signature) in sc_function.types
+
+
+def parse_numba_signature(capsule):
+    """Return the Numba signature of a capsule, or `None` if unsupported."""
+    return to_numba_signature(parse_capsule_name(capsule))
+
+
+def get_cache_dir():
+    """Return the directory used to persist the signature table.
+
+    This is `$NUMBA_SCIPY_CACHE_DIR` if set, and the user cache directory
+    otherwise. Setting the variable to an empty string disables the
+    on-disk table.
+
+    """
+    cache_dir = os.environ.get('NUMBA_SCIPY_CACHE_DIR')
+    if cache_dir is None:
+        cache_dir = AppDirs('numba-scipy').user_cache_dir
+    return cache_dir or None
+
+
+def get_signature_cache_key():
+    """Return the key identifying the SciPy build the table belongs to.
+
+    The signatures only change when `cython_special` is rebuilt, so the
+    key is made of the SciPy version, the location and modification time
+    of the extension module, and the interpreter ABI.
+
+    """
+    stat = os.stat(cysc.__file__)
+    return [
+        SIGNATURE_CACHE_VERSION,
+        scipy.__version__,
+        os.path.realpath(cysc.__file__),
+        stat.st_mtime_ns,
+        stat.st_size,
+        sys.implementation.cache_tag,
+        platform.machine(),
+        struct.calcsize('P'),
+    ]
+
+
+def get_signature_cache_path(cache_dir, key):
+    digest = hashlib.sha256(json.dumps(key).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, 'special-signatures-{}.json'.format(digest))
+
+
+def load_signature_cache(cache_dir):
+    """Load the parsed capsule signatures saved for this SciPy build.
+
+    Returns a dict mapping mangled names to Cython signatures, or `None`
+    if there is no usable table.
+
+    """
+    key = get_signature_cache_key()
+    try:
+        with open(get_signature_cache_path(cache_dir, key)) as f:
+            content = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(content, dict) or content.get('key') != key:
+        return None
+    cython_signatures = content.get('signatures')
+    if not is_valid_signature_table(cython_signatures):
+        # E.g. a truncated or edited file, which is parsed again.
+        return None
+    return cython_signatures
+
+
+def is_valid_signature_table(cython_signatures):
+    """Return whether a loaded table has a signature for every capsule.
+
+    A signature is a non-empty list of Cython type names, return type
+    first, as returned by `parse_capsule_name`.
+
+    """
+    if not isinstance(cython_signatures, dict):
+        return False
+    if cython_signatures.keys() != cysc.__pyx_capi__.keys():
+        return False
+    return all(
+        isinstance(signature, list) and signature
+        and all(isinstance(type_name, str) for type_name in signature)
+        for signature in cython_signatures.values()
+    )
+
+
+def save_signature_cache(cache_dir, cython_signatures):
+    """Save the parsed capsule signatures for this SciPy build.
+
+    Failing to write the table, e.g. on a read-only file system, is not
+    an error: the signatures will simply be parsed again next time.
+
+    """
+    key = get_signature_cache_key()
+    path = get_signature_cache_path(cache_dir, key)
+    content = {'key': key, 'signatures': cython_signatures}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so that concurrent processes
+        # never see a partially written table.
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(content, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        pass
+
+
 def get_signatures_from_pyx_capi():
     signature_to_pointer = {}
 
     for mangled_name, capsule in cysc.__pyx_capi__.items():
-        numba_signature = [
-            CYTHON_TO_NUMBA.get(t) for t in parse_capsule_name(capsule)
-        ]
-        if any(t is None for t in numba_signature):
-            # We don't know how to handle this kernel yet.
+        numba_signature = parse_numba_signature(capsule)
+        if numba_signature is None:
             continue
 
         signature_to_pointer[(mangled_name, *numba_signature)] = capsule
@@ -65,6 +312,24 @@ def get_signatures_from_pyx_capi():
     return signature_to_pointer
 
 
+def make_ctypes_pointer(mangled_name, signature):
+    address = (
+        get_cython_function_address('scipy.special.cython_special', mangled_name)
+    )
+    return_type, *arg_types = signature
+    ctypes_signature = [NUMBA_TO_CTYPES[t] for t in arg_types]
+    if isinstance(return_type, numba.types.BaseTuple):
+        ctypes_signature = [None] + ctypes_signature + [
+            ctypes.POINTER(NUMBA_TO_CTYPES[t]) for t in return_type
+        ]
+    else:
+        ctypes_signature.insert(0, NUMBA_TO_CTYPES[return_type])
+    ctypes_cast = (
+        ctypes.CFUNCTYPE(*ctypes_signature)
+    )
+    return ctypes_cast(address)
+
+
 def generate_signatures_dicts(signature_to_pointer):
     name_to_numba_signatures = collections.defaultdict(list)
     name_and_types_to_pointer = {}
@@ -75,15 +340,9 @@ def generate_signatures_dicts(signature_to_pointer):
         )
 
         key = (name,) + tuple(signature[1:])
-
-        address = (
-            get_cython_function_address('scipy.special.cython_special', mangled_name)
+        name_and_types_to_pointer[key] = make_ctypes_pointer(
+            mangled_name, signature
         )
-        ctypes_signature = [NUMBA_TO_CTYPES[t] for t in signature]
-        ctypes_cast = (
-            ctypes.CFUNCTYPE(*ctypes_signature)
-        )
-        name_and_types_to_pointer[key] = ctypes_cast(address)
 
     name_to_numba_signatures = {
         name: tuple(signatures)
@@ -92,5 +351,165 @@ def generate_signatures_dicts(signature_to_pointer):
     return name_to_numba_signatures, name_and_types_to_pointer
 
 
-signature_to_pointer = get_signatures_from_pyx_capi()
-name_to_numba_signatures, name_and_types_to_pointer = generate_signatures_dicts(signature_to_pointer)
+class KernelIndex:
+    """Name-keyed, on-demand index of the kernels in `cython_special`.
+
+    Building the full signature tables means parsing every capsule and
+    creating a ctypes wrapper for every specialization, which is wasted
+    work for a process that only uses a handful of functions. Instead
+    the capsules of a function are only parsed the first time its
+    signatures are requested, and a kernel is only bound the first time
+    its pointer is requested.
+
+    If `cache_dir` is given, the parsed signatures of all capsules are
+    persisted there, keyed on the SciPy build. Processes started later
+    then load that small table instead of parsing any capsule.
+
+    """
+
+    def __init__(self, cache_dir=None):
+        self._cache_dir = cache_dir
+        self._cython_signatures = None
+        self._mangled_names = None
+        self._signatures = {}
+        self._pointers = {}
+
+    def _get_cython_signatures(self):
+        if self._cython_signatures is None and self._cache_dir is not None:
+            cython_signatures = load_signature_cache(self._cache_dir)
+            if cython_signatures is None:
+                cython_signatures = {
+                    mangled_name: parse_capsule_name(capsule)
+                    for mangled_name, capsule in cysc.__pyx_capi__.items()
+                }
+                save_signature_cache(self._cache_dir, cython_signatures)
+            self._cython_signatures = cython_signatures
+        return self._cython_signatures
+
+    def _get_mangled_names(self):
+        if self._mangled_names is None:
+            mangled_names = collections.defaultdict(list)
+            for mangled_name in cysc.__pyx_capi__:
+                name = de_mangle_function_name(mangled_name)
+                mangled_names[name].append(mangled_name)
+            self._mangled_names = dict(mangled_names)
+        return self._mangled_names
+
+    def names(self):
+        """Return the names of all functions exported by `cython_special`.
+
+        This only looks at the keys of `__pyx_capi__`; no capsule is
+        parsed, so the result may include functions none of whose
+        specializations are supported.
+
+        """
+        return tuple(self._get_mangled_names())
+
+    def signatures(self, name):
+        """Return a dict mapping mangled names to supported signatures.
+
+        Each signature is a tuple of Numba types, return type first.
+
+        """
+        signatures = self._signatures.get(name)
+        if signatures is None:
+            cython_signatures = self._get_cython_signatures()
+            signatures = {}
+            for mangled_name in self._get_mangled_names().get(name, ()):
+                if cython_signatures is not None:
+                    numba_signature = to_numba_signature(
+                        cython_signatures[mangled_name]
+                    )
+                else:
+                    capsule = cysc.__pyx_capi__[mangled_name]
+                    numba_signature = parse_numba_signature(capsule)
+                if (
+                    numba_signature is not None
+                    and is_used_by_ufunc(name, numba_signature)
+                ):
+                    signatures[mangled_name] = numba_signature
+            self._signatures[name] = signatures
+        return signatures
+
+    def pointer(self, name, *arg_types):
+        """Return the ctypes function for a specialization of `name`."""
+        key = (name, *arg_types)
+        pointer = self._pointers.get(key)
+        if pointer is None:
+            for mangled_name, signature in self.signatures(name).items():
+                if signature[1:] == arg_types:
+                    pointer = make_ctypes_pointer(mangled_name, signature)
+                    break
+            else:
+                raise KeyError(key)
+            self._pointers[key] = pointer
+        return pointer
+
+
+class _NameToNumbaSignatures(collections.abc.Mapping):
+    """Lazy mapping of function name to its argument type signatures."""
+
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, name):
+        signatures = tuple(
+            signature[1:]
+            for signature in self._index.signatures(name).values()
+        )
+        if not signatures:
+            raise KeyError(name)
+        return signatures
+
+    def __iter__(self):
+        return (name for name in self._index.names() if name in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class _NameAndTypesToPointer(collections.abc.Mapping):
+    """Lazy mapping of `(name, *arg_types)` to a ctypes function."""
+
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, key):
+        name, *arg_types = key
+        return self._index.pointer(name, *arg_types)
+
+    def __iter__(self):
+        for name in self._index.names():
+            for signature in self._index.signatures(name).values():
+                yield (name, *signature[1:])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class _SignatureToPointer(collections.abc.Mapping):
+    """Lazy mapping of `(mangled_name, *signature)` to its capsule."""
+
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, key):
+        mangled_name, *signature = key
+        name = de_mangle_function_name(mangled_name)
+        if self._index.signatures(name).get(mangled_name) != tuple(signature):
+            raise KeyError(key)
+        return cysc.__pyx_capi__[mangled_name]
+
+    def __iter__(self):
+        for name in self._index.names():
+            for mangled_name, signature in self._index.signatures(name).items():
+                yield (mangled_name, *signature)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+kernel_index = KernelIndex(get_cache_dir())
+signature_to_pointer = _SignatureToPointer(kernel_index)
+name_to_numba_signatures = _NameToNumbaSignatures(kernel_index)
+name_and_types_to_pointer = _NameAndTypesToPointer(kernel_index)
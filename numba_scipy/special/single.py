@@ -0,0 +1,310 @@
+"""Single-precision implementations of kernels with no float32 version.
+
+Most kernels of `cython_special` only exist in double precision, so
+calls with float32 arguments are promoted: the arguments are converted
+to float64 and the double kernel is called. Scalar calls return float64,
+and array calls cast the float64 results to float32. With
+`config.SPECIAL_FLOAT32` set, the overloads instead use the functions in
+this module for the signatures listed in `SINGLE_KERNELS`. They compute
+in float32 throughout, return float32 like the SciPy ufuncs do for
+float32 inputs, and are compiled into the caller, so loops over float32
+arrays can be vectorized at full width.
+
+`erf`, `erfc`, `ndtr` and `gammaln` are ports of the single-precision
+Cephes library, except for the polynomials of `erfc` below 2, whose
+coefficients were fitted in float32 for forms avoiding cancellation.
+Their exponentials are computed by a port of Cephes `expf` too, which
+LLVM can inline and vectorize, unlike calls to the C math library. The
+other functions call the float32 functions of the C math library.
+`ACCURACY` is the contract of each function: the largest error, in units
+in the last place of the float32 result, against the double-precision
+kernel.
+
+Unlike the Cython kernels, they don't report errors through `sf_error`.
+
+"""
+import math
+
+import numba
+import numpy as np
+from numba.types import float32
+
+ZERO = np.float32(0.0)
+HALF = np.float32(0.5)
+ONE = np.float32(1.0)
+TWO = np.float32(2.0)
+INF = np.float32(np.inf)
+LS2PI = np.float32(0.91893853320467274178)
+LOGPI = np.float32(1.14472988584940017414)
+PI = np.float32(np.pi)
+SQRT1_2 = np.float32(0.70710678118654752440)
+# Squares are split at multiples of 1/SPLIT, whose squares are exact
+# below 16.
+SPLIT = np.float32(256.0)
+SPLIT_INV = np.float32(1.0 / 256.0)
+# exp(-x) rounds to zero in float32 from there on.
+UNDERFLOW = np.float32(104.0)
+LOG2E = np.float32(1.44269504088896341)
+# log(2) split in a part with few bits and the rest.
+LN2_HI = np.float32(0.693359375)
+LN2_LO = np.float32(-2.12194440e-4)
+
+
+def _float32_tuple(coefficients):
+    # Coefficients are tuples rather than arrays, which Numba compiles to
+    # constants, so that the loops of `_polevl` are unrolled.
+    return tuple(np.float32(c) for c in coefficients)
+
+
+EXP_TAYLOR = _float32_tuple([1.0 / 24.0, 1.0 / 6.0, 0.5, 1.0, 1.0])
+# exp(x) = 1 + x + x**2 E(x) for |x| <= log(2)/2.
+EXP_E = _float32_tuple([
+    1.9875691500e-04, 1.3981999507e-03, 8.3334519073e-03, 4.1665795894e-02,
+    1.6666665459e-01, 5.0000001201e-01,
+])
+# erf(x) = x T(x**2) for |x| <= 1.
+ERF_T = _float32_tuple([
+    7.853861353153693e-05, -8.010193625184903e-04, 5.188327685732524e-03,
+    -2.685381193529856e-02, 1.128358514861418e-01, -3.761262582423300e-01,
+    1.128379165726710e+00,
+])
+# erfc(x) = exp(-x**2) S(x - 0.75) for 0.5 <= x < 1, which avoids the
+# cancellation of 1 - erf(x).
+ERFC_S = _float32_tuple([
+    1.4496094547212124e-02, -3.256623074412346e-02, 6.67879581451416e-02,
+    -1.2981513142585754e-01, 2.3095805943012238e-01, -3.6797285079956055e-01,
+    5.069376230239868e-01,
+])
+# erfc(x) = exp(-x**2) P(1/x**2) / x for 1 <= x < 2.
+ERFC_P = _float32_tuple([
+    2.3268532007932663e-02, -1.387060433626175e-01, 3.687479794025421e-01,
+    -5.824811458587646e-01, 6.210070848464966e-01, -4.94454950094223e-01,
+    3.4048905968666077e-01, -2.7411288022994995e-01, 5.638259649276733e-01,
+])
+# erfc(x) = exp(-x**2) R(1/x**2) / x for x >= 2.
+ERFC_R = _float32_tuple([
+    -1.047766399936249e+01, 1.297719955372516e+01, -7.495518717768503e+00,
+    2.921019019210786e+00, -1.015265279202700e+00, 4.218463358204948e-01,
+    -2.820767439740514e-01, 5.641895067754075e-01,
+])
+# lgam(x + 2) = x B(x) for -0.5 <= x <= 0.5.
+LGAM_B = _float32_tuple([
+    6.055172732649237e-04, -1.311620815545743e-03, 2.863437556468661e-03,
+    -7.366775108654962e-03, 2.058355474821512e-02, -6.735323259371034e-02,
+    3.224669577325661e-01, 4.227843421859038e-01,
+])
+# lgam(x + 1) = x C(x) for -0.25 <= x <= 0.25.
+LGAM_C = _float32_tuple([
+    1.369488127325832e-01, -1.590086327657347e-01, 1.692415923504637e-01,
+    -2.067882815621965e-01, 2.705806208275915e-01, -4.006931650563372e-01,
+    8.224670749082976e-01, -5.772156501719101e-01,
+])
+# Stirling's series for lgam, 6.5 <= x <= 1e4.
+LGAM_STIRLING = _float32_tuple([
+    6.789774945028216e-04, -2.769887652139868e-03, 8.333316229807355e-02,
+])
+
+
+@numba.njit(error_model='numpy')
+def _polevl(x, coefficients):
+    p = coefficients[0]
+    for i in range(1, len(coefficients)):
+        p = p * x + coefficients[i]
+    return p
+
+
+@numba.njit(error_model='numpy')
+def _pow2(n):
+    # 2**n for -126 <= n <= 127.
+    return np.int32((n + 127) << 23).view(np.float32)
+
+
+@numba.njit(error_model='numpy')
+def _exp(x):
+    # Cephes `expf` for -104 <= x <= 88.72.
+    z = np.floor(LOG2E * x + HALF)
+    x = (x - z * LN2_HI) - z * LN2_LO
+    p = _polevl(x, EXP_E) * (x * x) + x + ONE
+    # Scaled in two steps, for results that are subnormal.
+    n = np.int32(z)
+    n1 = n >> 1
+    return p * _pow2(n1) * _pow2(n - n1)
+
+
+@numba.njit(error_model='numpy')
+def _exp_neg_square(x, scale):
+    # exp(-scale * x**2) for x >= 0 and scale <= 1. The rounding error of
+    # x**2 would be multiplied by x**2 in the result, so x is split into
+    # a multiple m of 1/SPLIT, whose square is exact, and a remainder f.
+    if scale * x * x > UNDERFLOW:
+        return ZERO
+    m = SPLIT_INV * np.floor(SPLIT * x + HALF)
+    f = x - m
+    # At most 0.04, so that its exponential is given by 5 terms of its
+    # Taylor series.
+    u = scale * (TWO * m * f + f * f)
+    return _exp(-scale * (m * m)) * _polevl(-u, EXP_TAYLOR)
+
+
+@numba.njit(error_model='numpy')
+def _erfc_positive(x, e):
+    # erfc(x) for x >= 0.5, with e = exp(-x**2).
+    if x < ONE:
+        return e * _polevl(x - np.float32(0.75), ERFC_S)
+    q = ONE / x
+    if x < TWO:
+        return e * q * _polevl(q * q, ERFC_P)
+    return e * q * _polevl(q * q, ERFC_R)
+
+
+@numba.njit(error_model='numpy')
+def erf(x):
+    if math.isnan(x):
+        return x
+    z = abs(x)
+    if z <= ONE:
+        return x * _polevl(x * x, ERF_T)
+    y = ONE - _erfc_positive(z, _exp_neg_square(z, ONE))
+    return y if x > ZERO else -y
+
+
+@numba.njit(error_model='numpy')
+def erfc(x):
+    if math.isnan(x):
+        return x
+    z = abs(x)
+    if z < HALF:
+        return ONE - x * _polevl(x * x, ERF_T)
+    y = _erfc_positive(z, _exp_neg_square(z, ONE))
+    return TWO - y if x < ZERO else y
+
+
+@numba.njit(error_model='numpy')
+def ndtr(a):
+    if math.isnan(a):
+        return a
+    x = a * SQRT1_2
+    z = abs(x)
+    if z < SQRT1_2:
+        return HALF + HALF * (x * _polevl(x * x, ERF_T))
+    # exp(-x**2) is computed from `a`, as the rounding of `x` would be
+    # amplified in the tail.
+    y = HALF * _erfc_positive(z, _exp_neg_square(abs(a), HALF))
+    return ONE - y if x > ZERO else y
+
+
+@numba.njit(error_model='numpy')
+def _lgam(x):
+    # Cephes `lgamf` for x > -20 and not a pole. Like the double-precision
+    # `lgam`, it uses the recurrence rather than the reflection formula
+    # for negative x, which is cheaper and more accurate near the poles.
+    if x < np.float32(6.5):
+        if np.float32(0.75) <= x < np.float32(1.25):
+            t = x - ONE
+            return t * _polevl(t, LGAM_C)
+        if np.float32(1.25) <= x < np.float32(1.5):
+            # lgam(x) = lgam(x + 1) - log(x)
+            t = x - ONE
+            return t * _polevl(t, LGAM_B) - math.log(x)
+        # Shift the argument to [1.5, 2.5] by the recurrence.
+        z = ONE
+        if x < np.float32(1.5):
+            while x < np.float32(1.5):
+                z *= x
+                x += ONE
+            t = x - TWO
+            return t * _polevl(t, LGAM_B) - math.log(abs(z))
+        while x > np.float32(2.5):
+            x -= ONE
+            z *= x
+        t = x - TWO
+        return t * _polevl(t, LGAM_B) + math.log(z)
+    lx = math.log(x)
+    if x > np.float32(1.0e4):
+        # Written so that only the result may overflow.
+        return x * (lx - ONE) - HALF * lx + LS2PI
+    z = ONE / x
+    q = LS2PI - x + (x - HALF) * lx
+    return q + z * _polevl(z * z, LGAM_STIRLING)
+
+
+@numba.njit(error_model='numpy')
+def gammaln(x):
+    if not math.isfinite(x):
+        return x
+    if x <= ZERO and np.floor(x) == x:
+        return INF
+    if x > np.float32(-20.0):
+        return _lgam(x)
+    q = -x
+    p = np.floor(q)
+    z = q - p
+    if z > HALF:
+        z = (p + ONE) - q
+    z = q * math.sin(PI * z)
+    if z == ZERO:
+        return INF
+    return LOGPI - math.log(z) - _lgam(q)
+
+
+@numba.njit(error_model='numpy')
+def xlogy(x, y):
+    if x == ZERO and not math.isnan(y):
+        return ZERO
+    return x * math.log(y)
+
+
+@numba.njit(error_model='numpy')
+def xlog1py(x, y):
+    if x == ZERO and not math.isnan(y):
+        return ZERO
+    return x * math.log1p(y)
+
+
+@numba.njit(error_model='numpy')
+def log1p(x):
+    return math.log1p(x)
+
+
+@numba.njit(error_model='numpy')
+def expm1(x):
+    return math.expm1(x)
+
+
+# Maps `(name, return type, *argument types)` to the single-precision
+# implementation used in float32 mode.
+SINGLE_KERNELS = {
+    ('erf', float32, float32): erf,
+    ('erfc', float32, float32): erfc,
+    ('ndtr', float32, float32): ndtr,
+    ('gammaln', float32, float32): gammaln,
+    ('xlogy', float32, float32, float32): xlogy,
+    ('xlog1py', float32, float32, float32): xlog1py,
+    ('log1p', float32, float32): log1p,
+    ('expm1', float32, float32): expm1,
+}
+
+# Largest error of each function in units in the last place of its
+# float32 result, for results in the normal range. `gammaln` is measured
+# in units of the larger of its result and 1, since it can't be computed
+# to relative accuracy near its zeros for negative arguments.
+ACCURACY = {
+    'erf': 3,
+    'erfc': 6,
+    'ndtr': 6,
+    'gammaln': 4,
+    'xlogy': 2,
+    'xlog1py': 2,
+    'log1p': 1,
+    'expm1': 1,
+}
+
+
+def get_single_kernel(name, arg_types):
+    """Return the float32 implementation of `name`, or `None`.
+
+    `arg_types` are the types of the arguments of a call, which must all
+    be float32.
+
+    """
+    return SINGLE_KERNELS.get((name, float32, *arg_types))
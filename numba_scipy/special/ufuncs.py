@@ -0,0 +1,104 @@
+"""NumPy ufuncs compiled by Numba from the `scipy.special` kernels.
+
+Accessing an attribute of this module builds a ufunc for the function of
+the same name in `scipy.special`, with one loop per kernel specialization
+known to numba-scipy. The result is a real `numpy.ufunc`, so it can be
+called from plain Python and used anywhere a ufunc is expected, e.g. on
+Dask or xarray objects:
+
+    >>> from numba_scipy.special import ufuncs
+    >>> ufuncs.gamma(np.linspace(0.5, 3.0, 6))
+
+The `parallel` namespace holds the same ufuncs compiled for Numba's
+`parallel` target, which spreads the loop over Numba's threading layer:
+
+    >>> ufuncs.parallel.gamma(np.linspace(0.5, 3.0, 6))
+
+Use `make_ufunc` to choose the target and to save the compiled loops in
+Numba's on-disk cache.
+
+"""
+import numba
+import numpy as np
+import scipy.special as sc
+
+from . import overloads, signatures
+
+
+def get_ufunc_signatures(name):
+    """Return the Numba signatures of the loops of the ufunc for `name`.
+
+    They are ordered like the loops of the SciPy ufunc, so that NumPy
+    resolves calls to the same specialization SciPy would use.
+
+    """
+    all_signatures = sorted(
+        signatures.kernel_index.signatures(name).values(),
+        key=lambda signature: signatures.get_loop_index(name, signature),
+    )
+    return [signature[0](*signature[1:]) for signature in all_signatures]
+
+
+def make_ufunc(name, target='cpu', cache=False):
+    """Build a NumPy ufunc evaluating `scipy.special.<name>` with Numba.
+
+    Parameters
+    ----------
+    name : str
+        Name of the function in `scipy.special`.
+    target : str
+        Numba target of the ufunc, `'cpu'` or `'parallel'`.
+    cache : bool
+        Whether to save the compiled loops in Numba's on-disk cache.
+
+    """
+    sc_function = getattr(sc, name, None)
+    if not isinstance(sc_function, np.ufunc):
+        raise ValueError('{} is not a scipy.special ufunc'.format(name))
+    if sc_function.nout != 1:
+        raise NotImplementedError(
+            '{} has more than one output'.format(name)
+        )
+    ufunc_signatures = get_ufunc_signatures(name)
+    if not ufunc_signatures:
+        raise NotImplementedError(
+            'none of the kernels of {} are supported'.format(name)
+        )
+    return numba.vectorize(ufunc_signatures, target=target, cache=cache)(
+        overloads.make_scalar_function(sc_function)
+    )
+
+
+class UfuncNamespace:
+    """Ufuncs for one Numba target, built on first access."""
+
+    def __init__(self, target='cpu', cache=False):
+        self.target = target
+        self.cache = cache
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            ufunc = make_ufunc(name, self.target, self.cache)
+        except (ValueError, NotImplementedError) as e:
+            raise AttributeError(str(e)) from e
+        setattr(self, name, ufunc)
+        return ufunc
+
+    def __dir__(self):
+        return sorted(
+            set(super().__dir__()) | set(signatures.name_to_numba_signatures)
+        )
+
+
+cpu = UfuncNamespace('cpu')
+parallel = UfuncNamespace('parallel')
+
+
+def __getattr__(name):
+    return getattr(cpu, name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(dir(cpu)))
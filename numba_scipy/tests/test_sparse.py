@@ -3,7 +3,16 @@ import numba
 import numpy as np
 import scipy.sparse
 
-from numba_scipy.sparse import NumbaExperimentalFeatureWarning
+from numba_scipy.sparse import (
+    NumbaExperimentalFeatureWarning,
+    _balanced_bounds,
+    csr_spgemm_numeric,
+    csr_spgemm_symbolic,
+    parallel_csc_matmat,
+    parallel_csc_matvec,
+    parallel_csr_matmat,
+    parallel_csr_matvec,
+)
 
 
 def test_sparse_unboxing():
@@ -80,3 +89,285 @@ def test_sparse_copy():
 
     with pytest.warns(NumbaExperimentalFeatureWarning):
         assert test_fn(x_val)
+
+
+def test_sparse_transpose():
+    @numba.njit
+    def test_fn(x, y):
+        return x.T, y.transpose()
+
+    x_val = scipy.sparse.random(40, 30, density=0.2, format="csr", random_state=0)
+    y_val = x_val.tocsc()
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        res_x_val, res_y_val = test_fn(x_val, y_val)
+
+    assert isinstance(res_x_val, scipy.sparse.csc_matrix)
+    assert isinstance(res_y_val, scipy.sparse.csr_matrix)
+    assert res_x_val.shape == res_y_val.shape == (30, 40)
+    # The arrays are shared rather than copied.
+    assert np.shares_memory(res_x_val.data, x_val.data)
+    assert (res_x_val != x_val.T).nnz == 0
+    assert (res_y_val != y_val.T).nnz == 0
+
+
+def test_sparse_transpose_matvec():
+    @numba.njit
+    def test_fn(A, x):
+        return A.T @ (A @ x)
+
+    A_val = scipy.sparse.random(40, 30, density=0.2, format="csr", random_state=0)
+    x = np.linspace(0.0, 1.0, 30)
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        res = test_fn(A_val, x)
+
+    np.testing.assert_allclose(res, A_val.T @ (A_val @ x))
+
+
+@pytest.mark.parametrize(
+    "product",
+    [lambda A, x: A @ x, lambda A, x: np.dot(A, x), lambda A, x: A.dot(x)],
+    ids=["matmul", "np.dot", "dot"],
+)
+@pytest.mark.parametrize(
+    "dtypes",
+    [
+        (np.float64, np.float64),
+        (np.float32, np.float32),
+        (np.int64, np.float64),
+        (np.complex128, np.float64),
+    ],
+)
+@pytest.mark.parametrize("format", ["csr", "csc"])
+def test_sparse_matvec(product, dtypes, format):
+    A_val = scipy.sparse.random(40, 30, density=0.2, format=format, random_state=0)
+    A_val = A_val.astype(dtypes[0])
+    x = np.arange(30).astype(dtypes[1])
+    test_fn = numba.njit(product)
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        res = test_fn(A_val, x)
+
+    expected = A_val @ x
+    assert res.dtype == expected.dtype
+    np.testing.assert_allclose(res, expected, rtol=1e-6)
+
+
+def test_sparse_matvec_out():
+    @numba.njit
+    def test_fn(A, x, out):
+        return A.dot(x, out=out), np.dot(A, 2.0 * x, out)
+
+    A_val = scipy.sparse.random(40, 30, density=0.2, format="csr", random_state=0)
+    x = np.linspace(0.0, 1.0, 30)
+    out = np.empty(40)
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        res, res2 = test_fn(A_val, x, out)
+
+    assert res2 is out
+    np.testing.assert_allclose(out, 2.0 * (A_val @ x))
+
+
+def test_sparse_matvec_errors():
+    @numba.njit
+    def test_fn(A, x, out):
+        return A.dot(x, out=out)
+
+    A_val = scipy.sparse.csr_matrix(np.eye(4))
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        with pytest.raises(ValueError, match="dimension mismatch"):
+            test_fn(A_val, np.ones(3), np.empty(4))
+        with pytest.raises(ValueError, match="wrong shape"):
+            test_fn(A_val, np.ones(4), np.empty(3))
+
+
+@pytest.mark.parametrize("n_rows", [0, 1, 100])
+@pytest.mark.parametrize(
+    "format, matvec", [("csr", parallel_csr_matvec), ("csc", parallel_csc_matvec)]
+)
+def test_sparse_parallel_matvec(n_rows, format, matvec):
+    rng = np.random.default_rng(0)
+    dense = rng.standard_normal((n_rows, 50)) * (rng.random((n_rows, 50)) < 0.05)
+    if n_rows > 1:
+        # A few dense rows, which the parallel path balances.
+        dense[[3, 50]] = 1.0
+    A_val = scipy.sparse.csr_matrix(dense).asformat(format)
+    x = rng.standard_normal(50)
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        res = matvec(A_val, x, np.empty(n_rows))
+
+    np.testing.assert_allclose(res, dense @ x)
+
+
+@pytest.mark.parametrize("n_threads", [1, 3, 8])
+def test_sparse_parallel_matvec_skewed(n_threads):
+    # Rows with 100, 1, 1, 1, 97 and 0 stored elements, which are split by
+    # stored elements rather than by rows.
+    dense = np.zeros((6, 100))
+    dense[0] = 1.0
+    dense[1:4, 0] = 2.0
+    dense[4, :97] = 3.0
+    A_val = scipy.sparse.csr_matrix(dense)
+    x = np.linspace(0.5, 1.5, 100)
+    n_threads = min(n_threads, numba.config.NUMBA_NUM_THREADS)
+    previous = numba.get_num_threads()
+    numba.set_num_threads(n_threads)
+    try:
+        with pytest.warns(NumbaExperimentalFeatureWarning):
+            res = parallel_csr_matvec(A_val, x, np.empty(6))
+    finally:
+        numba.set_num_threads(previous)
+
+    np.testing.assert_allclose(res, dense @ x)
+
+    bounds = _balanced_bounds(A_val.indptr, n_threads)
+    assert bounds[0] == 0 and bounds[-1] == 6
+    assert np.all(np.diff(bounds) >= 0)
+    nnz = A_val.indptr[bounds[1:]] - A_val.indptr[bounds[:-1]]
+    assert nnz.sum() == A_val.nnz
+    # Parts are off their share by less than the largest row.
+    assert nnz.max() < A_val.nnz // n_threads + 100
+    if n_threads > 1:
+        # The two dense rows go to different parts.
+        parts = np.searchsorted(bounds, [0, 4], side="right")
+        assert parts[0] != parts[1]
+
+
+@pytest.mark.parametrize(
+    "product",
+    [lambda A, B: A @ B, lambda A, B: np.dot(A, B), lambda A, B: A.dot(B)],
+    ids=["matmul", "np.dot", "dot"],
+)
+@pytest.mark.parametrize("format", ["csr", "csc"])
+@pytest.mark.parametrize("n_columns", [1, 5, 300])  # 300 is more than a block.
+def test_sparse_matmat(product, format, n_columns):
+    A_val = scipy.sparse.random(40, 30, density=0.2, format=format, random_state=0)
+    B = np.random.default_rng(0).standard_normal((30, n_columns))
+    test_fn = numba.njit(product)
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        res = test_fn(A_val, B)
+
+    np.testing.assert_allclose(res, A_val @ B)
+
+
+@pytest.mark.parametrize("format", ["csr", "csc"])
+def test_sparse_matmat_layouts(format):
+    @numba.njit
+    def test_fn(A, B, out):
+        return A.dot(B, out=out)
+
+    A_val = scipy.sparse.random(40, 30, density=0.2, format=format, random_state=0)
+    A_val = A_val.astype(np.float32)
+    B = np.random.default_rng(0).standard_normal((5, 30)).T
+    out = np.zeros((80, 5))[::2]
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        res = test_fn(A_val, B, out)
+        with pytest.raises(ValueError, match="wrong shape"):
+            test_fn(A_val, B, np.empty((40, 4)))
+
+    assert res is out
+    np.testing.assert_allclose(out, A_val @ B, rtol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "format, matmat", [("csr", parallel_csr_matmat), ("csc", parallel_csc_matmat)]
+)
+@pytest.mark.parametrize("n_columns", [1, 300])
+def test_sparse_parallel_matmat(format, matmat, n_columns):
+    A_val = scipy.sparse.random(100, 50, density=0.1, format=format, random_state=0)
+    B = np.random.default_rng(0).standard_normal((50, n_columns))
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        res = matmat(A_val, B, np.empty((100, n_columns)))
+
+    np.testing.assert_allclose(res, A_val @ B)
+
+
+@pytest.mark.parametrize(
+    "product",
+    [lambda A, B: A @ B, lambda A, B: np.dot(A, B), lambda A, B: A.dot(B)],
+    ids=["matmul", "np.dot", "dot"],
+)
+@pytest.mark.parametrize("format", ["csr", "csc"])
+@pytest.mark.parametrize("dtypes", [(np.float64, np.float64), (np.int64, np.float32)])
+def test_sparse_spgemm(product, format, dtypes):
+    A_val = scipy.sparse.random(60, 50, density=0.1, format=format, random_state=0)
+    B_val = scipy.sparse.random(50, 40, density=0.1, format=format, random_state=1)
+    A_val = (10 * A_val).astype(dtypes[0])
+    B_val = B_val.astype(dtypes[1])
+    test_fn = numba.njit(product)
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        res = test_fn(A_val, B_val)
+
+    expected = A_val @ B_val
+    assert type(res) is type(expected)
+    assert res.dtype == expected.dtype
+    np.testing.assert_allclose(res.toarray(), expected.toarray(), rtol=1e-6)
+
+
+def test_sparse_spgemm_empty():
+    @numba.njit
+    def test_fn(A, B):
+        return A @ B
+
+    A_val = scipy.sparse.csr_matrix((3, 4))
+    B_val = scipy.sparse.csr_matrix(np.ones((4, 2)))
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        res = test_fn(A_val, B_val)
+
+    assert res.shape == (3, 2) and res.nnz == 0
+
+
+def test_sparse_spgemm_reuse():
+    A_val = scipy.sparse.random(60, 50, density=0.1, format="csr", random_state=0)
+    B_val = scipy.sparse.random(50, 40, density=0.1, format="csr", random_state=1)
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        indptr = csr_spgemm_symbolic(A_val, B_val)
+        A_val.data[:] = np.arange(A_val.nnz)
+        res = csr_spgemm_numeric(A_val, B_val, indptr)
+
+    assert np.array_equal(res.indptr, indptr)
+    np.testing.assert_allclose(res.toarray(), (A_val @ B_val).toarray())
+
+
+def test_sparse_spgemm_reuse_after_change():
+    A_val = scipy.sparse.random(60, 50, density=0.1, format="csr", random_state=0)
+    B_val = scipy.sparse.random(50, 40, density=0.1, format="csr", random_state=1)
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        indptr = csr_spgemm_symbolic(A_val, B_val)
+        expected = indptr.copy()
+        res1 = csr_spgemm_numeric(A_val, B_val, indptr)
+        res2 = csr_spgemm_numeric(A_val, B_val, indptr)
+        # Changing the pattern of one product leaves the others alone.
+        res1.data[::2] = 0.0
+        res1.eliminate_zeros()
+        res3 = csr_spgemm_numeric(A_val, B_val, indptr)
+
+    assert np.array_equal(indptr, expected)
+    assert np.array_equal(res2.indptr, expected)
+    np.testing.assert_allclose(res3.toarray(), (A_val @ B_val).toarray())
+
+
+def test_sparse_spgemm_errors():
+    A_val = scipy.sparse.random(60, 50, density=0.1, format="csr", random_state=0)
+    B_val = scipy.sparse.random(50, 40, density=0.1, format="csr", random_state=1)
+    C_val = scipy.sparse.random(50, 40, density=0.3, format="csr", random_state=2)
+
+    with pytest.warns(NumbaExperimentalFeatureWarning):
+        with pytest.raises(ValueError, match="dimension mismatch"):
+            csr_spgemm_symbolic(A_val, A_val)
+        indptr = csr_spgemm_symbolic(A_val, B_val)
+        with pytest.raises(ValueError, match="indptr doesn't match"):
+            csr_spgemm_numeric(A_val, C_val, indptr)
+        with pytest.raises(ValueError, match="indptr doesn't match"):
+            csr_spgemm_numeric(A_val, B_val, indptr[:-1])
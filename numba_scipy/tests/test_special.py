@@ -1,4 +1,11 @@
+import concurrent.futures
+import ctypes
 import itertools
+import json
+import os
+import subprocess
+import sys
+import textwrap
 import warnings
 
 import pytest
@@ -9,11 +16,17 @@ from numpy.testing import assert_allclose
 import numba
 from numba.types import float64
 import scipy.special as sc
+from numba_scipy import config
+from numba_scipy.special import (approximations, batch, kernels, memo,
+                                 native, overloads, reductions, sequences,
+                                 sf_error, single, ufuncs)
 from numba_scipy.special import signatures as special_signatures
 from numba_scipy.special.signatures import (parse_capsule_name,
                                             de_mangle_function_name,
                                             get_signatures_from_pyx_capi,
                                             generate_signatures_dicts,
+                                            KernelIndex,
+                                            load_signature_cache,
                                             )
 
 NUMBA_TYPES_TO_TEST_POINTS = {
@@ -28,7 +41,17 @@ NUMBA_TYPES_TO_TEST_POINTS = {
     numba.types.long_: np.array(
         [-100, -10, -1, 0, 1, 10, 100],
         dtype=np.int_
-    )
+    ),
+    numba.types.complex128: np.array(
+        [-10.0 + 1.0j, -1.0 - 0.5j, -0.1, 0.0, 0.1 + 0.1j, 1.0j, 1.0 + 1.0j,
+         10.0 - 2.0j],
+        dtype=np.complex128
+    ),
+    numba.types.complex64: np.array(
+        [-10.0 + 1.0j, -1.0 - 0.5j, -0.1, 0.0, 0.1 + 0.1j, 1.0j, 1.0 + 1.0j,
+         10.0 - 2.0j],
+        dtype=np.complex64
+    ),
 }
 
 SKIP_LIST = {
@@ -48,17 +71,42 @@ SKIP_LIST = {
         (numba.types.float64,) * 4
     )
 }
+# Outside of their domain these return values that depend on the points
+# evaluated before, or crash. Likely SciPy bugs.
+SKIP_LIST.update(
+    (name, (numba.types.float64,) * nin)
+    for names, nin in [
+        (('mathieu_modcem1', 'mathieu_modcem2', 'mathieu_modsem1',
+          'mathieu_modsem2'), 3),
+        (('obl_ang1', 'obl_rad1', 'obl_rad2', 'pro_ang1', 'pro_rad1',
+          'pro_rad2'), 4),
+        (('obl_ang1_cv', 'obl_rad1_cv', 'obl_rad2_cv', 'pro_ang1_cv',
+          'pro_rad1_cv', 'pro_rad2_cv'), 5),
+    ]
+    for name in names
+)
+
+
+def compare_values(overload_value, scipy_value):
+    if np.isnan(overload_value):
+        assert np.isnan(scipy_value)
+    else:
+        rtol = 2**8 * np.finfo(scipy_value.dtype).eps
+        assert_allclose(overload_value, scipy_value, atol=0, rtol=rtol)
 
 
 def compare_functions(args, scipy_func, numba_func):
     for arg in args:
         overload_value = numba_func(*arg)
         scipy_value = scipy_func(*arg)
-        if np.isnan(overload_value):
-            assert np.isnan(scipy_value)
+        if isinstance(scipy_value, tuple):
+            assert isinstance(overload_value, tuple)
+            assert len(overload_value) == len(scipy_value)
+            for overload_output, scipy_output in zip(overload_value,
+                                                     scipy_value):
+                compare_values(overload_output, scipy_output)
         else:
-            rtol = 2**8 * np.finfo(scipy_value.dtype).eps
-            assert_allclose(overload_value, scipy_value, atol=0, rtol=rtol)
+            compare_values(overload_value, scipy_value)
 
 
 def get_parametrize_arguments():
@@ -122,6 +170,21 @@ def test_get_signatures_from_pyx_capi(cysc_mock):
     assert expected == received
 
 
+@pytest.mark.parametrize('cython_type, numba_type', [
+    ('int', numba.types.intc),
+    ('long', numba.types.long_),
+    ('long long', numba.types.longlong),
+    ('Py_ssize_t', numba.types.intp),
+])
+def test_integer_signatures(cython_type, numba_type):
+    cython_signature = ['double', cython_type, 'double']
+    assert special_signatures.to_numba_signature(cython_signature) == (
+        float64, numba_type, float64
+    )
+    ctypes_type = special_signatures.NUMBA_TO_CTYPES[numba_type]
+    assert ctypes.sizeof(ctypes_type) == numba_type.bitwidth // 8
+
+
 @patch("numba_scipy.special.signatures.get_cython_function_address", Mock())
 @patch("numba_scipy.special.signatures.ctypes.CFUNCTYPE",
        Mock(return_value=Mock(return_value='0123456789')))
@@ -149,6 +212,146 @@ def test_ensure_signatures_generated():
             len(signature_to_pointer))
 
 
+def test_kernel_index_is_lazy():
+    index = KernelIndex()
+    with patch("numba_scipy.special.signatures.parse_capsule_name",
+               wraps=parse_capsule_name) as parse_mock, \
+            patch("numba_scipy.special.signatures.make_ctypes_pointer",
+                  wraps=special_signatures.make_ctypes_pointer) as bind_mock:
+        assert 'gamma' in index.names()
+        assert parse_mock.call_count == 0
+
+        signatures = index.signatures('gamma')
+        assert (float64, float64) in signatures.values()
+        assert parse_mock.call_count == len(index._get_mangled_names()['gamma'])
+        assert bind_mock.call_count == 0
+
+        f = index.pointer('gamma', float64)
+        assert bind_mock.call_count == 1
+        assert_allclose(f(0.5), sc.gamma(0.5))
+        assert index.pointer('gamma', float64) is f
+        assert bind_mock.call_count == 1
+
+
+def test_kernel_index_unknown_specialization():
+    index = KernelIndex()
+    assert index.signatures('not_a_special_function') == {}
+    with pytest.raises(KeyError):
+        index.pointer('gamma', numba.types.int8)
+
+
+def test_kernel_index_signature_cache(tmp_path):
+    index = KernelIndex(cache_dir=str(tmp_path))
+    expected = index.signatures('gamma')
+    assert len(list(tmp_path.iterdir())) == 1
+    cython_signatures = load_signature_cache(str(tmp_path))
+    assert cython_signatures is not None
+    assert set(cython_signatures) == set(
+        special_signatures.cysc.__pyx_capi__
+    )
+
+    index = KernelIndex(cache_dir=str(tmp_path))
+    with patch("numba_scipy.special.signatures.parse_capsule_name") as parse_mock:
+        assert index.signatures('gamma') == expected
+        assert_allclose(index.pointer('gamma', float64)(0.5), sc.gamma(0.5))
+    assert parse_mock.call_count == 0
+
+
+def test_kernel_index_signature_cache_is_keyed_on_build(tmp_path):
+    KernelIndex(cache_dir=str(tmp_path)).signatures('gamma')
+
+    stale_key = special_signatures.get_signature_cache_key()
+    stale_key[1] = 'not-the-installed-scipy'
+    with patch("numba_scipy.special.signatures.get_signature_cache_key",
+               Mock(return_value=stale_key)):
+        assert load_signature_cache(str(tmp_path)) is None
+        index = KernelIndex(cache_dir=str(tmp_path))
+        assert (float64, float64) in index.signatures('gamma').values()
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda signatures: None,
+    lambda signatures: list(signatures),
+    lambda signatures: dict(list(signatures.items())[1:]),
+    lambda signatures: dict.fromkeys(signatures, 'double'),
+    lambda signatures: dict.fromkeys(signatures, []),
+    lambda signatures: dict.fromkeys(signatures, [1, 2]),
+])
+def test_kernel_index_signature_cache_is_validated(tmp_path, corrupt):
+    KernelIndex(cache_dir=str(tmp_path)).signatures('gamma')
+    path, = tmp_path.iterdir()
+    content = json.loads(path.read_text())
+    content['signatures'] = corrupt(content['signatures'])
+    path.write_text(json.dumps(content))
+
+    assert load_signature_cache(str(tmp_path)) is None
+    index = KernelIndex(cache_dir=str(tmp_path))
+    assert (float64, float64) in index.signatures('gamma').values()
+    assert load_signature_cache(str(tmp_path)) is not None
+
+
+def test_kernel_index_signature_cache_unwritable(tmp_path):
+    cache_dir = tmp_path / 'not-a-directory'
+    cache_dir.write_text('')
+    index = KernelIndex(cache_dir=str(cache_dir))
+    assert (float64, float64) in index.signatures('gamma').values()
+
+
+def test_kernel_is_called_by_symbol():
+    @numba.njit
+    def numba_func(x):
+        return sc.gamma(x)
+
+    assert_allclose(numba_func(0.5), sc.gamma(0.5))
+    (mangled_name, _), = [
+        item for item in
+        special_signatures.kernel_index.signatures('gamma').items()
+        if item[1] == (float64, float64)
+    ]
+    llvm_ir = numba_func.inspect_llvm(numba_func.signatures[0])
+    declaration = 'declare double @{}(double)'.format(
+        kernels.get_symbol_name(mangled_name)
+    )
+    assert declaration in llvm_ir
+
+
+def test_cache_round_trip(tmp_path):
+    module = textwrap.dedent('''
+        import numba
+        import scipy.special as sc
+
+        @numba.njit(cache=True)
+        def numba_func(x):
+            return sc.gamma(x) + sc.erf(x)
+    ''')
+    (tmp_path / 'cached_special.py').write_text(module)
+    script = textwrap.dedent('''
+        from cached_special import numba_func
+        print(numba_func(0.5))
+        print(sum(numba_func.stats.cache_hits.values()))
+        print(sum(numba_func.stats.cache_misses.values()))
+    ''')
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([str(tmp_path)] + sys.path),
+        NUMBA_CACHE_DIR=str(tmp_path / 'cache'),
+    )
+
+    def run():
+        output = subprocess.check_output(
+            [sys.executable, '-c', script], env=env, cwd=str(tmp_path)
+        )
+        value, hits, misses = output.decode().split()
+        assert_allclose(float(value), sc.gamma(0.5) + sc.erf(0.5))
+        return int(hits), int(misses)
+
+    assert run() == (0, 1)
+    # A fresh process must load the code from the cache, which only works
+    # if the kernels are bound again before it is linked.
+    assert run() == (1, 0)
+
+
 @pytest.mark.parametrize(
     'name, specialization',
     get_parametrize_arguments(),
@@ -174,3 +377,809 @@ def test_function(name, specialization):
             category=RuntimeWarning,
         )
         compare_functions(args, scipy_func, numba_func)
+
+
+@pytest.mark.parametrize(
+    'name, specialization',
+    get_parametrize_arguments(),
+)
+def test_function_with_arrays(name, specialization):
+    if (name, specialization) in SKIP_LIST:
+        pytest.xfail()
+    if getattr(sc, name).nout != 1:
+        pytest.skip('arrays are only supported for a single output')
+
+    scipy_func = getattr(sc, name)
+
+    @numba.njit
+    def numba_func(*args):
+        return scipy_func(*args)
+
+    args = tuple(np.array(arg) for arg in zip(*itertools.product(*(
+        NUMBA_TYPES_TO_TEST_POINTS[numba_type] for numba_type in specialization
+    ))))
+    with warnings.catch_warnings():
+        warnings.filterwarnings(
+            action='ignore',
+            message='floating point number truncated to an integer',
+            category=RuntimeWarning,
+        )
+        overload_value = numba_func(*args)
+        scipy_value = scipy_func(*args)
+    assert overload_value.dtype == scipy_value.dtype
+    rtol = 2**8 * np.finfo(scipy_value.dtype).eps
+    assert_allclose(overload_value, scipy_value, atol=0, rtol=rtol)
+
+
+def test_multi_output_kernel_uses_stack_slots():
+    @numba.njit
+    def numba_func(x, m):
+        sn, cn, dn, ph = sc.ellipj(x, m)
+        return sn * cn * dn + ph
+
+    sn, cn, dn, ph = sc.ellipj(0.3, 0.5)
+    assert_allclose(numba_func(0.3, 0.5), sn * cn * dn + ph)
+    (mangled_name, signature), = (
+        special_signatures.kernel_index.signatures('ellipj').items()
+    )
+    assert signature == (numba.types.UniTuple(float64, 4), float64, float64)
+    llvm_ir = numba_func.inspect_llvm(numba_func.signatures[0])
+    symbol_name = kernels.get_symbol_name(mangled_name)
+    declaration, = (
+        line for line in llvm_ir.splitlines()
+        if line.startswith('declare void @{}('.format(symbol_name))
+    )
+    # The attributes depend on the llvmlite version, and so does the
+    # spelling of pointers.
+    for attribute in kernels.OUTPUT_ARGUMENT_ATTRIBUTES:
+        assert declaration.count(attribute) == 4
+    assert 'NRT_MemInfo_alloc' not in llvm_ir
+
+
+def test_function_promotes_arguments():
+    @numba.njit
+    def gamma(x):
+        return sc.gamma(x)
+
+    @numba.njit
+    def beta(a, b):
+        return sc.beta(a, b)
+
+    @numba.njit
+    def bdtr(k, n, p):
+        return sc.bdtr(k, n, p)
+
+    assert_allclose(gamma(np.int64(3)), 2.0)
+    assert_allclose(gamma(True), 1.0)
+    assert_allclose(beta(np.float32(1.5), 2.5), sc.beta(1.5, 2.5))
+    assert_allclose(beta(np.int32(2), np.float32(3)), sc.beta(2, 3))
+    assert_allclose(bdtr(3, 5, 0.5), sc.bdtr(3, 5, 0.5))
+    assert_allclose(gamma(np.arange(1, 4)), sc.gamma(np.arange(1, 4)))
+
+
+def test_function_array_dtypes(monkeypatch):
+    @numba.njit
+    def gamma(x):
+        return sc.gamma(x)
+
+    @numba.njit
+    def beta(a, b):
+        return sc.beta(a, b)
+
+    # Like the SciPy ufuncs, which have float32 loops.
+    for x in (np.linspace(0.5, 3.0, 6, dtype=np.float32),
+              np.arange(1, 7, dtype=np.int8)):
+        expected = sc.gamma(x)
+        assert expected.dtype == np.float32
+        assert gamma(x).dtype == expected.dtype
+        assert_allclose(gamma(x), expected, rtol=1e-6)
+    x = np.linspace(0.5, 3.0, 6, dtype=np.float32)
+    assert beta(x, 2.5).dtype == sc.beta(x, 2.5).dtype == np.float32
+    assert beta(x, np.ones(6)).dtype == np.float64
+
+    monkeypatch.setattr(config, 'SPECIAL_PARALLEL_THRESHOLD', 1)
+    parallel_gamma = numba.njit(overloads.choose_kernel('gamma')(
+        (numba.typeof(x),), None
+    ))
+    assert parallel_gamma(x).dtype == np.float32
+    assert_allclose(parallel_gamma(x), sc.gamma(x), rtol=1e-6)
+
+
+def test_find_signature():
+    long_ = numba.types.long_
+    # An exact kernel is preferred, then the one needing the fewest casts.
+    assert overloads.find_signature('bdtr', (float64, long_, float64)) == (
+        float64, float64, long_, float64
+    )
+    assert overloads.find_signature('bdtr', (long_, long_, float64)) == (
+        float64, float64, long_, float64
+    )
+    assert overloads.find_signature('gamma', (numba.types.int8,)) == (
+        float64, float64
+    )
+    # Casting complex to real loses information.
+    assert overloads.find_signature('ellipk', (numba.types.complex128,)) is None
+    assert overloads.find_signature('gamma', (numba.types.unicode_type,)) is None
+
+    # Promotions are remembered in the dispatch table.
+    table = overloads.get_dispatch_table('beta')
+    assert (numba.types.int16, numba.types.int64) not in table
+    signature = overloads.find_signature(
+        'beta', (numba.types.int16, numba.types.IntegerLiteral(2))
+    )
+    assert signature == (float64, float64, float64)
+    assert table[numba.types.int16, numba.types.int64] is signature
+
+
+@pytest.mark.parametrize('name, signature', [
+    (key[0], key[1:]) for key in native.NATIVE_KERNELS
+])
+def test_native_kernels(name, signature):
+    scipy_func = getattr(sc, name)
+
+    @numba.njit
+    def numba_func(*args):
+        return scipy_func(*args)
+
+    rng = np.random.default_rng(0)
+    points = np.concatenate([
+        NUMBA_TYPES_TO_TEST_POINTS[float64],
+        rng.uniform(0.0, 1.0, 50),
+        rng.standard_normal(50) * 40.0,
+        [0.5, 1.0, 2.0, 8.0, -26.5, -34.5, 1e8, np.inf, -np.inf, np.nan],
+    ])
+    args = itertools.product(points, repeat=len(signature) - 1)
+    with np.errstate(all='ignore'):
+        compare_functions(args, scipy_func, numba_func)
+
+    # The kernel is compiled into the caller instead of being called.
+    llvm_ir = numba_func.inspect_llvm(numba_func.signatures[0])
+    assert kernels.SYMBOL_PREFIX not in llvm_ir
+
+
+@pytest.mark.parametrize('name, signature', [
+    (key[0], key[1:]) for key in single.SINGLE_KERNELS
+])
+def test_single_kernels(monkeypatch, name, signature):
+    monkeypatch.setattr(config, 'SPECIAL_FLOAT32', True)
+    scipy_func = getattr(sc, name)
+    numba_func = numba.njit(
+        overloads.choose_kernel(name)(signature[1:], None)
+    )
+
+    rng = np.random.default_rng(0)
+    points = np.concatenate([
+        NUMBA_TYPES_TO_TEST_POINTS[numba.types.float32],
+        rng.uniform(0.0, 1.0, 50),
+        rng.standard_normal(50) * 40.0,
+        [0.5, 1.0, 2.0, 8.0, -26.5, -34.5, 1e8, np.inf, -np.inf, np.nan],
+    ]).astype(np.float32)
+    args = list(itertools.product(points, repeat=len(signature) - 1))
+    values = np.array([numba_func(*arg) for arg in args])
+    with np.errstate(all='ignore'):
+        expected = scipy_func(*np.array(args, dtype=np.float64).T)
+    assert numba_func.nopython_signatures[0].return_type == signature[0]
+
+    expected32 = expected.astype(np.float32)
+    finite = np.isfinite(expected32)
+    np.testing.assert_array_equal(values[~finite], expected32[~finite])
+    # The contract is in units in the last place of the float32 result.
+    floor = 1.0 if name == 'gammaln' else np.finfo(np.float32).tiny
+    ulp = np.spacing(np.maximum(np.abs(expected32[finite]), floor))
+    error = np.abs(values[finite] - expected[finite])
+    assert np.all(error <= single.ACCURACY[name] * ulp)
+    llvm_ir = numba_func.inspect_llvm(numba_func.signatures[0])
+    assert kernels.SYMBOL_PREFIX not in llvm_ir
+    assert ' double ' not in llvm_ir.split('define')[1].split('}')[0]
+
+
+def test_single_mode_environment():
+    script = textwrap.dedent('''
+        import numba
+        import numpy as np
+        import scipy.special as sc
+
+        @numba.njit
+        def numba_func(x, y):
+            return sc.erf(x), sc.xlogy(x, y), sc.erf(y[0]), sc.gamma(y[0])
+
+        x = np.linspace(-3.0, 3.0, 7, dtype=np.float32)
+        values = numba_func(x, np.abs(x) + 1)
+        return_types = numba_func.nopython_signatures[0].return_type
+        for value, return_type in zip(values, return_types):
+            if isinstance(return_type, numba.types.Array):
+                return_type = return_type.dtype
+            print(return_type, np.asarray(value).ravel()[0])
+    ''')
+    env = dict(os.environ, NUMBA_SCIPY_FLOAT32='1')
+    output = subprocess.check_output([sys.executable, '-c', script], env=env)
+    lines = [line.split() for line in output.decode().splitlines()]
+    x = np.float32(-3.0)
+    expected = [sc.erf(x), sc.xlogy(x, np.float32(4.0)),
+                sc.erf(np.float32(4.0)), sc.gamma(np.float32(4.0))]
+    # `gamma` has no single-precision implementation, so it is promoted.
+    assert [dtype for dtype, _ in lines] == [
+        'float32', 'float32', 'float32', 'float64'
+    ]
+    assert_allclose([float(value) for _, value in lines], expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize('name, order', overloads.LITERAL_ORDER_KERNELS)
+def test_literal_order_kernels(name, order):
+    scipy_func = getattr(sc, name)
+    kernel_name = overloads.LITERAL_ORDER_KERNELS[name, order]
+
+    numba_func = numba.njit(
+        'float64(float64)'
+    )(eval('lambda x: scipy_func({}, x)'.format(order),
+           {'scipy_func': scipy_func}))
+    x = np.concatenate([
+        NUMBA_TYPES_TO_TEST_POINTS[float64], np.linspace(0.1, 30.0, 100)
+    ])
+    with np.errstate(all='ignore'):
+        expected = scipy_func(order, x)
+    assert_allclose(
+        [numba_func(v) for v in x], expected, rtol=1e-10, atol=1e-15
+    )
+    llvm_ir = numba_func.inspect_llvm(numba_func.signatures[0])
+    assert '@{}('.format(kernels.get_symbol_name(kernel_name)) in llvm_ir
+
+
+@pytest.mark.parametrize('name', sorted(native.ORDER_POLYNOMIALS))
+def test_literal_order_polynomials(name):
+    scipy_func = getattr(sc, name)
+    x = np.concatenate([
+        np.linspace(-1.5, 1.5, 301), [1e-6, -2e-6, 10.0, -10.0, np.nan]
+    ])
+    # Only `eval_legendre` calls its integer order kernel, for tiny `x`.
+    integer_kernels = {
+        kernels.get_symbol_name(mangled_name)
+        for mangled_name, signature in
+        special_signatures.kernel_index.signatures(name).items()
+        if signature[1:] == (numba.types.long_, float64)
+    }
+    for order in range(-5, 12):
+        numba_func = numba.njit(eval(
+            'lambda x: scipy_func({}, x)'.format(order),
+            {'scipy_func': scipy_func},
+        ))
+        # SciPy uses the same recurrences, so the results are identical.
+        np.testing.assert_array_equal(
+            [numba_func(v) for v in x], scipy_func(order, x)
+        )
+        llvm_ir = numba_func.inspect_llvm(numba_func.signatures[0])
+        declared = {
+            line.split('@')[1].split('(')[0]
+            for line in llvm_ir.splitlines()
+            if line.startswith('declare') and kernels.SYMBOL_PREFIX in line
+        }
+        assert declared <= integer_kernels
+
+
+def test_literal_arguments_without_specialization():
+    @numba.njit
+    def numba_func(x):
+        return sc.gamma(3) + sc.jv(2, x) + sc.eval_legendre(3, 0.5)
+
+    assert_allclose(
+        numba_func(0.7), sc.gamma(3) + sc.jv(2, 0.7) + sc.eval_legendre(3, 0.5)
+    )
+
+
+@pytest.mark.parametrize('name, lower, upper', [
+    ('gammaln', 0.5, 50.0),
+    ('digamma', 1.0, 100.0),
+    ('erfinv', -0.99, 0.99),
+    ('ndtri', 0.01, 0.99),
+    ('i0e', 0.0, 50.0),
+])
+def test_approximation(name, lower, upper):
+    rtol, atol = 1e-10, 1e-13
+    approximation = approximations.make_approximation(
+        name, lower, upper, rtol=rtol, atol=atol
+    )
+    scipy_func = getattr(sc, name)
+
+    @numba.njit
+    def numba_func(x):
+        out = np.empty_like(x)
+        for i in range(x.shape[0]):
+            out[i] = approximation(x[i])
+        return out
+
+    x = np.random.default_rng(0).uniform(lower, upper, 10_000)
+    x[:2] = lower, upper
+    assert_allclose(numba_func(x), scipy_func(x), rtol=rtol, atol=atol)
+    # Outside of the table the exact kernel is called.
+    outside = np.array([lower - 0.5, upper + 0.5, np.nan])
+    assert_allclose(numba_func(outside), scipy_func(outside), rtol=1e-15)
+
+
+def test_approximation_errors():
+    with pytest.raises(ValueError, match='no float64 kernel'):
+        approximations.make_approximation('not_a_special_function', 0, 1)
+    with pytest.raises(ValueError, match='no float64 kernel'):
+        approximations.make_approximation('beta', 0, 1)
+    with pytest.raises(ValueError, match='not finite'):
+        approximations.make_approximation('gamma', -1.5, -0.5)
+    with pytest.raises(ValueError, match='could not approximate'):
+        approximations.make_approximation(
+            'gammaln', 1.0, 100.0, rtol=1e-15, max_pieces=4
+        )
+
+
+@pytest.mark.parametrize('sequence, sc_function, points', [
+    (sequences.legendre_all, sc.eval_legendre,
+     [-1.5, -1.0, -0.3, 1e-7, 0.0, 0.5, 1.0]),
+    (sequences.jv_sequence, sc.jv,
+     [-30.0, -2.5, 1e-3, 0.0, 0.3, 2.5, 7.7, 29.9, 150.0]),
+    (sequences.iv_sequence, sc.iv,
+     [-30.0, -2.5, 1e-3, 0.0, 0.3, 2.5, 7.7, 29.9, 150.0]),
+])
+def test_sequences(sequence, sc_function, points):
+    n = 60
+    orders = np.arange(n + 1)
+
+    @numba.njit
+    def numba_func(x):
+        out = np.empty((x.shape[0], n + 1))
+        for i in range(x.shape[0]):
+            sequence(n, x[i], out[i])
+        return out
+
+    x = np.array(points)
+    expected = sc_function(orders, x[:, None])
+    # Relative errors are large next to the zeros of the functions, so
+    # compare with the largest value at each point.
+    scale = np.max(np.abs(expected), axis=1, keepdims=True)
+    assert_allclose(numba_func(x) / scale, expected / scale,
+                    rtol=1e-11, atol=1e-13)
+    assert_allclose(sequence(0, 0.5), sc_function(0, 0.5), rtol=1e-15)
+    assert_allclose(sequence(3, np.nan), sc_function(np.arange(4), np.nan))
+
+
+def test_sequences_errors():
+    with pytest.raises(ValueError, match='non-negative'):
+        sequences.jv_sequence(-1, 1.0)
+    with pytest.raises(ValueError, match='at least n \\+ 1'):
+        sequences.iv_sequence(3, 1.0, np.empty(3))
+
+
+@pytest.mark.parametrize('axis', [None, 0, 1, -1])
+@pytest.mark.parametrize('keepdims', [False, True])
+@pytest.mark.parametrize('b', [None, -0.5, 'array'])
+def test_logsumexp(axis, keepdims, b):
+    rng = np.random.default_rng(0)
+    a = 10 * rng.normal(size=(4, 5, 6))
+    if b == 'array':
+        b = rng.normal(size=(5, 6))
+        b[0, :2] = 0.0
+
+    @numba.njit
+    def numba_func(a, b):
+        return sc.logsumexp(a, axis=axis, b=b, keepdims=keepdims,
+                            return_sign=True)
+
+    result, sign = numba_func(a, b)
+    expected, expected_sign = sc.logsumexp(a, axis=axis, b=b,
+                                           keepdims=keepdims,
+                                           return_sign=True)
+    assert np.shape(result) == np.shape(expected)
+    assert_allclose(result, expected, rtol=1e-13)
+    assert_allclose(sign, expected_sign)
+
+
+def test_logsumexp_special_values():
+    @numba.njit
+    def numba_func(a):
+        return sc.logsumexp(a)
+
+    for a in [[np.inf, 1.0], [-np.inf, -np.inf], [np.nan, 1.0], [1.0, 1.0]]:
+        a = np.array(a)
+        assert_allclose(numba_func(a), sc.logsumexp(a))
+    assert_allclose(numba_func(np.arange(5)), sc.logsumexp(np.arange(5)))
+    x = np.linspace(-5, 5, 7, dtype=np.float32)
+    keepdims_func = numba.njit(lambda a: sc.logsumexp(a, keepdims=True))
+    assert keepdims_func(x).dtype == np.float32
+    assert_allclose(numba_func(x), sc.logsumexp(x), rtol=1e-6)
+    # Without return_sign, negative sums are NaN.
+    assert np.isnan(numba.njit(lambda a: sc.logsumexp(a, b=-1.0))(x))
+    with pytest.raises(ValueError, match='zero-size'):
+        numba_func(np.empty(0))
+    with pytest.raises(ValueError, match='out of bounds'):
+        numba.njit(lambda a: sc.logsumexp(a, axis=2))(x)
+    with pytest.raises(ValueError, match='out of bounds'):
+        numba.njit(lambda a: sc.softmax(a, axis=-2))(x)
+
+
+@pytest.mark.parametrize('b_shape', [(3,), (1, 3), (6, 1, 1)])
+def test_logsumexp_strided(b_shape):
+    rng = np.random.default_rng(0)
+    # Transposed and with negative strides, without copies.
+    a = rng.normal(size=(6, 4, 6)).T[::-1, :, ::2]
+    b = rng.uniform(0.5, 1.5, size=b_shape)
+
+    @numba.njit
+    def numba_func(a, b, axis):
+        return sc.logsumexp(a, axis=axis, b=b)
+
+    for axis in [None, 0, 1, 2]:
+        assert_allclose(numba_func(a, b, axis),
+                        sc.logsumexp(a, axis=axis, b=b), rtol=1e-13)
+    with pytest.raises(ValueError):
+        numba_func(a, np.ones(4), 0)
+
+
+def test_softmax_axis_none():
+    x = np.array([[-np.inf, -np.inf], [1.0, 2.0], [-np.inf, 0.5]]).T
+
+    @numba.njit
+    def numba_func(x):
+        return sc.softmax(x), sc.log_softmax(x)
+
+    result, log_result = numba_func(x)
+    assert_allclose(result, sc.softmax(x), rtol=1e-13)
+    assert_allclose(log_result, sc.log_softmax(x), rtol=1e-13)
+
+
+@pytest.mark.parametrize('name', ['softmax', 'log_softmax'])
+@pytest.mark.parametrize('axis', [None, 0, 2, 'runtime'])
+def test_softmax(name, axis):
+    sc_function = getattr(sc, name)
+    rng = np.random.default_rng(0)
+    x = 10 * rng.normal(size=(6, 4, 5))
+    # Non-contiguous input
+    x = x[::2]
+
+    if axis == 'runtime':
+        axis = 1
+
+        @numba.njit
+        def numba_func(x, axis):
+            return sc_function(x, axis)
+    else:
+        @numba.njit
+        def numba_func(x, axis):
+            return sc_function(x, axis=axis)
+
+    assert_allclose(numba_func(x, axis), sc_function(x, axis=axis),
+                    rtol=1e-13, atol=1e-300)
+
+
+def test_reductions_parallel(monkeypatch):
+    monkeypatch.setattr(config, 'SPECIAL_PARALLEL_THRESHOLD', 10)
+    rng = np.random.default_rng(0)
+    a = rng.normal(size=(40, 30))
+
+    @numba.njit
+    def numba_func(a):
+        return sc.logsumexp(a, axis=1), sc.softmax(a, axis=0)
+
+    result, softmax = numba_func(a)
+    assert_allclose(result, sc.logsumexp(a, axis=1), rtol=1e-13)
+    assert_allclose(softmax, sc.softmax(a, axis=0), rtol=1e-13)
+    assert reductions.parallel_reduce_rows.signatures
+    assert reductions.parallel_softmax_rows.signatures
+
+
+def test_sf_error_counts():
+    @numba.njit(parallel=True)
+    def numba_func(x, counts):
+        out = np.empty_like(x)
+        for i in numba.prange(x.shape[0]):
+            out[i] = sf_error.check(counts, sc.gamma(x[i]), x[i])
+        return out
+
+    x = np.array([2.5, 0.0, -1.0, 200.0, np.nan, np.inf, 0.5])
+    counts = sf_error.new_counts()
+    assert_allclose(numba_func(x, counts), sc.gamma(x))
+    # The infinities of 0.0, -1.0 and 200.0; NaN and inf arguments aren't
+    # errors.
+    assert sf_error.summarize(counts) == {'domain': 0, 'infinite': 3}
+
+
+def test_sf_error_counts_shared_thread_id():
+    @numba.njit(nogil=True)
+    def numba_func(x, counts):
+        for i in range(x.shape[0]):
+            sf_error.check(counts, sc.gamma(x[i]), x[i])
+
+    # Python threads running nopython code at once all count in row 0.
+    x = np.zeros(20000)
+    counts = sf_error.new_counts()
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        list(executor.map(numba_func, [x] * 8, [counts] * 8))
+    assert sf_error.summarize(counts) == {'domain': 0, 'infinite': 160000}
+
+
+def test_sf_error_check_types():
+    @numba.njit
+    def numba_func(counts, x):
+        return (
+            sf_error.check(counts, sc.sici(x), x),
+            sf_error.check(counts, sc.jv(1, x), 1, x),
+            sf_error.check(counts, sc.loggamma(complex(x)), complex(x)),
+        )
+
+    counts = sf_error.new_counts()
+    numba_func(counts, 1.5)
+    assert not counts.any()
+    # ci(0) is -inf, and loggamma(0j) is NaN.
+    numba_func(counts, 0.0)
+    totals = sf_error.summarize(counts)
+    assert totals == {'domain': 1, 'infinite': 1}
+    with pytest.raises(ValueError, match='row per thread'):
+        numba_func(np.zeros((0, len(sf_error.CATEGORIES)), np.int64), 0.0)
+
+
+@pytest.mark.parametrize('policy', memo.POLICIES)
+def test_memoize(policy):
+    hyp2f1 = memo.memoize('hyp2f1', size=64, policy=policy)
+
+    @numba.njit(parallel=True)
+    def numba_func(params, z):
+        out = np.empty(z.shape[0])
+        for i in numba.prange(z.shape[0]):
+            out[i] = hyp2f1(params[i, 0], params[i, 1], params[i, 2], z[i])
+        return out
+
+    rng = np.random.default_rng(0)
+    index = rng.integers(0, 8, 1000)
+    params = rng.uniform(0.5, 2.0, (8, 3))[index]
+    z = rng.uniform(-0.9, 0.5, 8)[index]
+    expected = sc.hyp2f1(params[:, 0], params[:, 1], params[:, 2], z)
+    assert_allclose(numba_func(params, z), expected, rtol=1e-15)
+    info = hyp2f1.cache_info()
+    assert info.hits + info.misses == 1000
+    n_threads = numba.config.NUMBA_NUM_THREADS
+    assert info.currsize == info.misses <= 8 * n_threads
+    assert info.maxsize == 64 * n_threads
+
+    hyp2f1.cache_clear()
+    assert hyp2f1.cache_info() == (0, 0, 64 * n_threads, 0)
+    assert hyp2f1(0.5, 1.5, 2.5, 0.3) == sc.hyp2f1(0.5, 1.5, 2.5, 0.3)
+
+
+def test_memoize_eviction():
+    direct = memo.memoize('gammaincinv', size=1)
+    lru = memo.memoize('gammaincinv', size=2, policy='lru', ways=2)
+    for function in [direct, lru]:
+        for _ in range(3):
+            function(1.5, 0.25)
+            function(1.5, 0.75)
+        assert function(1.5, 0.75) == sc.gammaincinv(1.5, 0.75)
+    # A single slot holds one of the two keys at a time, so only the
+    # last call hits.
+    n_threads = numba.config.NUMBA_NUM_THREADS
+    assert direct.cache_info() == (1, 6, n_threads, 1)
+    assert lru.cache_info() == (5, 2, 2 * n_threads, 2)
+
+    # Arguments are converted to the types of the kernel, and keys of
+    # equal values hit.
+    eval_legendre = memo.memoize('eval_legendre',
+                                 (numba.types.long_, float64))
+    assert eval_legendre(3, 0.5) == eval_legendre(3, 0.5)
+    assert eval_legendre(3, np.float32(0.5)) == sc.eval_legendre(3, 0.5)
+    assert eval_legendre.cache_info().hits == 2
+
+
+def test_memoize_shared_thread_id():
+    gammaincinv = memo.memoize('gammaincinv', size=16)
+
+    @numba.njit(nogil=True)
+    def numba_func(a, p):
+        out = np.empty(p.shape[0])
+        for i in range(p.shape[0]):
+            out[i] = gammaincinv(a, p[i])
+        return out
+
+    # Python threads running nopython code at once all have thread id 0,
+    # and share its tables.
+    p = np.random.default_rng(0).uniform(0.1, 0.9, (8, 4))[:, [0, 1, 2, 3] * 500]
+    a = np.linspace(0.5, 4.0, 8)
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(numba_func, a, p))
+    for a_i, p_i, result in zip(a, p, results):
+        assert_allclose(result, sc.gammaincinv(a_i, p_i), rtol=1e-15)
+
+    # Callers finding the tables locked call the kernel uncached.
+    gammaincinv.cache_clear()
+    gammaincinv.tables['stats'][0, memo.LOCK] = 1
+    assert gammaincinv(1.5, 0.25) == sc.gammaincinv(1.5, 0.25)
+    assert gammaincinv.cache_info() == (0, 0, 16 * numba.config.NUMBA_NUM_THREADS, 0)
+    gammaincinv.tables['stats'][0, memo.LOCK] = 0
+
+    # Clearing takes the lock of each thread and releases it.
+    gammaincinv(1.5, 0.25)
+    gammaincinv.cache_clear()
+    assert not gammaincinv.tables['stats'][:, memo.LOCK].any()
+    assert gammaincinv.cache_info() == (0, 0, 16 * numba.config.NUMBA_NUM_THREADS, 0)
+
+
+def test_memoize_errors():
+    with pytest.raises(ValueError, match='not a scipy.special ufunc'):
+        memo.memoize('logsumexp')
+    with pytest.raises(ValueError, match='takes 3 arguments'):
+        memo.memoize('betainc', (float64,))
+    with pytest.raises(ValueError, match='several outputs'):
+        memo.memoize('sici')
+    with pytest.raises(ValueError, match='complex arguments'):
+        memo.memoize('loggamma', (numba.types.complex128,))
+    with pytest.raises(ValueError, match='policy'):
+        memo.memoize('gamma', policy='fifo')
+    with pytest.raises(ValueError, match='positive'):
+        memo.memoize('gamma', size=0)
+
+
+@pytest.mark.parametrize('name, params', [
+    ('gammainc', [(0.0,), (1e-8,), (0.5,), (2.5,), (30.0,), (900.0,),
+                  (np.inf,), (-1.0,), (np.nan,)]),
+    ('gammaincc', [(0.0,), (1e-8,), (0.5,), (2.5,), (30.0,), (900.0,),
+                   (np.inf,), (-1.0,), (np.nan,)]),
+    ('betainc', [(0.5, 0.5), (2.5, 4.0), (1e-3, 20.0), (500.0, 3.0),
+                 (0.0, 1.0), (-1.0, 2.0), (np.nan, 2.0)]),
+    ('hyp2f1', [(0.5, 1.5, 2.5), (1.0, 1.0, 2.0), (1.5, 2.5, 3.0),
+                (0.25, 0.5, 0.75), (5.0, 3.0, 1.5), (2.5, -3.0, 1.5),
+                (-2.0, 3.0, -4.0), (np.nan, 1.0, 2.0)]),
+])
+def test_batch(name, params):
+    function = getattr(batch, name)
+    if name == 'betainc':
+        x = np.concatenate([np.linspace(0.0, 1.0, 101), [-0.1, 1.1, np.nan]])
+    elif name == 'hyp2f1':
+        x = np.concatenate([np.linspace(-5.0, 1.0, 97), [0.999, 1.5, np.nan]])
+    else:
+        x = np.concatenate(
+            [np.geomspace(1e-10, 1e4, 100), [0.0, np.inf, -1.0, np.nan]]
+        )
+
+    @numba.njit
+    def numba_func(*args):
+        return function(*args)
+
+    for args in params:
+        expected = getattr(sc, name)(*args, x)
+        assert_allclose(numba_func(*args, x), expected, rtol=1e-13)
+        out = np.empty((4, x.size // 4))
+        result = numba_func(*args, x.reshape(out.shape), out)
+        assert result is out
+        assert_allclose(out.ravel(), expected, rtol=1e-13)
+        # Non-contiguous inputs and outputs are supported.
+        out = np.empty(x.size)[::-1]
+        function(*args, x[::2], out[::2])
+        assert_allclose(out[::2], expected[::2], rtol=1e-13)
+        out = np.asfortranarray(np.empty((4, x.size // 4)))
+        function(*args, x.reshape(out.shape), out)
+        assert_allclose(out.ravel(), expected, rtol=1e-13)
+
+
+def test_batch_errors():
+    with pytest.raises(ValueError, match='shape of x'):
+        batch.gammainc(1.0, np.linspace(0.0, 1.0, 10), np.empty(5))
+
+
+def test_function_broadcasting_and_layouts():
+    @numba.njit
+    def numba_func(a, b):
+        return sc.beta(a, b)
+
+    a = np.linspace(0.5, 3.0, 24).reshape(4, 6)[:, ::2]
+    b = np.array([1.5, 2.5, 3.5])
+    for x, y in [(a, b), (a.T, b[:, None]), (np.asfortranarray(a), b),
+                 (a, 2.5), (1.5, b)]:
+        assert_allclose(numba_func(x, y), sc.beta(x, y))
+
+
+def test_function_out_argument():
+    @numba.njit
+    def keyword_out(a, out):
+        return sc.gamma(a, out=out)
+
+    @numba.njit
+    def positional_out(a, out):
+        return sc.gamma(a, out)
+
+    a = np.linspace(0.5, 3.0, 6).reshape(2, 3)
+    for numba_func in (keyword_out, positional_out):
+        out = np.zeros_like(a)
+        result = numba_func(a, out)
+        assert_allclose(out, sc.gamma(a))
+        assert_allclose(result, out)
+
+
+def test_parallel_array_path(monkeypatch):
+    monkeypatch.setattr(config, 'SPECIAL_PARALLEL_THRESHOLD', 10)
+    array_type = numba.typeof(np.empty((1, 1)))
+    implementation = overloads.choose_kernel('beta')(
+        (array_type, float64), None
+    )
+    assert implementation.__name__ == 'parallel_ufunc_call'
+    parallel_beta = numba.njit(implementation)
+
+    a = np.linspace(0.5, 3.0, 24).reshape(4, 6)
+    # Below the threshold the work is not split.
+    assert_allclose(parallel_beta(a[:1, :3], 2.5), sc.beta(a[:1, :3], 2.5))
+    assert_allclose(parallel_beta(a, 2.5), sc.beta(a, 2.5))
+
+    out = np.zeros_like(a)
+    result = parallel_beta(a, 2.5, out)
+    assert_allclose(out, sc.beta(a, 2.5))
+    assert_allclose(result, out)
+    with pytest.raises(ValueError, match="wrong shape"):
+        parallel_beta(a, 2.5, out[:2])
+
+
+def test_parallel_array_path_few_rows(monkeypatch):
+    monkeypatch.setattr(config, 'SPECIAL_PARALLEL_THRESHOLD', 10)
+    array_types = (numba.typeof(np.empty((1, 1, 1))),
+                   numba.typeof(np.empty((1, 1))))
+    parallel_beta = numba.njit(
+        overloads.choose_kernel('beta')(array_types, None)
+    )
+
+    # Fewer slices along the first axis than chunks, so the chunks span
+    # parts of rows of the broadcast arguments.
+    a = np.linspace(0.5, 3.0, 600).reshape(2, 1, 300)
+    b = np.linspace(1.0, 2.0, 3)[:, None]
+    assert_allclose(parallel_beta(a, b), sc.beta(a, b))
+    out = np.zeros((2, 3, 300))
+    parallel_beta(a, b, out)
+    assert_allclose(out, sc.beta(a, b))
+
+
+@pytest.mark.parametrize('namespace', [ufuncs, ufuncs.parallel])
+@pytest.mark.parametrize('name, args', [
+    ('gamma', (np.linspace(0.5, 3.0, 6),)),
+    ('beta', (np.linspace(0.5, 3.0, 6).reshape(2, 3), np.array([1.5, 2.5, 3.5]))),
+    ('bdtr', (np.arange(6.0), 5.0, 0.25)),
+    ('hyp2f1', (0.5, 1.5, 2.5, np.linspace(-0.9, 0.9, 7))),
+])
+def test_ufuncs(namespace, name, args):
+    ufunc = getattr(namespace, name)
+    assert getattr(namespace, name) is ufunc
+    assert_allclose(ufunc(*args), getattr(sc, name)(*args))
+
+    out = np.zeros(np.broadcast(*args).shape)
+    ufunc(*args, out=out)
+    assert_allclose(out, getattr(sc, name)(*args))
+
+
+def test_ufuncs_loop_order():
+    # The loops must be ordered like SciPy's so that NumPy picks the same
+    # specialization for mixed integer and floating point arguments.
+    bdtr_loops = [t for t in sc.bdtr.types if t in ufuncs.bdtr.types]
+    assert ufuncs.bdtr.types == bdtr_loops
+
+
+def test_ufuncs_unsupported():
+    assert 'gamma' in dir(ufuncs)
+    with pytest.raises(AttributeError):
+        ufuncs.not_a_special_function
+    with pytest.raises(NotImplementedError):
+        ufuncs.make_ufunc('airy')
+
+
+def test_ufuncs_cache(tmp_path):
+    script = textwrap.dedent('''
+        import numpy as np
+        from numba_scipy.special import ufuncs
+        gamma = ufuncs.make_ufunc('gamma', cache=True)
+        print(gamma(np.array([0.5, 1.5])).tolist())
+    ''')
+    env = dict(
+        os.environ,
+        NUMBA_CACHE_DIR=str(tmp_path / 'cache'),
+        NUMBA_DEBUG_CACHE='1',
+    )
+
+    def run():
+        output = subprocess.check_output(
+            [sys.executable, '-c', script], env=env, cwd=str(tmp_path)
+        ).decode()
+        assert_allclose(
+            json.loads(output.splitlines()[-1]), sc.gamma(np.array([0.5, 1.5]))
+        )
+        return output
+
+    assert 'data saved' in run()
+    assert 'data loaded' in run()
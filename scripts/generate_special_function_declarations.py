@@ -19,6 +19,8 @@ import os
 import re
 import collections
 
+import numpy as np
+import scipy.special as sc
 import scipy.special.cython_special as cysc
 
 SPECIAL_DIR = os.path.join(
@@ -45,6 +47,15 @@ import ctypes
 import numba
 from numba.extending import get_cython_function_address
 
+
+class c_double_complex(ctypes.Structure):
+    _fields_ = [('real', ctypes.c_double), ('imag', ctypes.c_double)]
+
+
+class c_float_complex(ctypes.Structure):
+    _fields_ = [('real', ctypes.c_float), ('imag', ctypes.c_float)]
+
+
 name_to_numba_signatures = {{
     {NAME_TO_NUMBA_SIGNATURES}
 }}
@@ -63,6 +74,45 @@ DOCS_TEMPLATE = '''
 Supported functions from ``scipy.special``
 ==========================================
 
+Besides scalars, each function accepts NumPy arrays of any dimension and
+layout. The arguments are broadcast together and an output array can be
+passed as ``out``, like when calling the corresponding ufunc.
+
+Arguments whose types don't match one of the signatures below are cast to
+the signature needing the fewest casts that lose no information, following
+NumPy's safe casting rules. For example ``scipy.special.gamma`` can be
+called with an integer, which is cast to ``float64``.
+
+Calls with arrays return arrays of the dtype the SciPy ufunc would return.
+For example ``scipy.special.gamma`` of a ``float32`` array returns a
+``float32`` array, like the ``'f->f'`` loop of the ufunc, although the
+values are computed by the ``float64`` kernel.
+
+For ``float64`` arguments, ``erf``, ``erfc``, ``expit``, ``gammaln``,
+``log_expit``, ``logit``, ``ndtr``, ``xlog1py`` and ``xlogy`` are
+implemented in Numba instead of calling the ``cython_special`` kernel, so
+they can be inlined into the calling code. They don't report errors
+through ``scipy.special.seterr``.
+
+When the order is an integer constant in the source, Bessel functions of
+order 0 and 1 call the kernels of ``j0``, ``j1``, ``y0``, ``y1``, ``i0``,
+``i1``, ``i0e``, ``i1e``, ``k0``, ``k1``, ``k0e`` and ``k1e``. For example
+``scipy.special.jv(0, x)`` is evaluated as ``scipy.special.j0(x)``.
+``eval_chebyt``, ``eval_chebyu`` and ``eval_legendre`` are compiled with
+the recurrence unrolled for that order.
+
+Functions with several outputs, like ``airy`` or ``sici``, return a tuple
+and are only supported for scalar arguments. Their signatures are listed
+below as ``(outputs)(inputs)``.
+
+The same kernels are available outside of nopython code as NumPy ufuncs
+compiled by Numba, in the ``numba_scipy.special.ufuncs`` module. For
+example ``numba_scipy.special.ufuncs.gamma`` is built from the kernels
+listed below for ``scipy.special.gamma``, and
+``numba_scipy.special.ufuncs.parallel.gamma`` is the same ufunc compiled
+for Numba's ``parallel`` target. ``numba_scipy.special.ufuncs.make_ufunc``
+also lets the compiled loops be saved in Numba's on-disk cache.
+
 The following functions are supported:
 
 '''
@@ -70,13 +120,36 @@ The following functions are supported:
 CYTHON_TO_NUMBA = {
     'double': 'numba.types.float64',
     'float': 'numba.types.float32',
+    'int': 'numba.types.intc',
     'long': 'numba.types.long_',
+    'long long': 'numba.types.longlong',
+    'Py_ssize_t': 'numba.types.intp',
+    '__pyx_t_double_complex': 'numba.types.complex128',
+    'double complex': 'numba.types.complex128',
+    '__pyx_t_float_complex': 'numba.types.complex64',
+    'float complex': 'numba.types.complex64',
 }
 
 NUMBA_TO_CTYPES = {
     'numba.types.float64': 'ctypes.c_double',
     'numba.types.float32': 'ctypes.c_float',
+    'numba.types.intc': 'ctypes.c_int',
     'numba.types.long_': 'ctypes.c_long',
+    'numba.types.longlong': 'ctypes.c_longlong',
+    'numba.types.intp': 'ctypes.c_ssize_t',
+    'numba.types.complex128': 'c_double_complex',
+    'numba.types.complex64': 'c_float_complex',
+}
+
+NUMBA_TO_TYPECODE = {
+    'numba.types.float64': 'd',
+    'numba.types.float32': 'f',
+    'numba.types.intc': 'i',
+    'numba.types.long_': 'l',
+    'numba.types.longlong': 'q',
+    'numba.types.intp': 'p',
+    'numba.types.complex128': 'D',
+    'numba.types.complex64': 'F',
 }
 
 
@@ -110,16 +183,60 @@ def de_mangle_function_name(mangled_name):
     return match.group('name')
 
 
+def to_numba_signature(cython_signature):
+    # Kernels with several outputs return `void` and write the outputs
+    # through pointers passed after the inputs.
+    return_type, *arg_types = cython_signature
+    outputs = [return_type]
+    if return_type == 'void':
+        outputs = [t[:-len(' *')] for t in arg_types if t.endswith(' *')]
+        arg_types = arg_types[:len(arg_types) - len(outputs)]
+        if not outputs or any(t.endswith('*') for t in arg_types):
+            return None
+    numba_signature = [CYTHON_TO_NUMBA.get(t) for t in outputs + arg_types]
+    if any(t is None for t in numba_signature):
+        return None
+    if len(outputs) > 1:
+        numba_signature[:len(outputs)] = [
+            'numba.types.Tuple(({}))'.format(
+                ', '.join(numba_signature[:len(outputs)])
+            )
+        ]
+    return numba_signature
+
+
+def get_output_types(signature):
+    match = re.match(r'numba\.types\.Tuple\(\((?P<outputs>.+)\)\)$',
+                     signature[0])
+    if match is None:
+        return [signature[0]]
+    return match.group('outputs').split(', ')
+
+
+def is_used_by_ufunc(mangled_name, signature):
+    if not any('complex' in t for t in signature):
+        return True
+    sc_function = getattr(sc, de_mangle_function_name(mangled_name), None)
+    if not isinstance(sc_function, np.ufunc):
+        return True
+    return '{}->{}'.format(
+        ''.join(NUMBA_TO_TYPECODE[t] for t in signature[1:]),
+        ''.join(NUMBA_TO_TYPECODE[t] for t in get_output_types(signature)),
+    ) in sc_function.types
+
+
 def get_signatures_from_pyx_capi():
     signature_to_pointer = {}
 
     for mangled_name, capsule in cysc.__pyx_capi__.items():
-        numba_signature = [
-            CYTHON_TO_NUMBA.get(t) for t in parse_capsule_name(capsule)
-        ]
-        if any(t is None for t in numba_signature):
+        numba_signature = to_numba_signature(parse_capsule_name(capsule))
+        if numba_signature is None:
             # We don't know how to handle this kernel yet.
             continue
+        if not is_used_by_ufunc(mangled_name, numba_signature):
+            # A stub that Cython generated for a combination of fused
+            # types, see `signatures.is_used_by_ufunc`.
+            continue
 
         signature_to_pointer[(mangled_name, *numba_signature)] = capsule
 
@@ -140,7 +257,16 @@ def generate_signatures_file(signature_to_pointer):
             "get_cython_function_address('scipy.special.cython_special', '{}')"
             .format(mangled_name)
         )
-        ctypes_signature = [NUMBA_TO_CTYPES[t] for t in signature]
+        output_types = get_output_types(signature)
+        if len(output_types) > 1:
+            ctypes_signature = ['None'] + [
+                NUMBA_TO_CTYPES[t] for t in signature[1:]
+            ] + [
+                'ctypes.POINTER({})'.format(NUMBA_TO_CTYPES[t])
+                for t in output_types
+            ]
+        else:
+            ctypes_signature = [NUMBA_TO_CTYPES[t] for t in signature]
         ctypes_cast = (
             'ctypes.CFUNCTYPE({})'.format(', '.join(ctypes_signature))
         )
@@ -172,6 +298,8 @@ def generate_docs(signature_to_pointer):
             name = de_mangle_function_name(x[0])
             sig = [t.replace('numba.types.','') for t in x[1:]]
             retty, *argtys = sig
+            if retty.startswith('Tuple('):
+                retty = retty[len('Tuple('):-len(')')]
             sig_str = '``{}({})``'.format(retty, ','.join(argtys))
             funcs[name].append(sig_str)
         # re-sort based on de-mangled function names so same named functions
@@ -2,7 +2,10 @@ from setuptools import setup, find_packages
 import versioneer
 
 
-_install_requires = ["scipy>=0.16,<=1.11.0", "numba>=0.45"]
+# numba.get_thread_id, used by the per-thread tables of
+# numba_scipy.special.sf_error and memo, is new in Numba 0.57, which
+# also compiles np.broadcast_shapes and needs NumPy 1.21.
+_install_requires = ["scipy>=1.4,<=1.11.0", "numba>=0.57", "numpy>=1.21"]
 
 
 metadata = dict(